@@ -1,11 +1,14 @@
 import asyncio
 
-from voices.db.connection import Transaction
+from voices.broker.tasks.counters import reconcile_all_counters
+from voices.redis import Redis
 
 
 async def handle():
-    async with Transaction():
-        ...
+    await Redis.connect()
+    fixed = await reconcile_all_counters()
+    print(f"Fixed counters of {fixed} rows")
+    await Redis.disconnect()
 
 
-asyncio.run(handle)
+asyncio.run(handle())
@@ -15,6 +15,8 @@ import voices.app.notifications.controllers as notifications
 import voices.app.storage.controllers as storage
 from voices.app.core import exceptions
 from voices.app.core.protocol import Response
+from voices.app.storage import images
+from voices.app.storage.middleware import UploadLimitMiddleware
 from voices.app.storage.s3 import S3Service
 from voices.config import settings
 from voices.logger import logger
@@ -41,10 +43,12 @@ async def lifespan(app: FastAPI):
     yield
     await Redis().disconnect()
     await S3Service.close_s3_session()
+    images.executor.shutdown(cancel_futures=True)
 
 
 app = FastAPI(docs_url="/api/docs", openapi_url="/api/openapi.json", redoc_url=None, lifespan=lifespan)
 
+app.add_middleware(UploadLimitMiddleware, path="/api/storage")
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
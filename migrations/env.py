@@ -6,6 +6,7 @@ from voices.app.auth.models import *  # noqa
 from voices.app.friends.models import *  # noqa
 from voices.app.initiatives.models import *  # noqa
 from voices.app.notifications.models import *  # noqa
+from voices.app.storage.models import *  # noqa
 from voices.config import settings
 from voices.db import Base
 
@@ -0,0 +1,38 @@
+"""initiatives search vector
+
+Revision ID: 6f2b9c1d4e7a
+Revises: 88bc7e54d44f
+Create Date: 2026-10-18 10:12:41.518204
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "6f2b9c1d4e7a"
+down_revision = "88bc7e54d44f"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # stored generated column: postgres fills it for existing rows while adding the column
+    op.add_column(
+        "initiatives",
+        sa.Column(
+            "search_vector",
+            postgresql.TSVECTOR(),
+            sa.Computed(
+                "to_tsvector('russian', coalesce(title, '') || ' ' || coalesce(main_text, ''))",
+                persisted=True,
+            ),
+            nullable=True,
+        ),
+    )
+    op.create_index("ix_initiatives_search_vector", "initiatives", ["search_vector"], postgresql_using="gin")
+
+
+def downgrade() -> None:
+    op.drop_index("ix_initiatives_search_vector", table_name="initiatives", postgresql_using="gin")
+    op.drop_column("initiatives", "search_vector")
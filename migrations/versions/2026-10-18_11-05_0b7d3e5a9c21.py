@@ -0,0 +1,23 @@
+"""initiatives location index
+
+Revision ID: 0b7d3e5a9c21
+Revises: 6f2b9c1d4e7a
+Create Date: 2026-10-18 11:05:09.431775
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "0b7d3e5a9c21"
+down_revision = "6f2b9c1d4e7a"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # geoalchemy2 creates this index with the table (spatial_index=True), only databases created without it miss it
+    op.execute("CREATE INDEX IF NOT EXISTS idx_initiatives_location ON initiatives USING gist (location)")
+
+
+def downgrade() -> None:
+    pass  # the index may predate this revision, it belongs to the table
@@ -0,0 +1,39 @@
+"""initiatives location geography
+
+Revision ID: 7c4e1a2f8d90
+Revises: 0b7d3e5a9c21
+Create Date: 2026-10-18 11:48:27.906113
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "7c4e1a2f8d90"
+down_revision = "0b7d3e5a9c21"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.drop_index("idx_initiatives_location", table_name="initiatives", postgresql_using="gist")
+    # old points were packed as POINT(lat lon) without srid, geography expects POINT(lon lat)
+    op.execute(
+        """
+        ALTER TABLE initiatives
+        ALTER COLUMN location TYPE geography(POINT, 4326)
+        USING ST_SetSRID(ST_MakePoint(ST_Y(location), ST_X(location)), 4326)::geography
+        """
+    )
+    op.create_index("idx_initiatives_location", "initiatives", ["location"], postgresql_using="gist")
+
+
+def downgrade() -> None:
+    op.drop_index("idx_initiatives_location", table_name="initiatives", postgresql_using="gist")
+    op.execute(
+        """
+        ALTER TABLE initiatives
+        ALTER COLUMN location TYPE geometry(POINT)
+        USING ST_MakePoint(ST_Y(location::geometry), ST_X(location::geometry))
+        """
+    )
+    op.create_index("idx_initiatives_location", "initiatives", ["location"], postgresql_using="gist")
@@ -0,0 +1,40 @@
+"""keyset pagination indexes
+
+Revision ID: 3e8a6f0c2d15
+Revises: 7c4e1a2f8d90
+Create Date: 2026-10-18 12:31:47.205318
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "3e8a6f0c2d15"
+down_revision = "7c4e1a2f8d90"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_index(
+        "ix_initiatives_feed",
+        "initiatives",
+        ["city", "created_at", "id"],
+        postgresql_where=sa.text("deleted_at IS NULL AND approved IS TRUE"),
+    )
+    op.create_index("ix_initiatives_user", "initiatives", ["user_id", "created_at", "id"])
+    op.create_index("ix_initiatives_likes_user", "initiatives_likes", ["user_id", "created_at", "id"])
+    op.create_index("ix_comments_initiative", "comments", ["initiative_id", "created_at", "id"])
+    op.create_index("ix_notifications_owner", "notifications", ["owner_id", "created_at", "id"])
+    op.create_index("ix_users_created", "users", ["created_at", "id"])
+    op.create_index("ix_users_friends_friend", "users_friends", ["friend_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_users_friends_friend", table_name="users_friends")
+    op.drop_index("ix_users_created", table_name="users")
+    op.drop_index("ix_notifications_owner", table_name="notifications")
+    op.drop_index("ix_comments_initiative", table_name="comments")
+    op.drop_index("ix_initiatives_likes_user", table_name="initiatives_likes")
+    op.drop_index("ix_initiatives_user", table_name="initiatives")
+    op.drop_index("ix_initiatives_feed", table_name="initiatives")
@@ -0,0 +1,36 @@
+"""comments replies count
+
+Revision ID: 9a4d2b7e6f13
+Revises: 3e8a6f0c2d15
+Create Date: 2026-10-18 13:20:36.118402
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9a4d2b7e6f13"
+down_revision = "3e8a6f0c2d15"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("comments", sa.Column("replies_count", sa.Integer(), server_default="0", nullable=False))
+    op.execute(
+        """
+        UPDATE comments SET replies_count = replies.count
+        FROM (
+            SELECT parent_id, count(*) AS count FROM comments
+            WHERE parent_id IS NOT NULL AND deleted_at IS NULL
+            GROUP BY parent_id
+        ) AS replies
+        WHERE comments.id = replies.parent_id
+        """
+    )
+    op.create_index("ix_comments_parent", "comments", ["parent_id", "created_at", "id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_comments_parent", table_name="comments")
+    op.drop_column("comments", "replies_count")
@@ -0,0 +1,111 @@
+"""counter triggers
+
+Revision ID: c5f1e8a3b7d4
+Revises: 9a4d2b7e6f13
+Create Date: 2026-10-18 14:02:51.640217
+
+"""
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c5f1e8a3b7d4"
+down_revision = "9a4d2b7e6f13"
+branch_labels = None
+depends_on = None
+
+# (initiative_id, parent_id, delta) of not deleted comments per statement
+COMMENTS_CHANGES = {
+    "INSERT": "SELECT initiative_id, parent_id, 1 AS delta FROM new_rows WHERE deleted_at IS NULL",
+    "UPDATE": """
+        SELECT n.initiative_id, n.parent_id, (n.deleted_at IS NULL)::int - (o.deleted_at IS NULL)::int AS delta
+        FROM new_rows n JOIN old_rows o USING (id)
+    """,
+    "DELETE": "SELECT initiative_id, parent_id, -1 AS delta FROM old_rows WHERE deleted_at IS NULL",
+}
+
+# (user_id, delta) for both users of FRIEND relations per statement
+FRIENDS_CHANGES = {
+    "INSERT": """
+        SELECT user_id, 1 AS delta FROM new_rows WHERE relationship_type = 'FRIEND'
+        UNION ALL SELECT friend_id, 1 FROM new_rows WHERE relationship_type = 'FRIEND'
+    """,
+    "UPDATE": """
+        SELECT user_id, 1 AS delta FROM new_rows WHERE relationship_type = 'FRIEND'
+        UNION ALL SELECT friend_id, 1 FROM new_rows WHERE relationship_type = 'FRIEND'
+        UNION ALL SELECT user_id, -1 FROM old_rows WHERE relationship_type = 'FRIEND'
+        UNION ALL SELECT friend_id, -1 FROM old_rows WHERE relationship_type = 'FRIEND'
+    """,
+    "DELETE": """
+        SELECT user_id, -1 AS delta FROM old_rows WHERE relationship_type = 'FRIEND'
+        UNION ALL SELECT friend_id, -1 FROM old_rows WHERE relationship_type = 'FRIEND'
+    """,
+}
+
+COMMENTS_APPLY = """
+    WITH changes AS ({changes}),
+    initiatives_changed AS (
+        UPDATE initiatives SET comments_count = initiatives.comments_count + d.delta
+        FROM (SELECT initiative_id, sum(delta) AS delta FROM changes GROUP BY initiative_id HAVING sum(delta) <> 0) d
+        WHERE initiatives.id = d.initiative_id
+    )
+    UPDATE comments SET replies_count = comments.replies_count + d.delta
+    FROM (
+        SELECT parent_id, sum(delta) AS delta FROM changes
+        WHERE parent_id IS NOT NULL GROUP BY parent_id HAVING sum(delta) <> 0
+    ) d
+    WHERE comments.id = d.parent_id;
+"""
+
+FRIENDS_APPLY = """
+    UPDATE users SET friends_count = coalesce(users.friends_count, 0) + d.delta
+    FROM (SELECT user_id, sum(delta) AS delta FROM ({changes}) changes GROUP BY user_id HAVING sum(delta) <> 0) d
+    WHERE users.id = d.user_id;
+"""
+
+
+def create_counter_trigger(table: str, function: str, apply: str, changes: dict[str, str]) -> None:
+    # transition tables are planned lazily, so each branch only touches the ones its event has
+    op.execute(
+        f"""
+        CREATE FUNCTION {function}() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF pg_trigger_depth() > 1 THEN  -- own counter updates, e.g. comments.replies_count
+                RETURN NULL;
+            END IF;
+            IF TG_OP = 'INSERT' THEN
+                {apply.format(changes=changes["INSERT"])}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {apply.format(changes=changes["UPDATE"])}
+            ELSE
+                {apply.format(changes=changes["DELETE"])}
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    referencing = {"INSERT": "NEW TABLE AS new_rows", "UPDATE": "NEW TABLE AS new_rows OLD TABLE AS old_rows"}
+    referencing["DELETE"] = "OLD TABLE AS old_rows"
+    for event, tables in referencing.items():
+        op.execute(
+            f"""
+            CREATE TRIGGER {function}_{event.lower()} AFTER {event} ON {table}
+            REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION {function}()
+            """
+        )
+
+
+def drop_counter_trigger(table: str, function: str) -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS {function}_{event} ON {table}")
+    op.execute(f"DROP FUNCTION IF EXISTS {function}()")
+
+
+def upgrade() -> None:
+    create_counter_trigger("comments", "comments_counters", COMMENTS_APPLY, COMMENTS_CHANGES)
+    create_counter_trigger("users_friends", "friends_counters", FRIENDS_APPLY, FRIENDS_CHANGES)
+
+
+def downgrade() -> None:
+    drop_counter_trigger("users_friends", "friends_counters")
+    drop_counter_trigger("comments", "comments_counters")
@@ -0,0 +1,40 @@
+"""firebase token last_seen_at and unique token
+
+Revision ID: 4b2e9d7a1c68
+Revises: c5f1e8a3b7d4
+Create Date: 2026-10-18 14:40:12.318904
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "4b2e9d7a1c68"
+down_revision = "c5f1e8a3b7d4"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "firebase_token", sa.Column("last_seen_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False)
+    )
+    # keep one registration of every token, table has no creation time, ids are the only order
+    op.execute(
+        """
+        DELETE FROM firebase_token
+        WHERE id IN (
+            SELECT id FROM (
+                SELECT id, row_number() OVER (PARTITION BY token ORDER BY id DESC) AS rn
+                FROM firebase_token
+            ) AS duplicates
+            WHERE rn > 1
+        )
+        """
+    )
+    op.create_unique_constraint("firebase_token_token_key", "firebase_token", ["token"])
+
+
+def downgrade() -> None:
+    op.drop_constraint("firebase_token_token_key", "firebase_token", type_="unique")
+    op.drop_column("firebase_token", "last_seen_at")
@@ -0,0 +1,39 @@
+"""coalesced notifications actors
+
+Revision ID: e7a3c9f4b210
+Revises: 4b2e9d7a1c68
+Create Date: 2026-10-18 15:05:37.204519
+
+"""
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "e7a3c9f4b210"
+down_revision = "4b2e9d7a1c68"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column("notifications", sa.Column("actors_count", sa.Integer(), server_default="1", nullable=False))
+    op.add_column(
+        "notifications",
+        sa.Column("actors", postgresql.JSONB(astext_type=sa.Text()), server_default="[]", nullable=False),
+    )
+    op.execute(
+        """
+        UPDATE notifications
+        SET actors = jsonb_build_array(
+            jsonb_build_object(
+                'user_id', user_id, 'first_name', first_name, 'last_name', last_name, 'avatar_url', avatar
+            )
+        )
+        """
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("notifications", "actors")
+    op.drop_column("notifications", "actors_count")
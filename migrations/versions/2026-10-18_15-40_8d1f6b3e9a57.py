@@ -0,0 +1,76 @@
+"""unread notifications counter
+
+Revision ID: 8d1f6b3e9a57
+Revises: e7a3c9f4b210
+Create Date: 2026-10-18 15:40:09.827361
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "8d1f6b3e9a57"
+down_revision = "e7a3c9f4b210"
+branch_labels = None
+depends_on = None
+
+# (owner_id, delta) of unread notifications per statement
+UNREAD_CHANGES = {
+    "INSERT": "SELECT owner_id, 1 AS delta FROM new_rows WHERE status = 'UNREADED'",
+    "UPDATE": """
+        SELECT n.owner_id, (n.status = 'UNREADED')::int - (o.status = 'UNREADED')::int AS delta
+        FROM new_rows n JOIN old_rows o USING (id)
+    """,
+    "DELETE": "SELECT owner_id, -1 AS delta FROM old_rows WHERE status = 'UNREADED'",
+}
+
+UNREAD_APPLY = """
+    UPDATE users SET unread_notifications_count = coalesce(users.unread_notifications_count, 0) + d.delta
+    FROM (SELECT owner_id, sum(delta) AS delta FROM ({changes}) changes GROUP BY owner_id HAVING sum(delta) <> 0) d
+    WHERE users.id = d.owner_id;
+"""
+
+
+def upgrade() -> None:
+    op.add_column("users", sa.Column("unread_notifications_count", sa.Integer(), server_default="0", nullable=True))
+    op.execute(
+        """
+        UPDATE users SET unread_notifications_count = unread.count
+        FROM (SELECT owner_id, count(*) AS count FROM notifications WHERE status = 'UNREADED' GROUP BY owner_id) unread
+        WHERE users.id = unread.owner_id
+        """
+    )
+
+    # same shape as comments_counters and friends_counters
+    op.execute(
+        f"""
+        CREATE FUNCTION notifications_counters() RETURNS trigger LANGUAGE plpgsql AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                {UNREAD_APPLY.format(changes=UNREAD_CHANGES["INSERT"])}
+            ELSIF TG_OP = 'UPDATE' THEN
+                {UNREAD_APPLY.format(changes=UNREAD_CHANGES["UPDATE"])}
+            ELSE
+                {UNREAD_APPLY.format(changes=UNREAD_CHANGES["DELETE"])}
+            END IF;
+            RETURN NULL;
+        END;
+        $$
+        """
+    )
+    referencing = {"INSERT": "NEW TABLE AS new_rows", "UPDATE": "NEW TABLE AS new_rows OLD TABLE AS old_rows"}
+    referencing["DELETE"] = "OLD TABLE AS old_rows"
+    for event, tables in referencing.items():
+        op.execute(
+            f"""
+            CREATE TRIGGER notifications_counters_{event.lower()} AFTER {event} ON notifications
+            REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION notifications_counters()
+            """
+        )
+
+
+def downgrade() -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS notifications_counters_{event} ON notifications")
+    op.execute("DROP FUNCTION IF EXISTS notifications_counters()")
+    op.drop_column("users", "unread_notifications_count")
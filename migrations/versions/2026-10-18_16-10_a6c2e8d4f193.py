@@ -0,0 +1,134 @@
+"""partition notifications by month
+
+Revision ID: a6c2e8d4f193
+Revises: 8d1f6b3e9a57
+Create Date: 2026-10-18 16:10:44.051238
+
+"""
+from datetime import date
+
+import sqlalchemy as sa
+from alembic import op
+from sqlalchemy.dialects import postgresql
+
+# revision identifiers, used by Alembic.
+revision = "a6c2e8d4f193"
+down_revision = "8d1f6b3e9a57"
+branch_labels = None
+depends_on = None
+
+PARTITIONS_AHEAD = 2  # months, further ones are created by maintain_notification_partitions task
+
+COLUMNS = (
+    "id, created_at, owner_id, user_id, text, status, avatar, first_name, last_name, type, "
+    "initiative_id, initiative_image, actors_count, actors"
+)
+
+# same as in 8d1f6b3e9a57
+UNREAD_CHANGES = {
+    "INSERT": "SELECT owner_id, 1 AS delta FROM new_rows WHERE status = 'UNREADED'",
+    "UPDATE": """
+        SELECT n.owner_id, (n.status = 'UNREADED')::int - (o.status = 'UNREADED')::int AS delta
+        FROM new_rows n JOIN old_rows o USING (id)
+    """,
+    "DELETE": "SELECT owner_id, -1 AS delta FROM old_rows WHERE status = 'UNREADED'",
+}
+
+UNREAD_APPLY = """
+    UPDATE users SET unread_notifications_count = coalesce(users.unread_notifications_count, 0) + d.delta
+    FROM (SELECT owner_id, sum(delta) AS delta FROM ({changes}) changes GROUP BY owner_id HAVING sum(delta) <> 0) d
+    WHERE users.id = d.owner_id;
+"""
+
+
+def add_months(month: date, months: int) -> date:
+    year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+    return date(year, month_index + 1, 1)
+
+
+def create_notifications_table(name: str, **kwargs) -> None:
+    op.create_table(
+        name,
+        sa.Column("owner_id", sa.UUID(), nullable=False),
+        sa.Column("user_id", sa.UUID(), nullable=False),
+        sa.Column("text", sa.VARCHAR(length=350), nullable=True),
+        sa.Column("status", sa.String(length=8), server_default="UNREADED", nullable=False),
+        sa.Column("avatar", sa.VARCHAR(length=500), nullable=True),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False),
+        sa.Column("first_name", sa.VARCHAR(length=50), nullable=True),
+        sa.Column("last_name", sa.VARCHAR(length=50), nullable=True),
+        sa.Column("type", sa.String(length=14), nullable=False),
+        sa.Column("initiative_id", sa.UUID(), nullable=True),
+        sa.Column("initiative_image", sa.String(length=500), nullable=True),
+        sa.Column("actors_count", sa.Integer(), server_default="1", nullable=False),
+        sa.Column("actors", postgresql.JSONB(astext_type=sa.Text()), server_default="[]", nullable=False),
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.ForeignKeyConstraint(["owner_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["user_id"], ["users.id"], ondelete="CASCADE"),
+        sa.ForeignKeyConstraint(["initiative_id"], ["initiatives.id"], ondelete="CASCADE"),
+        **kwargs,
+    )
+
+
+def drop_unread_trigger() -> None:
+    for event in ("insert", "update", "delete"):
+        op.execute(f"DROP TRIGGER IF EXISTS notifications_counters_{event} ON notifications")
+
+
+def create_unread_trigger() -> None:
+    # function notifications_counters() is kept, only triggers are bound to the new table
+    referencing = {"INSERT": "NEW TABLE AS new_rows", "UPDATE": "NEW TABLE AS new_rows OLD TABLE AS old_rows"}
+    referencing["DELETE"] = "OLD TABLE AS old_rows"
+    for event, tables in referencing.items():
+        op.execute(
+            f"""
+            CREATE TRIGGER notifications_counters_{event.lower()} AFTER {event} ON notifications
+            REFERENCING {tables} FOR EACH STATEMENT EXECUTE FUNCTION notifications_counters()
+            """
+        )
+
+
+def upgrade() -> None:
+    drop_unread_trigger()
+    op.drop_index("ix_notifications_owner", table_name="notifications")
+    op.rename_table("notifications", "notifications_old")
+
+    create_notifications_table(
+        "notifications",
+        sa.PrimaryKeyConstraint("id", "created_at", name="notifications_id_created_at_pkey"),
+        postgresql_partition_by="RANGE (created_at)",
+    )
+    op.execute("CREATE TABLE notifications_default PARTITION OF notifications DEFAULT")
+
+    first_created = op.get_bind().execute(sa.text("SELECT min(created_at) FROM notifications_old")).scalar()
+    month = (first_created.date() if first_created else date.today()).replace(day=1)
+    last_month = add_months(date.today().replace(day=1), PARTITIONS_AHEAD)
+    while month <= last_month:
+        next_month = add_months(month, 1)
+        op.execute(
+            f"CREATE TABLE notifications_{month:%Y_%m} PARTITION OF notifications "
+            f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+        )
+        month = next_month
+
+    op.execute(
+        f"""
+        INSERT INTO notifications ({COLUMNS})
+        SELECT {COLUMNS.replace("created_at", "coalesce(created_at, now())")} FROM notifications_old
+        """
+    )
+    op.drop_table("notifications_old")
+    op.create_index("ix_notifications_owner", "notifications", ["owner_id", "created_at", "id"])
+    create_unread_trigger()
+
+
+def downgrade() -> None:
+    drop_unread_trigger()
+    op.drop_index("ix_notifications_owner", table_name="notifications")
+    op.rename_table("notifications", "notifications_partitioned")
+
+    create_notifications_table("notifications", sa.PrimaryKeyConstraint("id"), sa.UniqueConstraint("id"))
+    op.execute(f"INSERT INTO notifications ({COLUMNS}) SELECT {COLUMNS} FROM notifications_partitioned")
+    op.drop_table("notifications_partitioned")  # partitions are dropped with it
+    op.create_index("ix_notifications_owner", "notifications", ["owner_id", "created_at", "id"])
+    create_unread_trigger()
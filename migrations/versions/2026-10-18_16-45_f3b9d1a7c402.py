@@ -0,0 +1,32 @@
+"""storage files by sha256
+
+Revision ID: f3b9d1a7c402
+Revises: a6c2e8d4f193
+Create Date: 2026-10-18 16:45:21.693018
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "f3b9d1a7c402"
+down_revision = "a6c2e8d4f193"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "storage_files",
+        sa.Column("sha256", sa.CHAR(length=64), nullable=False),
+        sa.Column("url", sa.VARCHAR(length=500), nullable=False),
+        sa.Column("created_at", sa.DateTime(), server_default=sa.text("now()"), nullable=True),
+        sa.Column("id", sa.UUID(), nullable=False),
+        sa.PrimaryKeyConstraint("id"),
+        sa.UniqueConstraint("id"),
+        sa.UniqueConstraint("sha256"),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("storage_files")
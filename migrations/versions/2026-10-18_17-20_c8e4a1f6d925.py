@@ -0,0 +1,25 @@
+"""storage files last_used_at
+
+Revision ID: c8e4a1f6d925
+Revises: f3b9d1a7c402
+Create Date: 2026-10-18 17:20:37.514260
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "c8e4a1f6d925"
+down_revision = "f3b9d1a7c402"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "storage_files", sa.Column("last_used_at", sa.DateTime(), server_default=sa.text("now()"), nullable=False)
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("storage_files", "last_used_at")
@@ -0,0 +1,24 @@
+"""notifications last_event_id
+
+Revision ID: 9a3f7c2e1b84
+Revises: c8e4a1f6d925
+Create Date: 2026-10-18 18:05:44.102937
+
+"""
+import sqlalchemy as sa
+from alembic import op
+
+# revision identifiers, used by Alembic.
+revision = "9a3f7c2e1b84"
+down_revision = "c8e4a1f6d925"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # added to the partitioned table, so every partition gets it
+    op.add_column("notifications", sa.Column("last_event_id", sa.VARCHAR(length=32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("notifications", "last_event_id")
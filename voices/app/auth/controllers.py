@@ -11,6 +11,7 @@ from voices.app.core.exceptions import (
 )
 from voices.app.core.protocol import Response
 from voices.app.friends.models import Friend, RelationshipType
+from voices.app.notifications.models import FirebaseApp
 from voices.auth.hash import get_password_hash, verify_password
 from voices.auth.jwt_token import (
     JWTBearer,
@@ -31,6 +32,7 @@ from .views import (
     CheckUserLogin,
     CityListView,
     OwnProfileView,
+    ProfileUpdatedView,
     ProfileUpdateView,
     ProfileView,
     Token,
@@ -58,8 +60,8 @@ async def register_user(body: UserRegister):
             city=body.city,
         )
 
-        access_token, exp = create_access_token(TokenData(sub=user.id.hex, role=user.role))
-        refresh_token = create_refresh_token(TokenData(sub=user.id.hex, role=user.role))
+        access_token, exp = create_access_token(TokenData.from_user(user))
+        refresh_token = create_refresh_token(TokenData.from_user(user))
 
         try:
             await create_user(user_id=user.id, email=user.email)
@@ -99,9 +101,11 @@ async def authenticate_user(body: UserLogin):
         raise UserNotFoundError
     if not verify_password(body.password, user.hashed_password):
         raise PasswordMatchError
+    async with Transaction():
+        await FirebaseApp.touch(owner=user.id)
 
-    access_token, exp = create_access_token(TokenData(sub=user.id.hex, role=user.role))
-    refresh_token = create_refresh_token(TokenData(sub=user.id.hex, role=user.role))
+    access_token, exp = create_access_token(TokenData.from_user(user))
+    refresh_token = create_refresh_token(TokenData.from_user(user))
 
     try:
         rocketchat_response = await login_user(user_id=user.id)
@@ -131,12 +135,14 @@ async def post_refresh_token(body: Token):
     _token = decode_token(body.refresh_token)
     async with Transaction():
         user = await User.get_by_id(_token.sub)
+        if user:
+            await FirebaseApp.touch(owner=user.id)
 
     if not user:
         raise UserNotFoundError
 
-    access_token, exp = create_access_token(TokenData(sub=user.id.hex, role=user.role))
-    refresh_token = create_refresh_token(TokenData(sub=user.id.hex, role=user.role))
+    access_token, exp = create_access_token(TokenData.from_user(user))
+    refresh_token = create_refresh_token(TokenData.from_user(user))
 
     return Response(
         payload=TokenView(
@@ -160,7 +166,7 @@ def get_conflicting_field(err: IntegrityError) -> tuple[str, str] | None:
         return match["field"], match["value"]
 
 
-@router.patch("/profile", response_model=Response[ProfileView])  # TODO: to profile module
+@router.patch("/profile", response_model=Response[ProfileUpdatedView])  # TODO: to profile module
 async def update_profile(body: ProfileUpdateView, token: TokenData = Depends(JWTBearer())):
     unset = body.dict(exclude_unset=True)
 
@@ -171,7 +177,13 @@ async def update_profile(body: ProfileUpdateView, token: TokenData = Depends(JWT
         field, _ = get_conflicting_field(exc)
         raise ValidationError(payload={"fields": [field]})
 
-    return Response(payload=ProfileView.from_orm(user))
+    profile = ProfileUpdatedView.from_orm(user)
+    token_data = TokenData.from_user(user)
+    if token_data.city != token.city:  # city claim is trusted by handlers, client must switch to new tokens
+        profile.access_token, _ = create_access_token(token_data)
+        profile.refresh_token = create_refresh_token(TokenData.from_user(user))
+
+    return Response(payload=profile)
 
 
 @router.get("/profile", response_model=Response[OwnProfileView])
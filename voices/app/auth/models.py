@@ -2,10 +2,12 @@ import uuid
 from datetime import date, datetime
 from enum import StrEnum
 from functools import lru_cache
+from typing import AsyncIterator
 
 import sqlalchemy as sa
 from sqlalchemy.orm import Mapped, load_only
 
+from voices.config import settings
 from voices.db.connection import db_session
 from voices.models import BaseDatetimeModel
 from voices.utils import count_max_length
@@ -15,11 +17,14 @@ CITY_MAPPING = {  # TODO: to EN naming
     "Ростов": 2,
     "Тутаев": 3,
 }
+CITY_BY_ID = {city_id: city for city, city_id in CITY_MAPPING.items()}
 
 
 class User(BaseDatetimeModel):
     __tablename__ = "users"
 
+    __table_args__ = (sa.Index("ix_users_created", "created_at", "id"),)
+
     class Role(StrEnum):  # TODO: all enum to numbers
         CITIZEN = "citizen"
         GOVERNMENT = "government"
@@ -50,6 +55,7 @@ class User(BaseDatetimeModel):
     email_approved: Mapped[bool] = sa.Column(sa.Boolean, nullable=True, default=False)  # TODO: to server_default
     phone: Mapped[str] = sa.Column(sa.String, nullable=True, unique=True)
     friends_count: Mapped[int] = sa.Column(sa.Integer, server_default="0")
+    unread_notifications_count: Mapped[int] = sa.Column(sa.Integer, server_default="0")
 
     @staticmethod
     async def get_all():
@@ -68,23 +74,42 @@ class User(BaseDatetimeModel):
         query = (
             sa.select(User)
             .where(User.email == email)
-            .options(load_only(User.id, User.email, User.role, User.hashed_password, User.deleted_at))
+            .options(load_only(User.id, User.email, User.role, User.city, User.hashed_password, User.deleted_at))
         )
         result = (await db_session.get().execute(query)).scalars().first()
         return result
 
+    @staticmethod
+    async def stream_image_urls() -> AsyncIterator[str]:
+        query = sa.select(User.image_url).where(User.image_url.is_not(None))
+        result = await db_session.get().stream_scalars(query.execution_options(yield_per=settings.STORAGE_GC_BATCH))
+        async for url in result:
+            yield url
+
     @staticmethod
     async def get_email_by_id(id: uuid.UUID):
         query = sa.select(User.email).where(User.id == id).where(User.deleted_at.is_(None))
         result = await db_session.get().execute(query)
         return result.scalar_one_or_none()
 
+    @staticmethod
+    async def get_city_by_id(id: uuid.UUID) -> str | None:
+        query = sa.select(User.city).where(User.id == id)
+        result = await db_session.get().execute(query)
+        return result.scalar_one_or_none()
+
     @staticmethod
     async def get_by_id(id: uuid.UUID):
         query = sa.select(User).where(User.id == id).where(User.deleted_at.is_(None))
         result = (await db_session.get().execute(query)).scalars().first()
         return result
 
+    @staticmethod
+    async def get_by_ids(ids: set[uuid.UUID]) -> list["User"]:
+        query = sa.select(User).where(User.id.in_(ids)).where(User.deleted_at.is_(None))
+        result = await db_session.get().execute(query)
+        return result.scalars().all()
+
     @staticmethod
     async def get_profile(user_id: uuid.UUID):
         query = sa.select(User).where(User.id == user_id)
@@ -116,7 +141,7 @@ class User(BaseDatetimeModel):
         return await db_session.get().execute(query)
 
     @staticmethod
-    async def search_by_pattern(pattern: str, city: str, last_id: str | None = None, is_total: bool = False):
+    async def search_by_pattern(pattern: str, city: str, after: tuple | None = None, is_total: bool = False):
         selected = sa.func.count(User.id) if is_total else User
         query = sa.select(selected).where(User.deleted_at.is_(None))
         if pattern:
@@ -132,11 +157,11 @@ class User(BaseDatetimeModel):
                 )
                 & (User.city == city)  # TODO: city to indexed number
             )
-        if last_id:
-            query = query.where(User.id < last_id)
+        if after:
+            query = query.where(sa.tuple_(User.created_at, User.id) < sa.tuple_(*after))
 
         if not is_total:
-            query = query.limit(20).order_by(User.id.desc())
+            query = query.limit(settings.DEFAULT_PAGE_SIZE + 1).order_by(User.created_at.desc(), User.id.desc())
 
         result = await db_session.get().execute(query)
         if is_total:
@@ -144,15 +169,13 @@ class User(BaseDatetimeModel):
         return result.scalars().all()
 
     @staticmethod
-    async def increment_friends_count(user_list: list[str]) -> int:
-        query = (
-            sa.update(User).where(User.id.in_(user_list)).values(friends_count=User.friends_count + 1).returning(User)
-        )
-        await db_session.get().scalar(query)
+    async def get_friends_count(user_id: str) -> int:
+        query = sa.select(User.friends_count).where(User.id == user_id)
+        result = await db_session.get().execute(query)
+        return result.scalar_one_or_none() or 0
 
     @staticmethod
-    async def decrement_friends_count(user_list: list[str]) -> int:
-        query = (
-            sa.update(User).where(User.id.in_(user_list)).values(friends_count=User.friends_count - 1).returning(User)
-        )
-        await db_session.get().scalar(query)
+    async def get_unread_notifications_count(user_id: str) -> int:
+        query = sa.select(User.unread_notifications_count).where(User.id == user_id)
+        result = await db_session.get().execute(query)
+        return result.scalar_one_or_none() or 0
@@ -6,8 +6,10 @@ from pydantic import AnyUrl, EmailStr
 import pydantic
 
 from voices.app.core.protocol import BaseModel, PhoneNumber
+from voices.config import settings
+from voices.utils import ImageRole, image_variant
 
-from .models import User
+from .models import CITY_MAPPING, User
 
 
 class Token(BaseModel):
@@ -28,8 +30,13 @@ class TokenData(BaseModel):
     sub: str
     email: EmailStr | None
     role: User.Role
+    city: int | None = None  # id from CITY_MAPPING, None for cities outside of it
     exp: datetime | None
 
+    @classmethod
+    def from_user(cls, user: User) -> "TokenData":
+        return cls(sub=user.id.hex, role=user.role, city=CITY_MAPPING.get(user.city or settings.DEFAULT_CITY))
+
 
 class CheckUserLogin(BaseModel):
     email: EmailStr
@@ -72,6 +79,11 @@ class ProfileView(BaseModel):
     friends_count: int
 
 
+class ProfileUpdatedView(ProfileView):
+    access_token: str | None = None
+    refresh_token: str | None = None
+
+
 class OwnProfileView(BaseModel):
     id: uuid.UUID | str
     first_name: str | None = None
@@ -95,13 +107,7 @@ class UserView(BaseModel):
 
     @pydantic.validator("image_url", pre=True)
     def prepare_public_file(cls, v: str, values):
-        if not v.startswith("https://storage.yandexcloud"):
-            return v
-        if "min" in v:
-            return v
-        filename = v.split("/")[-1]
-        name, file_ext = filename.split(".")
-        return f"https://storage.yandexcloud.net/my-city/{name}-min.{file_ext}"
+        return image_variant(v, ImageRole.AVATAR)
 
 
 class SearchListView(BaseModel):
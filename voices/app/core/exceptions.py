@@ -83,6 +83,11 @@ class AlreadyUnlikedError(ApiException):
     status_code = 400
 
 
+class AlreadySupportedError(ApiException):
+    message = "Post already supported"
+    status_code = 400
+
+
 class AlreadyUnsupportedError(ApiException):
     message = "Post already unsupported"
     status_code = 400
@@ -108,6 +113,11 @@ class FileTooLargeError(ApiException):
     message = f"Max file size: {settings.FILE_MAX_SIZE_MB} Mb"
 
 
+class TooManyUploadsError(ApiException):
+    status_code = 503
+    message = "Too many uploads, try again later"
+
+
 class NeedEmailConfirmation(ApiException):
     status_code = 400
     message = "You need to confirm email"
@@ -1,4 +1,10 @@
-from typing import Generic, TypeVar
+import base64
+import binascii
+import hashlib
+import hmac
+import uuid
+from datetime import datetime
+from typing import Callable, Generic, TypeVar
 
 import orjson
 import phonenumbers
@@ -8,10 +14,13 @@ from pydantic import Field
 from pydantic.generics import GenericModel as PydanticGenericModel
 from pydantic.validators import strict_str_validator
 
+from voices.app.core.exceptions import ValidationError
 from voices.config import settings
 
 DataT = TypeVar("DataT")
 
+SRID = 4326  # WGS 84, lon/lat in degrees
+
 
 def orjson_dumps(v, *, default):
     return orjson.dumps(v, default=default).decode()
@@ -51,6 +60,66 @@ class PaginationView(BaseModel):
     total: int = 0
     limit: int = settings.DEFAULT_PAGE_SIZE
     is_next: bool = True
+    cursor: str | None = Field(None, description="Курсор следующей страницы")
+
+
+class Cursor:
+    """
+    Opaque keyset cursor: sort key of the last row and fingerprint of list filters, signed with hmac
+    """
+
+    secret = hashlib.sha256(settings.AUTH_PRIVATE_KEY_DATA.encode()).digest()
+
+    @staticmethod
+    def _b64encode(data: bytes) -> str:
+        return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+    @staticmethod
+    def _b64decode(data: str) -> bytes:
+        return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+    @classmethod
+    def _sign(cls, payload: bytes) -> str:
+        return cls._b64encode(hmac.digest(cls.secret, payload, "sha256")[:12])
+
+    @staticmethod
+    def _fingerprint(filters: str) -> str:
+        return hashlib.sha256(filters.encode()).hexdigest()[:8]
+
+    @classmethod
+    def encode(cls, key: tuple, filters: str = "") -> str:
+        payload = orjson.dumps([cls._fingerprint(filters), *key])
+        return f"{cls._b64encode(payload)}.{cls._sign(payload)}"
+
+    @classmethod
+    def decode(
+        cls, cursor: str | None, filters: str = "", parsers: tuple = (datetime.fromisoformat, uuid.UUID)
+    ) -> tuple | None:
+        if not cursor:
+            return None
+        try:
+            data, signature = cursor.split(".")
+            payload = cls._b64decode(data)
+            if not hmac.compare_digest(signature, cls._sign(payload)):
+                raise ValidationError(message="Invalid cursor")
+            fingerprint, *key = orjson.loads(payload)
+            if fingerprint != cls._fingerprint(filters) or len(key) != len(parsers):
+                raise ValidationError(message="Cursor does not match filters")
+            return tuple(parse(value) for parse, value in zip(parsers, key))
+        except (ValueError, TypeError, binascii.Error) as e:
+            raise ValidationError(message="Invalid cursor") from e
+
+
+def split_page(
+    rows: list, key: Callable, filters: str = "", limit: int = settings.DEFAULT_PAGE_SIZE
+) -> tuple[list, str | None]:
+    """
+    Rows are selected with limit + 1, the extra row only tells that the next page exists
+    """
+    page = rows[:limit]
+    if len(rows) <= limit:
+        return page, None
+    return page, Cursor.encode(key(page[-1]), filters)
 
 
 class GeometryPoint(BaseModel):
@@ -61,7 +130,7 @@ class GeometryPoint(BaseModel):
     def to_str(location: dict):
         if not location:
             return None
-        return f'POINT({location["lat"]} {location["lon"]})'
+        return f'SRID={SRID};POINT({location["lon"]} {location["lat"]})'
 
     @classmethod
     def __get_validators__(cls):
@@ -73,7 +142,14 @@ class GeometryPoint(BaseModel):
             return v
 
         shape = to_shape(v)
-        return {"lat": shape.x, "lon": shape.y}
+        return {"lat": shape.y, "lon": shape.x}
+
+
+class BoundingBox(BaseModel):
+    min_lat: float
+    min_lon: float
+    max_lat: float
+    max_lon: float
 
 
 class PhoneNumber(str):
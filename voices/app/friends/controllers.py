@@ -1,16 +1,15 @@
-from uuid import UUID
-
 from fastapi import APIRouter, Depends, Query
 from sqlalchemy.exc import IntegrityError
 
 from voices.app.auth.views import TokenData
 from voices.app.core.exceptions import FriendAlreadyAddedError
-from voices.app.core.protocol import Response
+from voices.app.core.protocol import Cursor, Response, split_page
 from voices.app.friends.models import Friend, User
 from voices.app.friends.views import FriendListView, PaginationView
-from voices.auth.jwt_token import JWTBearer
-from voices.broker.tasks.notification import EventName, send_notification
+from voices.auth.jwt_token import JWTBearer, get_token_city
+from voices.broker.tasks.notification import EventName
 from voices.db.connection import Transaction
+from voices.redis import Redis
 
 router = APIRouter()
 
@@ -18,20 +17,23 @@ router = APIRouter()
 @router.get("/users", response_model=Response[FriendListView])
 async def get_users(
     pattern: str | None = None,
-    last_id: str | None = None,
+    cursor: str | None = None,
     token: TokenData = Depends(JWTBearer()),
 ):
     async with Transaction():
-        user = await User.get_by_id(id=token.sub)  # optimize queries index of city in token
-        users = await User.search_by_pattern(
-            pattern=pattern, last_id=last_id, city=user.city
-        )  # TODO: return total in the same def
-        total = await User.search_by_pattern(pattern=pattern, is_total=True, city=user.city)
+        city = await get_token_city(token)
+        fingerprint = f"users:{city}:{pattern or ''}"
+        users = await User.search_by_pattern(pattern=pattern, after=Cursor.decode(cursor, fingerprint), city=city)
+        users, next_cursor = split_page(users, key=lambda user: (user.created_at, user.id), filters=fingerprint)
+        total = await Redis.get_total(
+            f"u:{city}:{pattern or ''}",
+            lambda: User.search_by_pattern(pattern=pattern, is_total=True, city=city),
+        )
 
     return Response(
         payload=FriendListView(
             users=users,
-            pagination=PaginationView(count=len(users), total=total),
+            pagination=PaginationView(count=len(users), total=total, is_next=bool(next_cursor), cursor=next_cursor),
         )
     )
 
@@ -39,18 +41,19 @@ async def get_users(
 @router.get("/friends", response_model=Response[FriendListView])
 async def search_by_pattern(
     pattern: str | None = Query(default=None, min_length=1),
-    last_id: str | None = None,
+    cursor: str | None = None,
     token: TokenData = Depends(JWTBearer()),
 ):
+    fingerprint = f"friends:{token.sub}:{pattern or ''}"
     async with Transaction():
-        users = await Friend.get_friends(user_id=token.sub, pattern=pattern)
-        users = [user.friend if user.friend_id != UUID(token.sub) else user.user for user in users]
-        total = await Friend.get_friends(user_id=token.sub, is_total=True)
+        rows = await Friend.get_friends(user_id=token.sub, pattern=pattern, after=Cursor.decode(cursor, fingerprint))
+        rows, next_cursor = split_page(rows, key=lambda row: (row.friended_at, row.relation_id), filters=fingerprint)
+        total = await User.get_friends_count(user_id=token.sub)  # maintained by trigger
 
     return Response(
         payload=FriendListView(
-            users=users,
-            pagination=PaginationView(count=len(users), total=total),
+            users=[row.User for row in rows],
+            pagination=PaginationView(count=len(rows), total=total, is_next=bool(next_cursor), cursor=next_cursor),
         )
     )
 
@@ -63,10 +66,7 @@ async def add_friend(friend_id: str, token: TokenData = Depends(JWTBearer())):
         except IntegrityError:
             raise FriendAlreadyAddedError
 
-    send_notification.apply_async(
-        kwargs=dict(user_id_send=token.sub, user_id_get=friend_id, status=EventName.REQUEST_FRENDS),
-        retry=False,
-    )
+    await Redis.add_notification(user_id_send=token.sub, user_id_get=friend_id, status=EventName.REQUEST_FRENDS)
 
     return Response()
 
@@ -74,13 +74,9 @@ async def add_friend(friend_id: str, token: TokenData = Depends(JWTBearer())):
 @router.patch("/friends/{friend_id}/approve", response_model=Response)
 async def approve_friend(friend_id: str, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        await Friend.approve_friend(user_id=token.sub, friend_id=friend_id)
-        await User.increment_friends_count(user_list=(token.sub, friend_id))
+        await Friend.approve_friend(user_id=token.sub, friend_id=friend_id)  # friends_count updated by trigger
 
-    send_notification.apply_async(
-        kwargs=dict(user_id_send=token.sub, user_id_get=friend_id, status=EventName.ACCEPT_FRENDS),
-        retry=False,
-    )
+    await Redis.add_notification(user_id_send=token.sub, user_id_get=friend_id, status=EventName.ACCEPT_FRENDS)
 
     return Response()
 
@@ -88,7 +84,6 @@ async def approve_friend(friend_id: str, token: TokenData = Depends(JWTBearer())
 @router.patch("/friends/{friend_id}/remove", response_model=Response)
 async def remove_friend(friend_id: str, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        await Friend.remove_friend(user_id=token.sub, friend_id=friend_id)
-        await User.decrement_friends_count(user_list=(token.sub, friend_id))
+        await Friend.remove_friend(user_id=token.sub, friend_id=friend_id)  # friends_count updated by trigger
 
     return Response()
@@ -1,9 +1,10 @@
 import uuid
 
 import sqlalchemy as sa
-from sqlalchemy.orm import Mapped, load_only, relationship
+from sqlalchemy.orm import Mapped, aliased, load_only, relationship
 
 from voices.app.auth.models import User
+from voices.config import settings
 from voices.db.connection import db_session
 from voices.models import BaseModel
 
@@ -18,7 +19,10 @@ class RelationshipType:
 class Friend(BaseModel):
     __tablename__ = "users_friends"
 
-    __table_args__ = (sa.UniqueConstraint("user_id", "friend_id", name="_user_friend_idx"),)
+    __table_args__ = (
+        sa.UniqueConstraint("user_id", "friend_id", name="_user_friend_idx"),
+        sa.Index("ix_users_friends_friend", "friend_id", "created_at", "id"),
+    )
 
     user_id: Mapped[uuid.UUID] = sa.Column(sa.UUID, sa.ForeignKey("users.id"), nullable=False)
     user: Mapped[User] = relationship("User", foreign_keys="Friend.user_id", lazy="joined")
@@ -49,17 +53,26 @@ class Friend(BaseModel):
         return relationship_type
 
     @staticmethod
-    async def get_friends(user_id: str, last_id: str | None = None, is_total: bool = False, pattern: str | None = None):
-        selected = sa.func.count(Friend.id) if is_total else Friend
+    async def get_friends(user_id: str, after: tuple | None = None, is_total: bool = False, pattern: str | None = None):
+        """
+        Returns (user, friended_at, relation_id) rows, relation can be stored in either direction
+        """
+        other_id = sa.case((Friend.user_id == user_id, Friend.friend_id), else_=Friend.user_id)
+        selected = (
+            [sa.func.count(Friend.id)]
+            if is_total
+            else [User, Friend.created_at.label("friended_at"), Friend.id.label("relation_id")]
+        )
         query = (
-            sa.select(selected)
-            .where(sa.or_(Friend.user_id == user_id) & (Friend.relationship_type == RelationshipType.FRIEND))
-            .where(User.deleted_at.is_(None))
+            sa.select(*selected)
+            .select_from(Friend)
+            .join(User, User.id == other_id)
+            .where(
+                sa.or_(Friend.user_id == user_id, Friend.friend_id == user_id)
+                & (Friend.relationship_type == RelationshipType.FRIEND)
+                & (User.deleted_at.is_(None))
+            )
         )
-        if not is_total:
-            query = query.join(Friend.friend)
-        if last_id:
-            query = query.where(Friend.id < last_id)
 
         if pattern:
             normalized_pattern = pattern.lower()
@@ -73,38 +86,43 @@ class Friend(BaseModel):
                     ),
                 )
             )
-        result = await db_session.get().execute(query)
-        if is_total:
-            friends_count = result.scalar_one()
-        else:
-            friends_friends = result.scalars().all()
-
-        # second part
-        # TODO: to one query
-        selected = sa.func.count(Friend.id) if is_total else Friend
-        query = sa.select(selected).where(
-            sa.or_(Friend.friend_id == user_id) & (Friend.relationship_type == RelationshipType.FRIEND)
-        )
-        if not is_total:
-            query = query.join(Friend.user)
-        if last_id:
-            query = query.where(Friend.id < last_id)
 
-        if pattern:
-            normalized_pattern = pattern.lower()
-            query = query.where(
-                sa.or_(
-                    sa.func.lower(User.first_name).contains(normalized_pattern),
-                    sa.func.lower(User.last_name).contains(normalized_pattern),
-                )
-            )
+        if after:
+            query = query.where(sa.tuple_(Friend.created_at, Friend.id) < sa.tuple_(*after))
+
+        if not is_total:
+            query = query.order_by(Friend.created_at.desc(), Friend.id.desc()).limit(settings.DEFAULT_PAGE_SIZE + 1)
 
         result = await db_session.get().execute(query)
         if is_total:
-            return friends_count + result.scalar_one()
-        friends_users = result.scalars().all()
+            return result.scalar_one()
+        return result.all()
 
-        return friends_friends + friends_users
+    @staticmethod
+    async def reconcile_friends_count() -> int:
+        """
+        Recomputes users.friends_count in one UPDATE, relation counts for both of its users
+        """
+        sides = sa.union_all(
+            sa.select(Friend.user_id.label("user_id")).where(Friend.relationship_type == RelationshipType.FRIEND),
+            sa.select(Friend.friend_id.label("user_id")).where(Friend.relationship_type == RelationshipType.FRIEND),
+        ).subquery("sides")
+        friends = (
+            sa.select(sides.c.user_id, sa.func.count().label("count")).group_by(sides.c.user_id).subquery("friends")
+        )
+        actual = aliased(User, name="actual")
+        counters = (
+            sa.select(actual.id, sa.func.coalesce(friends.c.count, 0).label("friends_count"))
+            .outerjoin(friends, friends.c.user_id == actual.id)
+            .subquery("counters")
+        )
+        query = (
+            sa.update(User)
+            .where((User.id == counters.c.id) & (User.friends_count.is_distinct_from(counters.c.friends_count)))
+            .values(friends_count=counters.c.friends_count)
+        )
+        result = await db_session.get().execute(query)
+        return result.rowcount
 
     @classmethod
     async def add_friend(cls, user_id: str, friend_id: str):
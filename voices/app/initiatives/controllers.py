@@ -1,7 +1,7 @@
 import uuid
 from datetime import datetime
 
-from fastapi import APIRouter, Depends, status
+from fastapi import APIRouter, Depends, Query, status
 
 from voices.app.auth.models import User
 from voices.app.auth.views import TokenData
@@ -12,7 +12,7 @@ from voices.app.core.exceptions import (  # NeedEmailConfirmation,
     ObsceneLanguageError,
     ValidationError,
 )
-from voices.app.core.protocol import PaginationView, Response
+from voices.app.core.protocol import BoundingBox, Cursor, PaginationView, Response, split_page
 from voices.app.core.responses import (
     BadRequestResponse,
     ForbiddenResponse,
@@ -28,236 +28,291 @@ from voices.app.initiatives.views import (
     CommentListView,
     CommentReplyView,
     CommentRequestView,
+    CommentView,
     CreateInitiativeVew,
     InitiativeDetailedView,
     InitiativeListView,
+    InitiativeNearbyListView,
+    InitiativeNearbyView,
     InitiativeView,
+    MapClusterView,
+    MapMarkerView,
+    MapView,
+    ReplyListView,
     SurveyCreate,
     SurveyView,
     SurveyVoteView,
 )
-from voices.auth.jwt_token import JWTBearer
-from voices.broker.tasks.notification import EventName, send_notification
+from voices.auth.jwt_token import JWTBearer, get_token_city
+from voices.broker.tasks.notification import EventName
 from voices.config import settings
 from voices.content_filter import content_filter
 from voices.db.connection import Transaction
 from voices.mongo.models import Survey, SurveyAnswer, SurveyType
+from voices.redis import Redis
 
 router = APIRouter()
 
 
+async def merge_pending_counters(feed: list[InitiativeView]) -> None:
+    """
+    Adds likes/supports deltas which are not flushed to postgres yet
+    """
+    pending = await Redis.get_counters([item.id for item in feed])
+    for initiative_view, counters in zip(feed, pending):
+        initiative_view.likes_count += counters.get("likes_count", 0)
+        initiative_view.supports_count += counters.get("supports_count", 0)
+
+
+async def merge_stored_counters(feed: list[InitiativeView]) -> None:
+    """
+    Likes and supports do not invalidate cached pages, counters flushed after the page was cached come from Redis,
+    the rest of the page, survey blocks included, is up to Redis.feed_expires old
+    """
+    stored = await Redis.get_stored_counters([item.id for item in feed])
+    for initiative_view, counters in zip(feed, stored):
+        initiative_view.likes_count = counters.get("likes_count", initiative_view.likes_count)
+        initiative_view.supports_count = counters.get("supports_count", initiative_view.supports_count)
+
+
 @router.get("/initiatives", response_model=Response[InitiativeListView])
 async def get_feed(
     category: Initiative.Category | None = None,
     role: User.Role | None = None,
-    last_id: uuid.UUID | None = None,
+    cursor: str | None = None,
     status: Initiative.Status | None = None,
     search: str | None = None,
     token: TokenData | None = Depends(JWTBearer(required=False)),
 ):
     user_id = token.sub if token else None
-    city = settings.DEFAULT_CITY
+    filters = f"{category or ''}:{status or ''}:{role or ''}:{search or ''}"
     async with Transaction():
-        if token:
-            user = await User.get_by_id(token.sub)  # TODO: get from token
-            city = user.city or settings.DEFAULT_CITY
-
-        # cache prefix: i
-        # cache_key = ( # cache works but breaks likes
-        #     f"i:{CITY_MAPPING[city]}:{user_id or ''}:{last_id or ''}:{category or ''}:{search or ''}:{role or ''}"
-        # )
-        # cached = await Redis.con.get(cache_key)
-        # cached_total = await Redis.con.get(
-        #     f"it:{CITY_MAPPING[city]}:{last_id or ''}:{category or ''}:{search or ''}:{role or ''}"
-        # )  # TODO: to one call
-        # if cached and cached_total:
-        #     dict_initiatives = json.loads(cached)
-        #     return Response(
-        #         payload=InitiativeListView(
-        #             feed=[InitiativeView.parse_obj(item) for item in dict_initiatives],
-        #             pagination=PaginationView(count=len(dict_initiatives), total=cached_total),
-        #         )
-        #     )
-
-        feed = await Initiative.get_feed(
-            city=city,
-            category=category,
-            last_id=last_id,
-            status=status,
-            role=role,
-            search=search,
-        )
-        total = await Initiative.get_feed(
-            city=city, category=category, status=status, role=role, search=search, is_total=True
-        )
-        liked = await InitiativeLike.get_liked(initiative_list=[item.id for item in feed], user_id=user_id)
-        set_liked = set(map(str, liked))
-        supported = await InitiativeSupport.get_supported(initiative_list=[item.id for item in feed], user_id=user_id)
+        city = await get_token_city(token)
+        fingerprint = f"feed:{city}:{filters}"
+        sort_parser = float if search else datetime.fromisoformat  # rank or created_at
+        after = Cursor.decode(cursor, fingerprint, parsers=(sort_parser, uuid.UUID))
+
+        # shared page is stored without per-user flags, they are applied below
+        version, cached = await Redis.get_feed_page(city=city, filters=f"{filters}:{cursor or ''}")
+        if cached:
+            page = InitiativeListView.parse_raw(cached)
+            await merge_stored_counters(page.feed)
+        else:
+            rows = await Initiative.get_feed(
+                city=city,
+                category=category,
+                after=after,
+                status=status,
+                role=role,
+                search=search,
+            )
+            rows, next_cursor = split_page(rows, key=lambda row: (row.sort, row.Initiative.id), filters=fingerprint)
+            total = await Redis.get_total(
+                f"i:{city}:{category or ''}:{status or ''}:{role or ''}:{search or ''}",
+                lambda: Initiative.get_feed(
+                    city=city, category=category, status=status, role=role, search=search, is_total=True
+                ),
+            )
+            page = InitiativeListView(
+                feed=[InitiativeView.from_orm(row.Initiative) for row in rows],
+                pagination=PaginationView(count=len(rows), total=total, is_next=bool(next_cursor), cursor=next_cursor),
+            )
+
+        initiative_list = [item.id for item in page.feed]
+        liked = await InitiativeLike.get_liked(initiative_list=initiative_list, user_id=user_id)
+        set_liked = set(liked)
+        supported = await InitiativeSupport.get_supported(initiative_list=initiative_list, user_id=user_id)
         set_supported = set(supported)
 
-    response: list[InitiativeView] = []
-    for initiative in feed:
-        initiative_view = InitiativeView.from_orm(initiative)
+    if not cached:
+        await Survey.load_for_feed(page.feed)
+        await Redis.set_feed_page(city=city, version=version, filters=f"{filters}:{cursor or ''}", page=page.json())
+
+    for initiative_view in page.feed:
         initiative_view.is_liked = initiative_view.id in set_liked
         initiative_view.is_supported = initiative_view.id in set_supported
-        survey = await Survey.get(str(initiative_view.id))  # TODO: get back to UUID
-        if survey:
-            initiative_view.survey = survey
-            if token:
-                existing_answer = await SurveyAnswer.find(
-                    SurveyAnswer.user_id == uuid.UUID(token.sub), SurveyAnswer.survey_id == initiative_view.id
-                ).first_or_none()
-                initiative_view.is_voted = bool(existing_answer)
-        response.append(initiative_view)
+    await Survey.load_vote_state(page.feed, user_id=user_id)
+    await merge_pending_counters(page.feed)
 
-    # dict_initiatives = []
-    # for item in response:
-    #     dict_item = json.loads(json.dumps(item, default=lambda o: getattr(o, "__dict__", str(o))))
-    #     dict_initiatives.append(dict_item)
-
-    # await Redis.con.set(name=cache_key, value=json.dumps(dict_initiatives), ex=60)
-    # await Redis.con.set(name=f"it:{CITY_MAPPING[city]}", value=total, ex=60)
-
-    return Response(
-        payload=InitiativeListView(
-            feed=response,
-            pagination=PaginationView(count=len(feed), total=total),
-        )
-    )
+    return Response(payload=page)
 
 
 @router.get("/initiatives/actual", response_model=Response[InitiativeListView])
 async def get_feed_actual(
+    cursor: str | None = None,
     token: TokenData | None = Depends(JWTBearer(required=False)),
 ):
-    city = settings.DEFAULT_CITY
     async with Transaction():
-        if token:
-            user = await User.get_by_id(token.sub)  # TODO: city number to token (e.g. 1 - Yaroslavl)
-            city = user.city or settings.DEFAULT_CITY
-        feed = await Initiative.get_actual(city=city)
-        total = await Initiative.get_actual(city=city, is_total=True)
+        city = await get_token_city(token)
+        fingerprint = f"actual:{city}"
+        feed = await Initiative.get_actual(city=city, after=Cursor.decode(cursor, fingerprint))
+        feed, next_cursor = split_page(
+            feed,
+            key=lambda initiative: (initiative.created_at, initiative.id),
+            filters=fingerprint,
+            limit=settings.ACTUAL_PAGE_SIZE,
+        )
+        total = await Redis.get_total(f"ia:{city}", lambda: Initiative.get_actual(city=city, is_total=True))
 
     return Response(
         payload=InitiativeListView(
             feed=feed,
-            pagination=PaginationView(count=len(feed), total=total),
+            pagination=PaginationView(
+                count=len(feed),
+                total=total,
+                limit=settings.ACTUAL_PAGE_SIZE,
+                is_next=bool(next_cursor),
+                cursor=next_cursor,
+            ),
         )
     )
 
 
-@router.get("/initiatives/maps", response_model=Response[InitiativeListView])
+@router.get("/initiatives/maps", response_model=Response[MapView])
 async def get_feed_maps(
+    min_lat: float = Query(ge=-90, le=90),
+    min_lon: float = Query(ge=-180, le=180),
+    max_lat: float = Query(ge=-90, le=90),
+    max_lon: float = Query(ge=-180, le=180),
+    zoom: int = Query(ge=0, le=22),
     category: Initiative.Category | None = None,
     role: User.Role | None = None,
     status: Initiative.Status | None = None,
     search: str | None = None,
     token: TokenData | None = Depends(JWTBearer(required=False)),
 ):
-    user_id = token.sub if token else None
-    city = settings.DEFAULT_CITY
+    bbox = BoundingBox(min_lat=min_lat, min_lon=min_lon, max_lat=max_lat, max_lon=max_lon)
+    filters = dict(category=category, status=status, role=role, search=search)
     async with Transaction():
-        # TODO: city
-        if token:
-            user = await User.get_by_id(token.sub)
-            city = user.city or settings.DEFAULT_CITY
-        feed = await Initiative.get_feed(
-            city=city,
-            category=category,
-            status=status,
-            role=role,
-            search=search,
-            is_maps=True,
-        )
-        total = await Initiative.get_feed(
-            city=city, category=category, status=status, role=role, search=search, is_total=True
+        city = await get_token_city(token)
+
+        if zoom >= settings.MAP_MARKERS_ZOOM:
+            markers = await Initiative.get_map_markers(city=city, bbox=bbox, **filters)
+            return Response(payload=MapView(markers=[MapMarkerView.from_orm(marker) for marker in markers]))
+
+        cell_size = 360 / 2**zoom * settings.MAP_CLUSTER_CELL_PX / 256  # 256px tiles
+        clusters = await Initiative.get_map_clusters(city=city, bbox=bbox, cell_size=cell_size, **filters)
+
+    return Response(
+        payload=MapView(
+            clusters=[
+                MapClusterView(
+                    count=cluster.count,
+                    location={"lat": cluster.lat, "lon": cluster.lon},
+                    sample_ids=cluster.sample_ids,
+                )
+                for cluster in clusters
+            ]
         )
-        liked = await InitiativeLike.get_liked(initiative_list=[item.id for item in feed], user_id=user_id)
-        set_liked = set(map(str, liked))
-        supported = await InitiativeSupport.get_supported(initiative_list=[item.id for item in feed], user_id=user_id)
-        set_supported = set(map(str, supported))
+    )
+
+
+@router.get("/initiatives/nearby", response_model=Response[InitiativeNearbyListView])
+async def get_nearby(
+    lat: float = Query(ge=-90, le=90),
+    lon: float = Query(ge=-180, le=180),
+    radius: float = Query(default=1000, gt=0, le=settings.NEARBY_MAX_RADIUS),
+    cursor: str | None = None,
+    token: TokenData | None = Depends(JWTBearer(required=False)),
+):
+    user_id = token.sub if token else None
+    fingerprint = f"nearby:{lat}:{lon}:{radius}"
+    after = Cursor.decode(cursor, fingerprint, parsers=(float, uuid.UUID))
+    async with Transaction():
+        rows = await Initiative.get_nearby(lat=lat, lon=lon, radius=radius, after=after)
+        rows, next_cursor = split_page(rows, key=lambda row: (row.distance, row.Initiative.id), filters=fingerprint)
+        initiative_list = [initiative.id for initiative, _ in rows]
+        liked = await InitiativeLike.get_liked(initiative_list=initiative_list, user_id=user_id)
+        set_liked = set(liked)
+        supported = await InitiativeSupport.get_supported(initiative_list=initiative_list, user_id=user_id)
+        set_supported = set(supported)
 
     response = []
-    for initiative in feed:
-        initiative_view = InitiativeView.from_orm(initiative)
+    for initiative, distance in rows:
+        initiative_view = InitiativeNearbyView.from_orm(initiative)
+        initiative_view.distance = distance
         initiative_view.is_liked = initiative_view.id in set_liked
         initiative_view.is_supported = initiative_view.id in set_supported
         response.append(initiative_view)
 
+    await Survey.load_for_feed(response, user_id=user_id)
+    await merge_pending_counters(response)
+
     return Response(
-        payload=InitiativeListView(
+        payload=InitiativeNearbyListView(
             feed=response,
-            pagination=PaginationView(count=len(feed), total=total),
+            pagination=PaginationView(count=len(response), is_next=bool(next_cursor), cursor=next_cursor),
         )
     )
 
 
 @router.get("/initiatives/favorites", response_model=Response[InitiativeListView])
 async def get_favorites(
-    last_id: uuid.UUID | None = None,
+    cursor: str | None = None,
     token: TokenData | None = Depends(JWTBearer()),
 ):
     async with Transaction():
-        if token:
-            user = await User.get_by_id(token.sub)
-            city = user.city or settings.DEFAULT_CITY
-        else:
-            city = settings.DEFAULT_CITY
-        feed = await Initiative.get_favorites(city=city, last_id=last_id, user_id=token.sub)
-        total = await Initiative.get_favorites(city=city, user_id=token.sub, is_total=True)
+        city = await get_token_city(token)
+        fingerprint = f"favorites:{token.sub}:{city}"
+        rows = await Initiative.get_favorites(city=city, after=Cursor.decode(cursor, fingerprint), user_id=token.sub)
+        rows, next_cursor = split_page(rows, key=lambda row: (row.liked_at, row.like_id), filters=fingerprint)
+        total = await Redis.get_total(
+            f"if:{token.sub}:{city}", lambda: Initiative.get_favorites(city=city, user_id=token.sub, is_total=True)
+        )
 
     response = []
-    for initiative in feed:  # TODO: rewrite
-        initiative_view = InitiativeView.from_orm(initiative)
+    for row in rows:  # TODO: rewrite
+        initiative_view = InitiativeView.from_orm(row.Initiative)
         initiative_view.is_liked = True
-        initiative_view.survey = await Survey.get(str(initiative_view.id))
         response.append(initiative_view)
 
+    await Survey.load_for_feed(response, user_id=token.sub)
+    await merge_pending_counters(response)
+
     return Response(
         payload=InitiativeListView(
             feed=response,
-            pagination=PaginationView(count=len(feed), total=total),
+            pagination=PaginationView(count=len(rows), total=total, is_next=bool(next_cursor), cursor=next_cursor),
         )
     )
 
 
 @router.get("/initiatives/my", response_model=Response[InitiativeListView])
 async def get_my(
-    last_id: uuid.UUID | None = None,
+    cursor: str | None = None,
     token: TokenData | None = Depends(JWTBearer()),
     user_id: uuid.UUID | None = None,
 ):
     user_id = user_id or token.sub
     async with Transaction():
-        if token:
-            user = await User.get_by_id(token.sub)
-            city = user.city or settings.DEFAULT_CITY
-        else:
-            city = settings.DEFAULT_CITY
-        feed = await Initiative.get_my(city=city, last_id=last_id, user_id=user_id)
-        total = await Initiative.get_my(city=city, user_id=user_id, is_total=True)
+        city = await get_token_city(token)
+        fingerprint = f"my:{user_id}:{city}"
+        feed = await Initiative.get_my(city=city, after=Cursor.decode(cursor, fingerprint), user_id=user_id)
+        feed, next_cursor = split_page(
+            feed, key=lambda initiative: (initiative.created_at, initiative.id), filters=fingerprint
+        )
+        total = await Redis.get_total(
+            f"im:{user_id}:{city}", lambda: Initiative.get_my(city=city, user_id=user_id, is_total=True)
+        )
         liked = await InitiativeLike.get_liked(initiative_list=[item.id for item in feed], user_id=user_id)
-        set_liked = set(map(str, liked))
+        set_liked = set(liked)
         supported = await InitiativeSupport.get_supported(initiative_list=[item.id for item in feed], user_id=user_id)
-        set_supported = set(map(str, supported))
+        set_supported = set(supported)
 
     response = []
     for initiative in feed:
         initiative_view = InitiativeView.from_orm(initiative)
         initiative_view.is_liked = initiative_view.id in set_liked
         initiative_view.is_supported = initiative_view.id in set_supported
-        initiative_view.survey = await Survey.get(str(initiative_view.id))
-        if initiative_view.survey and token:
-            existing_answer = await SurveyAnswer.find(
-                SurveyAnswer.user_id == uuid.UUID(token.sub), SurveyAnswer.survey_id == initiative_view.id
-            ).first_or_none()
-            initiative_view.is_voted = bool(existing_answer)
         response.append(initiative_view)
 
+    await Survey.load_for_feed(response, user_id=token.sub if token else None)
+    await merge_pending_counters(response)
+
     return Response(
         payload=InitiativeListView(
-            feed=feed,
-            pagination=PaginationView(count=len(feed), total=total),
+            feed=response,
+            pagination=PaginationView(count=len(feed), total=total, is_next=bool(next_cursor), cursor=next_cursor),
         )
     )
 
@@ -268,18 +323,14 @@ async def create_initiative(
     token: TokenData = Depends(JWTBearer()),
 ):
     async with Transaction():
-        if token:
-            user = await User.get_by_id(token.sub)
-            city = user.city or settings.DEFAULT_CITY
-        else:
-            city = settings.DEFAULT_CITY
+        city = await get_token_city(token)
 
         # if not user.email_approved:
         #     raise NeedEmailConfirmation
 
         initiative_id = await Initiative.create(
             city=city,
-            user_id=user.id,
+            user_id=token.sub,
             images=body.images,
             category=body.category,
             location=body.location,
@@ -288,16 +339,14 @@ async def create_initiative(
             event_direction=body.event_direction,
             ar_model=body.ar_model,
         )
-
-    send_notification.apply_async(
-        kwargs=dict(
-            user_id_send=token.sub,
-            user_id_get=token.sub,
-            status=EventName.POST_CREATED,
-            initiative_image=body.images[0],
-            initiative_id=initiative_id,
-        ),
-        retry=False,
+    await Redis.bump_feed_version(city)
+
+    await Redis.add_notification(
+        user_id_send=token.sub,
+        user_id_get=token.sub,
+        status=EventName.POST_CREATED,
+        initiative_image=body.images[0],
+        initiative_id=initiative_id,
     )
 
     return Response()
@@ -315,26 +364,15 @@ async def get_initiative(
     async with Transaction():
         initiative = await Initiative.select(initiative_id)
         liked = await InitiativeLike.get_liked(initiative_list=[initiative.id], user_id=user_id)
-        set_liked = set(map(str, liked))
+        set_liked = set(liked)
         supported = await InitiativeSupport.get_supported(initiative_list=[initiative.id], user_id=user_id)
-        set_supported = set(map(str, supported))
+        set_supported = set(supported)
 
     feed = [InitiativeDetailedView.from_orm(initiative)]
     response = await Survey.get_surveys(feed=feed, token=token, set_liked=set_liked, set_supported=set_supported)
+    await merge_pending_counters(response)
 
-    answer = response[0]  # TODO: rewrite
-
-    if answer.survey and token:
-        existing_answer = await SurveyAnswer.find(
-            SurveyAnswer.user_id == uuid.UUID(token.sub), SurveyAnswer.survey_id == initiative_id
-        ).first_or_none()
-        answer.is_voted = bool(existing_answer)
-        if existing_answer:
-            for i, item in enumerate(existing_answer.blocks):
-                for j, choose in enumerate(item.answer):
-                    answer.survey.blocks[i].answer[j].user_value = choose.value
-
-    return Response(payload=answer)
+    return Response(payload=response[0])
 
 
 @router.delete(
@@ -368,6 +406,8 @@ async def delete_initiative(
         if initiative.user_id.hex != token.sub:
             raise ForbiddenError
         initiative.deleted_at = datetime.now()
+    await Redis.bump_feed_version(initiative.city)
+    await Redis.reset_total(f"im:{token.sub}:{initiative.city}")
 
     return Response()
 
@@ -386,18 +426,73 @@ async def delete_initiative(
         },
     },
 )
-async def get_comments(initiative_id: uuid.UUID, last_id: uuid.UUID = None):
+async def get_comments(initiative_id: uuid.UUID, cursor: str | None = None):
+    fingerprint = f"comments:{initiative_id}"
+    after = Cursor.decode(cursor, fingerprint)
     async with Transaction():
         initiative = await Initiative.get(initiative_id)  # raises 404
-        comments = await Comment.get_comments(initiative_id=initiative_id, last_id=last_id)
-        for comment in comments:
-            replies = [reply for reply in comment.replies if not reply.deleted_at]
-            comment.replies = replies
+        comments = await Comment.get_comments(initiative_id=initiative_id, after=after)
+        comments, next_cursor = split_page(
+            comments, key=lambda comment: (comment.created_at, comment.id), filters=fingerprint
+        )
+        threads = await Comment.get_replies_preview(
+            parent_ids=[comment.id for comment in comments], limit=settings.REPLIES_PREVIEW_SIZE
+        )
+
+    response = []
+    for comment in comments:
+        comment_view = CommentReplyView.from_orm(comment)
+        replies, comment_view.replies_cursor = split_page(
+            threads.get(comment.id, []),
+            key=lambda reply: (reply.created_at, reply.id),
+            filters=f"replies:{comment.id}",
+            limit=settings.REPLIES_PREVIEW_SIZE,
+        )
+        comment_view.replies = [CommentView.from_orm(reply) for reply in replies]
+        response.append(comment_view)
 
     return Response(
         payload=CommentListView(
-            comments=[CommentReplyView.from_orm(item) for item in comments],
-            pagination=PaginationView(total=initiative.comments_count, count=len(comments)),
+            comments=response,
+            pagination=PaginationView(
+                total=initiative.comments_count,
+                count=len(comments),
+                is_next=bool(next_cursor),
+                cursor=next_cursor,
+            ),
+        )
+    )
+
+
+@router.get(
+    "/initiatives/{initiative_id}/comments/{comment_id}/replies",
+    response_model=Response[ReplyListView],
+    responses={
+        status.HTTP_404_NOT_FOUND: {
+            "model": NotFoundResponse,
+            "description": "Comment with id not found",
+        },
+    },
+)
+async def get_replies(initiative_id: uuid.UUID, comment_id: uuid.UUID, cursor: str | None = None):
+    fingerprint = f"replies:{comment_id}"
+    after = Cursor.decode(cursor, fingerprint)
+    async with Transaction():
+        comment = await Comment.get(comment_id)  # raises 404
+        if comment.initiative_id != initiative_id or comment.parent_id:
+            raise ObjectNotFoundError
+        replies = await Comment.get_replies(parent_id=comment_id, after=after)
+        replies, next_cursor = split_page(replies, key=lambda reply: (reply.created_at, reply.id), filters=fingerprint)
+
+    return Response(
+        payload=ReplyListView(
+            replies=[CommentView.from_orm(reply) for reply in replies],
+            pagination=PaginationView(
+                total=comment.replies_count,
+                count=len(replies),
+                is_next=bool(next_cursor),
+                cursor=next_cursor,
+            ),
         )
     )
 
@@ -418,10 +513,9 @@ async def post_comment(
             reply_comment = await Comment.get(reply_id)
             if reply_comment.parent_id:
                 reply_id = reply_comment.parent_id
-        await Comment.post_comment(
+        await Comment.post_comment(  # comments_count and replies_count updated by trigger
             main_text=body.main_text, initiative_id=initiative_id, reply_id=reply_id, user_id=token.sub
         )
-        await Initiative.increment_comments_count(initiative_id=initiative_id)
 
         notification_status = EventName.ANSWERED if reply_id else EventName.COMMENT
         if reply_id:
@@ -429,17 +523,15 @@ async def post_comment(
             user_id_get = comment.user_id
         else:
             user_id_get = initiative.user_id
+    await Redis.bump_feed_version(initiative.city)
 
     if token.sub != user_id_get:
-        send_notification.apply_async(
-            kwargs=dict(
-                user_id_send=token.sub,
-                user_id_get=str(user_id_get),
-                status=notification_status,
-                initiative_image=initiative.images[0],
-                initiative_id=initiative.id,
-            ),
-            retry=False,
+        await Redis.add_notification(
+            user_id_send=token.sub,
+            user_id_get=str(user_id_get),
+            status=notification_status,
+            initiative_image=initiative.images[0],
+            initiative_id=initiative.id,
         )
 
     return Response()
@@ -455,8 +547,9 @@ async def delete_comment(
         comment = await Comment.get(comment_id)
         if comment.user_id.hex != token.sub:
             raise ForbiddenError()
-        await Comment.delete_comment(comment_id=comment_id)
-        await Initiative.decrement_comments_count(initiative_id=initiative_id)
+        await Comment.delete_comment(comment_id=comment_id)  # comments_count updated by trigger
+        initiative = await Initiative.get(initiative_id)
+    await Redis.bump_feed_version(initiative.city)
 
     return Response()
 
@@ -464,19 +557,17 @@ async def delete_comment(
 @router.post("/initiatives/{initiative_id}/like", response_model=Response[CommentReplyView])
 async def post_like(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        initiative = await Initiative.get(initiative_id)
-        await InitiativeLike.post_like(initiative_id=initiative_id, user_id=token.sub)
-        await Initiative.update_likes_count(initiative_id=initiative_id, count=1)
-
-    send_notification.apply_async(
-        kwargs=dict(
-            user_id_send=token.sub,
-            user_id_get=initiative.user_id,
-            status=EventName.LIKE,
-            initiative_image=initiative.images[0],
-            initiative_id=initiative.id,
-        ),
-        retry=False,
+        await Initiative.lock_counted_rows()
+        initiative = await InitiativeLike.post_like(initiative_id=initiative_id, user_id=token.sub)
+        await Redis.incr_counters(initiative_id, {"likes_count": 1})  # before commit, see lock_counted_rows
+    await Redis.reset_total(f"if:{token.sub}:{initiative.city}")
+
+    await Redis.add_notification(
+        user_id_send=token.sub,
+        user_id_get=initiative.user_id,
+        status=EventName.LIKE,
+        initiative_image=initiative.images[0],
+        initiative_id=initiative_id,
     )
 
     return Response()
@@ -485,9 +576,10 @@ async def post_like(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBear
 @router.post("/initiatives/{initiative_id}/unlike", response_model=Response[CommentReplyView])
 async def post_unlike(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        await Initiative.get(initiative_id)
-        await InitiativeLike.delete_like(initiative_id=initiative_id, user_id=token.sub)
-        await Initiative.update_likes_count(initiative_id=initiative_id, count=-1)
+        await Initiative.lock_counted_rows()
+        initiative = await InitiativeLike.delete_like(initiative_id=initiative_id, user_id=token.sub)
+        await Redis.incr_counters(initiative_id, {"likes_count": -1})  # before commit, see lock_counted_rows
+    await Redis.reset_total(f"if:{token.sub}:{initiative.city}")
 
     return Response()
 
@@ -495,9 +587,9 @@ async def post_unlike(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBe
 @router.post("/initiatives/{initiative_id}/support", response_model=Response[CommentReplyView])
 async def post_support(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        await Initiative.get(initiative_id)
+        await Initiative.lock_counted_rows()
         await InitiativeSupport.post_support(initiative_id=initiative_id, user_id=token.sub)
-        await Initiative.update_supports_count(initiative_id=initiative_id, count=1)
+        await Redis.incr_counters(initiative_id, {"supports_count": 1})  # before commit, see lock_counted_rows
 
     return Response()
 
@@ -505,9 +597,9 @@ async def post_support(initiative_id: uuid.UUID, token: TokenData = Depends(JWTB
 @router.post("/initiatives/{initiative_id}/unsupport", response_model=Response[CommentReplyView])
 async def post_unsupport(initiative_id: uuid.UUID, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        await Initiative.get(initiative_id)
+        await Initiative.lock_counted_rows()
         await InitiativeSupport.delete_support(initiative_id=initiative_id, user_id=token.sub)
-        await Initiative.update_supports_count(initiative_id=initiative_id, count=-1)
+        await Redis.incr_counters(initiative_id, {"supports_count": -1})  # before commit, see lock_counted_rows
 
     return Response()
 
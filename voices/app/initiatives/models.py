@@ -1,31 +1,48 @@
 import uuid
 from datetime import date, datetime
 from enum import StrEnum
+from typing import AsyncIterator
 
 import sqlalchemy as sa
-from geoalchemy2 import Geometry
-from sqlalchemy.dialects.postgresql import JSONB
-from sqlalchemy.exc import IntegrityError
-from sqlalchemy.orm import Mapped, joinedload, relationship
+from geoalchemy2 import Geography, Geometry
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB, REGCONFIG, TSVECTOR, aggregate_order_by, insert
+from sqlalchemy.orm import Mapped, aliased, deferred, joinedload, relationship
+from uuid_extensions import uuid7
 
 from voices.app.auth.models import User
 from voices.app.core.exceptions import (
     AlreadyLikedError,
+    AlreadySupportedError,
     AlreadyUnlikedError,
     AlreadyUnsupportedError,
     NotFoundError,
     ObjectNotFoundError,
 )
-from voices.app.core.protocol import GeometryPoint
+from voices.app.core.protocol import SRID, BoundingBox, GeometryPoint
 from voices.config import settings
 from voices.db.connection import db_session
 from voices.models import BaseDatetimeModel, BaseModel
 from voices.utils import count_max_length
 
 
+SEARCH_CONFIG = "russian"
+
+
 class Initiative(BaseDatetimeModel):
     __tablename__ = "initiatives"
 
+    __table_args__ = (
+        sa.Index("ix_initiatives_search_vector", "search_vector", postgresql_using="gin"),
+        sa.Index(
+            "ix_initiatives_feed",
+            "city",
+            "created_at",
+            "id",
+            postgresql_where=sa.text("deleted_at IS NULL AND approved IS TRUE"),
+        ),
+        sa.Index("ix_initiatives_user", "user_id", "created_at", "id"),
+    )
+
     # TODO: to lowercase
     class CitizenCategory(StrEnum):
         PROBLEM = "PROBLEM"
@@ -63,7 +80,7 @@ class Initiative(BaseDatetimeModel):
     images: Mapped[JSONB] = sa.Column(JSONB)
     image_url: Mapped[str] = sa.Column(sa.String(length=2000), nullable=True)  # temp for Django
     category: Mapped[str] = sa.Column(sa.String(length=count_max_length(Category)))
-    location = sa.Column(Geometry("POINT"), nullable=True)
+    location = sa.Column(Geography("POINT", srid=SRID), nullable=True)
     title: Mapped[str] = sa.Column(sa.String(length=100), nullable=False)
     main_text: Mapped[str] = sa.Column(sa.String, nullable=False)
     likes_count: Mapped[int] = sa.Column(sa.Integer, server_default="0", nullable=False)
@@ -78,6 +95,16 @@ class Initiative(BaseDatetimeModel):
     event_direction: Mapped[str] = sa.Column(sa.String(length=100), nullable=True)
     approved: Mapped[bool] = sa.Column(sa.Boolean, nullable=True)
     address: Mapped[str] = sa.Column(sa.String(length=100), nullable=True)
+    search_vector = deferred(
+        sa.Column(
+            TSVECTOR,
+            sa.Computed(
+                f"to_tsvector('{SEARCH_CONFIG}', coalesce(title, '') || ' ' || coalesce(main_text, ''))",
+                persisted=True,
+            ),
+            nullable=True,
+        )
+    )
     # survey_exist TODO: optimize select surveys
 
     @staticmethod
@@ -92,43 +119,121 @@ class Initiative(BaseDatetimeModel):
         result = await db_session.get().execute(query)
         return result.scalars().all()
 
-    @classmethod
-    async def update_likes_count(cls, initiative_id: str, count: int):
-        query = (
-            sa.update(Initiative)
-            .where(Initiative.id == initiative_id)
-            .values(likes_count=Initiative.likes_count + count)
+    @staticmethod
+    async def stream_media_urls(deleted_before: datetime) -> AsyncIterator[str]:
+        """
+        Urls of images and ar models, initiatives deleted before deleted_before do not reference them anymore
+        """
+        is_kept = Initiative.deleted_at.is_(None) | (Initiative.deleted_at > deleted_before)
+        query = sa.union_all(
+            sa.select(sa.func.jsonb_array_elements_text(Initiative.images)).where(
+                is_kept & (sa.func.jsonb_typeof(Initiative.images) == "array")
+            ),
+            sa.select(Initiative.image_url).where(is_kept & Initiative.image_url.is_not(None)),
+            sa.select(Initiative.ar_model).where(is_kept & Initiative.ar_model.is_not(None)),
         )
-        await db_session.get().execute(query)
+        result = await db_session.get().stream_scalars(query.execution_options(yield_per=settings.STORAGE_GC_BATCH))
+        async for url in result:
+            yield url
 
-    @classmethod
-    async def update_supports_count(cls, initiative_id: str, count: int):
-        query = (
-            sa.update(Initiative)
-            .where(Initiative.id == initiative_id)
-            .values(supports_count=Initiative.supports_count + count)
+    @staticmethod
+    async def lock_counters() -> None:
+        """
+        Serializes flushes and reconciliation, a reconcile must not run between popping deltas and applying them
+        """
+        await db_session.get().execute(
+            sa.select(sa.func.pg_advisory_xact_lock(sa.func.hashtext("initiative_counters")))
         )
-        await db_session.get().execute(query)
 
     @staticmethod
-    async def decrement_comments_count(initiative_id: str) -> int:
+    async def lock_counted_rows(shared: bool = True) -> None:
+        """
+        Like and support mutations hold it shared until their delta is in Redis and the row is committed,
+        reconciliation holds it exclusive, so it sees either both the row and the delta or neither
+        """
+        lock = sa.func.pg_advisory_xact_lock_shared if shared else sa.func.pg_advisory_xact_lock
+        await db_session.get().execute(sa.select(lock(sa.func.hashtext("initiative_counted_rows"))))
+
+    @classmethod
+    async def apply_counter_deltas(cls, deltas: dict[str, dict[str, int]]) -> dict[str, dict[str, int]]:
+        """
+        Adds pending likes/supports deltas in one UPDATE ... FROM (VALUES ...), returns resulting counters
+        """
+        rows = [
+            (uuid.UUID(initiative_id), counters.get("likes_count", 0), counters.get("supports_count", 0))
+            for initiative_id, counters in sorted(deltas.items())  # same lock order for concurrent flushes
+        ]
+        values = sa.values(
+            sa.column("id", sa.UUID),
+            sa.column("likes", sa.Integer),
+            sa.column("supports", sa.Integer),
+            name="deltas",
+        ).data(rows)
         query = (
-            sa.update(Initiative)
-            .where(Initiative.id == initiative_id)
-            .values(comments_count=Initiative.comments_count - 1)
-            .returning(Initiative.comments_count)
+            sa.update(cls)
+            .where(cls.id == values.c.id)
+            .values(likes_count=cls.likes_count + values.c.likes, supports_count=cls.supports_count + values.c.supports)
+            .returning(cls.id, cls.likes_count, cls.supports_count)
         )
-        await db_session.get().scalar(query)
+        result = await db_session.get().execute(query)
+        return cls._counters_by_id(result)
 
     @staticmethod
-    async def increment_comments_count(initiative_id: str) -> int:
+    def _counters_by_id(rows) -> dict[str, dict[str, int]]:
+        return {str(row.id): {"likes_count": row.likes_count, "supports_count": row.supports_count} for row in rows}
+
+    @classmethod
+    async def reconcile_counters(cls) -> dict[str, dict[str, int]]:
+        """
+        Recomputes likes, supports and comments counters in one UPDATE, returns counters of fixed initiatives
+        """
+        likes = (
+            sa.select(InitiativeLike.initiative_id, sa.func.count().label("count"))
+            .group_by(InitiativeLike.initiative_id)
+            .subquery("likes")
+        )
+        supports = (
+            sa.select(InitiativeSupport.initiative_id, sa.func.count().label("count"))
+            .group_by(InitiativeSupport.initiative_id)
+            .subquery("supports")
+        )
+        comments = (
+            sa.select(Comment.initiative_id, sa.func.count().label("count"))
+            .where(Comment.deleted_at.is_(None))
+            .group_by(Comment.initiative_id)
+            .subquery("comments")
+        )
+        actual = aliased(cls, name="actual")
+        counters = (
+            sa.select(
+                actual.id,
+                sa.func.coalesce(likes.c.count, 0).label("likes_count"),
+                sa.func.coalesce(supports.c.count, 0).label("supports_count"),
+                sa.func.coalesce(comments.c.count, 0).label("comments_count"),
+            )
+            .outerjoin(likes, likes.c.initiative_id == actual.id)
+            .outerjoin(supports, supports.c.initiative_id == actual.id)
+            .outerjoin(comments, comments.c.initiative_id == actual.id)
+            .subquery("counters")
+        )
         query = (
-            sa.update(Initiative)
-            .where(Initiative.id == initiative_id)
-            .values(comments_count=Initiative.comments_count + 1)
-            .returning(Initiative.comments_count)
+            sa.update(cls)
+            .where(
+                (cls.id == counters.c.id)
+                & (
+                    sa.tuple_(cls.likes_count, cls.supports_count, cls.comments_count)
+                    != sa.tuple_(counters.c.likes_count, counters.c.supports_count, counters.c.comments_count)
+                )
+            )
+            .values(
+                likes_count=counters.c.likes_count,
+                supports_count=counters.c.supports_count,
+                comments_count=counters.c.comments_count,
+            )
+            .returning(cls.id, cls.likes_count, cls.supports_count)
         )
-        await db_session.get().scalar(query)
+        result = await db_session.get().execute(query)
+        return cls._counters_by_id(result)
 
     @classmethod
     async def create(
@@ -176,54 +281,145 @@ class Initiative(BaseDatetimeModel):
             raise NotFoundError()
         return initiative
 
+    @staticmethod
+    def _ts_query(search: str):
+        return sa.func.websearch_to_tsquery(sa.cast(SEARCH_CONFIG, REGCONFIG), search)
+
+    @classmethod
+    def _filter_feed(
+        cls,
+        query: sa.Select,
+        category: Category | None = None,
+        status: Status | None = None,
+        role: User.Role | None = None,
+        search: str | None = None,
+    ) -> sa.Select:
+        if search:
+            query = query.where(cls.search_vector.bool_op("@@")(cls._ts_query(search)))
+
+        if category:
+            query = query.where(cls.category == category)
+
+        if status:
+            query = query.where(cls.status == status)
+
+        if role:
+            query = query.where(cls.user.has(role=role))
+
+        return query
+
     @classmethod
     async def get_feed(
         cls,
         city: str,
         category: Category | None = None,
-        last_id: uuid.UUID | None = None,
+        after: tuple | None = None,
         status: Status | None = None,
         role: User.Role | None = None,
         search: str | None = None,
         is_total: bool = False,
-        is_maps: bool = False,
     ):
-        selected = sa.func.count(cls.id) if is_total else cls
-        query = sa.select(selected).where(
+        """
+        Returns (initiative, sort) rows, sort is search rank or created_at, (sort, id) is the cursor key
+        """
+        sort = sa.func.ts_rank(cls.search_vector, cls._ts_query(search)) if search else cls.created_at
+        selected = [sa.func.count(cls.id)] if is_total else [cls, sort.label("sort")]
+        query = sa.select(*selected).where(
             (cls.city == city) & (cls.deleted_at.is_(None)) & (Initiative.approved.is_(True))
         )
+        query = cls._filter_feed(query, category=category, status=status, role=role, search=search)
 
         if not is_total:
-            query = query.options(
-                joinedload(cls.user).load_only(User.first_name, User.last_name, User.image_url, User.id)
-            ).order_by(cls.id.desc())
+            query = (
+                query.options(joinedload(cls.user).load_only(User.first_name, User.last_name, User.image_url, User.id))
+                .order_by(sort.desc(), cls.id.desc())
+                .limit(settings.DEFAULT_PAGE_SIZE + 1)
+            )
 
-        if not is_maps:
-            query = query.limit(settings.DEFAULT_PAGE_SIZE)
+        if after:
+            query = query.where(sa.tuple_(sort, cls.id) < sa.tuple_(*after))
 
-        if search:
-            query = query.where(cls.title.icontains(search))
+        result = await db_session.get().execute(query)
+        if is_total:
+            return result.scalar_one()
+        return result.all()
 
-        # TODO: unify filters
-        if category:
-            query = query.where(cls.category == category)
+    @classmethod
+    def _map_query(cls, selected: list, city: str, bbox: BoundingBox, **filters) -> sa.Select:
+        envelope = sa.func.ST_MakeEnvelope(bbox.min_lon, bbox.min_lat, bbox.max_lon, bbox.max_lat, SRID)
+        envelope = sa.cast(envelope, Geography(srid=SRID))
+        query = sa.select(*selected).where(
+            (cls.city == city)
+            & (cls.deleted_at.is_(None))
+            & (cls.approved.is_(True))
+            & (cls.location.bool_op("&&")(envelope))
+        )
+        return cls._filter_feed(query, **filters)
 
-        if last_id:
-            query = query.where(cls.id < last_id)
+    @classmethod
+    async def get_map_clusters(cls, city: str, bbox: BoundingBox, cell_size: float, **filters):
+        """
+        Groups initiatives in the viewport by grid cells of cell_size degrees
+        """
+        point = sa.cast(cls.location, Geometry(srid=SRID))
+        lat, lon = sa.func.ST_Y(point), sa.func.ST_X(point)
+        sample_ids = sa.func.array_agg(aggregate_order_by(cls.id, cls.id.desc()), type_=ARRAY(sa.UUID))
+        query = cls._map_query(
+            [
+                sa.func.count(cls.id).label("count"),
+                sa.func.avg(lat).label("lat"),
+                sa.func.avg(lon).label("lon"),
+                sample_ids[1 : settings.MAP_CLUSTER_SAMPLE_SIZE].label("sample_ids"),
+            ],
+            city=city,
+            bbox=bbox,
+            **filters,
+        ).group_by(sa.func.floor(lat / cell_size), sa.func.floor(lon / cell_size))
+        result = await db_session.get().execute(query)
+        return result.all()
 
-        if status:
-            query = query.where(cls.status == status)
+    @classmethod
+    async def get_map_markers(cls, city: str, bbox: BoundingBox, **filters):
+        query = (
+            cls._map_query(
+                [cls.id, cls.location, cls.category, cls.title, cls.images[0].astext.label("image_url")],
+                city=city,
+                bbox=bbox,
+                **filters,
+            )
+            .order_by(cls.id.desc())
+            .limit(settings.MAP_MAX_MARKERS)
+        )
+        result = await db_session.get().execute(query)
+        return result.all()
 
-        if role:
-            query = query.where(cls.user.has(role=role))
+    @classmethod
+    async def get_nearby(cls, lat: float, lon: float, radius: float, after: tuple | None = None):
+        """
+        Returns (initiative, distance in meters) ordered by distance, KNN over the location GiST index
+        """
+        point = sa.cast(sa.func.ST_SetSRID(sa.func.ST_MakePoint(lon, lat), SRID), Geography(srid=SRID))
+        distance = cls.location.op("<->", return_type=sa.Float)(point)
+        query = (
+            sa.select(cls, distance.label("distance"))
+            .where(
+                (cls.deleted_at.is_(None))
+                & (cls.approved.is_(True))
+                & (sa.func.ST_DWithin(cls.location, point, radius))
+            )
+            .options(joinedload(cls.user).load_only(User.first_name, User.last_name, User.image_url, User.id))
+            .order_by(distance, cls.id)
+            .limit(settings.DEFAULT_PAGE_SIZE + 1)
+        )
+
+        if after:
+            query = query.where(sa.tuple_(distance, cls.id) > sa.tuple_(*after))
 
         result = await db_session.get().execute(query)
-        if is_total:
-            return result.scalar_one()
-        return result.scalars().all()
+        return result.all()
 
     @staticmethod
-    async def get_actual(city: str, is_total: bool = False):
+    async def get_actual(city: str, after: tuple | None = None, is_total: bool = False):
         selected = sa.func.count(Initiative.id) if is_total else Initiative
         current_date = date.today()
         query = sa.select(selected).where(
@@ -236,23 +432,33 @@ class Initiative(BaseDatetimeModel):
 
         if not is_total:
             query = (
-                query.limit(settings.ACTUAL_PAGE_SIZE)
+                query.limit(settings.ACTUAL_PAGE_SIZE + 1)
                 .options(
                     joinedload(Initiative.user).load_only(User.first_name, User.last_name, User.id, User.image_url)
                 )
-                .order_by(Initiative.id.desc())
+                .order_by(Initiative.created_at.desc(), Initiative.id.desc())
             )
 
+        if after:
+            query = query.where(sa.tuple_(Initiative.created_at, Initiative.id) < sa.tuple_(*after))
+
         result = await db_session.get().execute(query)
         if is_total:
             return result.scalar_one()
         return result.scalars().all()
 
     @classmethod
-    async def get_favorites(cls, city: str, user_id: str, last_id: str = None, is_total: bool = False):
-        selected = sa.func.count(cls.id) if is_total else cls
+    async def get_favorites(cls, city: str, user_id: str, after: tuple | None = None, is_total: bool = False):
+        """
+        Returns (initiative, liked_at, like_id) rows, newest likes first, (liked_at, like_id) is the cursor key
+        """
+        selected = (
+            [sa.func.count(cls.id)]
+            if is_total
+            else [cls, InitiativeLike.created_at.label("liked_at"), InitiativeLike.id.label("like_id")]
+        )
         query = (
-            sa.select(selected)
+            sa.select(*selected)
             .join(InitiativeLike, cls.id == InitiativeLike.initiative_id)
             .where(
                 (Initiative.city == city)
@@ -266,23 +472,23 @@ class Initiative(BaseDatetimeModel):
 
         if not is_total:
             query = (
-                query.limit(settings.DEFAULT_PAGE_SIZE)
+                query.limit(settings.DEFAULT_PAGE_SIZE + 1)
                 .options(
                     joinedload(Initiative.user).load_only(User.first_name, User.last_name, User.id, User.image_url)
                 )
-                .order_by(cls.id.desc())
+                .order_by(InitiativeLike.created_at.desc(), InitiativeLike.id.desc())
             )
 
-        if last_id:
-            query = query.where(cls.id < last_id)
+        if after:
+            query = query.where(sa.tuple_(InitiativeLike.created_at, InitiativeLike.id) < sa.tuple_(*after))
 
         result = await db_session.get().execute(query)
         if is_total:
             return result.scalar_one()
-        return result.scalars().all()
+        return result.all()
 
     @classmethod
-    async def get_my(cls, city: str, user_id: str, last_id: str = None, is_total: bool = False):
+    async def get_my(cls, city: str, user_id: str, after: tuple | None = None, is_total: bool = False):
         selected = sa.func.count(cls.id) if is_total else cls
         query = sa.select(selected).where(
             (Initiative.city == city)
@@ -290,10 +496,14 @@ class Initiative(BaseDatetimeModel):
         )
 
         if not is_total:
-            query = query.limit(settings.DEFAULT_PAGE_SIZE).options(joinedload(Initiative.user)).order_by(cls.id.desc())
+            query = (
+                query.limit(settings.DEFAULT_PAGE_SIZE + 1)
+                .options(joinedload(Initiative.user))
+                .order_by(cls.created_at.desc(), cls.id.desc())
+            )
 
-        if last_id:
-            query = query.where(cls.id < last_id)
+        if after:
+            query = query.where(sa.tuple_(cls.created_at, cls.id) < sa.tuple_(*after))
 
         result = await db_session.get().execute(query)
         if is_total:
@@ -304,19 +514,24 @@ class Initiative(BaseDatetimeModel):
 class Comment(BaseDatetimeModel):
     __tablename__ = "comments"
 
+    __table_args__ = (
+        sa.Index("ix_comments_initiative", "initiative_id", "created_at", "id"),
+        sa.Index("ix_comments_parent", "parent_id", "created_at", "id"),
+    )
+
     main_text: Mapped[str] = sa.Column(sa.String, nullable=False)
     user_id: Mapped[uuid.UUID] = sa.Column(sa.UUID, sa.ForeignKey("users.id"), nullable=False)
     user: Mapped[User] = relationship("User", foreign_keys="Comment.user_id")
     initiative_id: Mapped[uuid.UUID] = sa.Column(sa.UUID, sa.ForeignKey("initiatives.id"), nullable=False)
     initiative: Mapped[Initiative] = relationship("Initiative", foreign_keys="Comment.initiative_id")
     parent_id: Mapped[uuid.UUID] = sa.Column(sa.UUID, sa.ForeignKey("comments.id"), nullable=True)
-    replies = relationship("Comment", foreign_keys="Comment.parent_id", uselist=True, lazy="joined")
+    replies_count: Mapped[int] = sa.Column(sa.Integer, server_default="0", nullable=False)
 
     @staticmethod
     async def get(value):
         query = sa.select(Comment).where(Comment.id == value)
         try:
-            result = (await db_session.get().execute(query)).unique().scalar_one()
+            result = (await db_session.get().execute(query)).scalar_one()
             return result
         except Exception as e:
             raise ObjectNotFoundError from e
@@ -339,36 +554,132 @@ class Comment(BaseDatetimeModel):
         return await db_session.get().execute(query)
 
     @staticmethod
-    async def get_comments(initiative_id: uuid.UUID, last_id: uuid.UUID | None = None, is_total: bool = False):
+    async def reconcile_replies_count() -> int:
+        replies = (
+            sa.select(Comment.parent_id, sa.func.count().label("count"))
+            .where(Comment.parent_id.is_not(None) & Comment.deleted_at.is_(None))
+            .group_by(Comment.parent_id)
+            .subquery("replies")
+        )
+        parent = aliased(Comment, name="parent")
+        counters = (
+            sa.select(parent.id, sa.func.coalesce(replies.c.count, 0).label("replies_count"))
+            .outerjoin(replies, replies.c.parent_id == parent.id)
+            .where(parent.parent_id.is_(None))
+            .subquery("counters")
+        )
+        query = (
+            sa.update(Comment)
+            .where((Comment.id == counters.c.id) & (Comment.replies_count != counters.c.replies_count))
+            .values(replies_count=counters.c.replies_count)
+        )
+        result = await db_session.get().execute(query)
+        return result.rowcount
+
+    @staticmethod
+    async def get_comments(initiative_id: uuid.UUID, after: tuple | None = None, is_total: bool = False):
         selected = sa.func.count(Comment.id) if is_total else Comment
         query = sa.select(selected).where((Comment.initiative_id == initiative_id) & (Comment.deleted_at.is_(None)))
 
         if not is_total:
             query = (
                 query.where(Comment.parent_id.is_(None))
-                .order_by(Comment.id.desc())
-                .join(Comment.initiative)
-                .options(
-                    joinedload(Comment.user, innerjoin=True),
-                    joinedload(Comment.initiative),
-                    joinedload(Comment.replies).joinedload(Comment.user),
-                )
-                .limit(settings.DEFAULT_PAGE_SIZE)
+                .order_by(Comment.created_at.desc(), Comment.id.desc())
+                .options(joinedload(Comment.user, innerjoin=True))
+                .limit(settings.DEFAULT_PAGE_SIZE + 1)
             )
 
-        if last_id:
-            query = query.where(Comment.id < last_id)
+        if after:
+            query = query.where(sa.tuple_(Comment.created_at, Comment.id) < sa.tuple_(*after))
 
         result = await db_session.get().execute(query)
         if is_total:
             return result.scalar_one()
-        return result.unique().scalars().all()
+        return result.scalars().all()
+
+    @staticmethod
+    async def get_replies_preview(parent_ids: list[uuid.UUID], limit: int) -> dict[uuid.UUID, list["Comment"]]:
+        """
+        First limit + 1 replies of every thread, one LATERAL index scan per parent
+        """
+        if not parent_ids:
+            return {}
+
+        parents = sa.values(sa.column("id", sa.UUID), name="parents").data([(parent_id,) for parent_id in parent_ids])
+        replies = (
+            sa.select(Comment)
+            .where((Comment.parent_id == parents.c.id) & (Comment.deleted_at.is_(None)))
+            .order_by(Comment.created_at, Comment.id)
+            .limit(limit + 1)
+            .lateral("replies")
+        )
+        reply = aliased(Comment, replies)
+        query = (
+            sa.select(reply)
+            .select_from(parents)
+            .join(replies, sa.true())
+            .options(joinedload(reply.user, innerjoin=True))
+            .order_by(reply.parent_id, reply.created_at, reply.id)
+        )
+        result = await db_session.get().execute(query)
+
+        threads = {}
+        for comment in result.scalars().all():
+            threads.setdefault(comment.parent_id, []).append(comment)
+        return threads
+
+    @staticmethod
+    async def get_replies(parent_id: uuid.UUID, after: tuple | None = None):
+        query = (
+            sa.select(Comment)
+            .where((Comment.parent_id == parent_id) & (Comment.deleted_at.is_(None)))
+            .order_by(Comment.created_at, Comment.id)
+            .options(joinedload(Comment.user, innerjoin=True))
+            .limit(settings.DEFAULT_PAGE_SIZE + 1)
+        )
+
+        if after:
+            query = query.where(sa.tuple_(Comment.created_at, Comment.id) > sa.tuple_(*after))
+
+        result = await db_session.get().execute(query)
+        return result.scalars().all()
+
+
+def _reaction_query(model: type[BaseModel], initiative_id: uuid.UUID, user_id: uuid.UUID, is_add: bool) -> sa.Select:
+    """
+    Single statement: initiative lookup chained with reaction insert/delete, no rows when initiative does not exist
+    """
+    target = (
+        sa.select(Initiative.id, Initiative.city, Initiative.user_id, Initiative.images)
+        .where(Initiative.id == initiative_id)
+        .cte("target")
+    )
+    if is_add:
+        reaction = sa.select(sa.literal(uuid7(), sa.UUID), target.c.id, sa.literal(user_id, sa.UUID))
+        changed = (
+            insert(model)
+            .from_select(["id", "initiative_id", "user_id"], reaction)
+            .on_conflict_do_nothing(index_elements=["user_id", "initiative_id"])
+        )
+    else:
+        changed = sa.delete(model).where((model.initiative_id == target.c.id) & (model.user_id == user_id))
+    changed = changed.returning(model.initiative_id).cte("changed")
+
+    return sa.select(
+        target.c.city,
+        target.c.user_id,
+        target.c.images,
+        changed.c.initiative_id.is_not(None).label("is_changed"),
+    ).select_from(target.outerjoin(changed, sa.true()))
 
 
 class InitiativeLike(BaseModel):
     __tablename__ = "initiatives_likes"
 
-    __table_args__ = (sa.UniqueConstraint("user_id", "initiative_id", name="_user_initiative_idx"),)
+    __table_args__ = (
+        sa.UniqueConstraint("user_id", "initiative_id", name="_user_initiative_idx"),
+        sa.Index("ix_initiatives_likes_user", "user_id", "created_at", "id"),
+    )
 
     user_id: Mapped[uuid.UUID] = sa.Column(sa.UUID, sa.ForeignKey("users.id"), nullable=False)
     user: Mapped[User] = relationship("User", foreign_keys="InitiativeLike.user_id")
@@ -401,26 +712,27 @@ class InitiativeLike(BaseModel):
         return result.scalar_one()
 
     @staticmethod
-    async def post_like(initiative_id: uuid.UUID, user_id: uuid.UUID):
-        try:
-            query = sa.insert(InitiativeLike).values(
-                initiative_id=initiative_id,
-                user_id=user_id,
-            )
-            return await db_session.get().execute(query)
-        except IntegrityError:
+    async def post_like(initiative_id: uuid.UUID, user_id: uuid.UUID) -> sa.Row:
+        """
+        Returns city, user_id and images of the liked initiative
+        """
+        query = _reaction_query(InitiativeLike, initiative_id=initiative_id, user_id=user_id, is_add=True)
+        initiative = (await db_session.get().execute(query)).first()
+        if not initiative:
+            raise ObjectNotFoundError
+        if not initiative.is_changed:
             raise AlreadyLikedError
+        return initiative
 
     @staticmethod
-    async def delete_like(initiative_id: uuid.UUID, user_id: uuid.UUID):
-        query = (
-            sa.delete(InitiativeLike)
-            .where((InitiativeLike.initiative_id == initiative_id) & (InitiativeLike.user_id == user_id))
-            .returning(InitiativeLike.id)
-        )
-        result: sa.CursorResult = await db_session.get().execute(query)
-        if not result.scalars().all():
+    async def delete_like(initiative_id: uuid.UUID, user_id: uuid.UUID) -> sa.Row:
+        query = _reaction_query(InitiativeLike, initiative_id=initiative_id, user_id=user_id, is_add=False)
+        initiative = (await db_session.get().execute(query)).first()
+        if not initiative:
+            raise ObjectNotFoundError
+        if not initiative.is_changed:
             raise AlreadyUnlikedError
+        return initiative
 
 
 class InitiativeSupport(BaseModel):
@@ -459,23 +771,24 @@ class InitiativeSupport(BaseModel):
         return result.scalar_one()
 
     @staticmethod
-    async def post_support(initiative_id: uuid.UUID, user_id: uuid.UUID):
-        try:
-            query = sa.insert(InitiativeSupport).values(
-                initiative_id=initiative_id,
-                user_id=user_id,
-            )
-            return await db_session.get().execute(query)
-        except IntegrityError:
-            raise AlreadyLikedError
+    async def post_support(initiative_id: uuid.UUID, user_id: uuid.UUID) -> sa.Row:
+        """
+        Returns city, user_id and images of the supported initiative
+        """
+        query = _reaction_query(InitiativeSupport, initiative_id=initiative_id, user_id=user_id, is_add=True)
+        initiative = (await db_session.get().execute(query)).first()
+        if not initiative:
+            raise ObjectNotFoundError
+        if not initiative.is_changed:
+            raise AlreadySupportedError
+        return initiative
 
     @staticmethod
-    async def delete_support(initiative_id: uuid.UUID, user_id: uuid.UUID):
-        query = (
-            sa.delete(InitiativeSupport)
-            .where((InitiativeSupport.initiative_id == initiative_id) & (InitiativeSupport.user_id == user_id))
-            .returning(InitiativeSupport.id)
-        )
-        result: sa.CursorResult = await db_session.get().execute(query)
-        if not result.scalars().all():
+    async def delete_support(initiative_id: uuid.UUID, user_id: uuid.UUID) -> sa.Row:
+        query = _reaction_query(InitiativeSupport, initiative_id=initiative_id, user_id=user_id, is_add=False)
+        initiative = (await db_session.get().execute(query)).first()
+        if not initiative:
+            raise ObjectNotFoundError
+        if not initiative.is_changed:
             raise AlreadyUnsupportedError
+        return initiative
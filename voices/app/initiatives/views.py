@@ -7,6 +7,7 @@ from pydantic import AnyUrl, Field, root_validator
 from voices.app.core.exceptions import ValidationError
 from voices.app.core.protocol import BaseModel, GeometryPoint, PaginationView
 from voices.mongo.models import SurveyType
+from voices.utils import ImageRole, image_variant
 
 from .models import Initiative
 
@@ -69,13 +70,7 @@ class UserView(BaseModel):
 
     @pydantic.validator("image_url", pre=True)
     def prepare_public_file(cls, v: str, values):
-        if not v.startswith("https://storage.yandexcloud"):
-            return v
-        if "min" in v:
-            return v
-        filename = v.split("/")[-1]
-        name, file_ext = filename.split(".")
-        return f"https://storage.yandexcloud.net/my-city/{name}-min.{file_ext}"
+        return image_variant(v, ImageRole.AVATAR)
 
 
 class InitiativeView(BaseModel):
@@ -83,6 +78,7 @@ class InitiativeView(BaseModel):
     user: UserView
     city: str
     images: list | dict | None
+    images_card: list[str] | None = None  # smaller variants of images for feed cards
     category: Initiative.Category
     location: GeometryPoint | None
     title: str
@@ -107,6 +103,13 @@ class InitiativeView(BaseModel):
     def convert_id(cls, v: uuid.UUID, values, **kwargs):
         return str(v)
 
+    @pydantic.validator("images_card", pre=True, always=True)
+    def prepare_images_card(cls, v, values: dict, **kwargs):
+        images = values.get("images")
+        if not isinstance(images, list):
+            return None
+        return [image_variant(image, ImageRole.CARD) for image in images]
+
     @pydantic.validator("created_at", pre=True)
     def convert_datetime(cls, v: datetime, values, **kwargs):
         if isinstance(v, datetime):
@@ -154,6 +157,15 @@ class InitiativeView(BaseModel):
         return tags
 
 
+class InitiativeNearbyView(InitiativeView):
+    distance: float | None = None
+
+
+class InitiativeNearbyListView(BaseModel):
+    feed: list[InitiativeNearbyView]
+    pagination: PaginationView
+
+
 class InitiativeDetailedView(InitiativeView):
     is_liked: bool = False
     is_supported: bool = False
@@ -169,6 +181,29 @@ class InitiativeListView(BaseModel):
     pagination: PaginationView
 
 
+class MapMarkerView(BaseModel):
+    id: uuid.UUID
+    location: GeometryPoint
+    category: Initiative.Category
+    title: str
+    image_url: str | None
+
+    @pydantic.validator("image_url", pre=True)
+    def prepare_public_file(cls, v: str, values):
+        return image_variant(v, ImageRole.AVATAR)
+
+
+class MapClusterView(BaseModel):
+    count: int
+    location: GeometryPoint
+    sample_ids: list[uuid.UUID]
+
+
+class MapView(BaseModel):
+    clusters: list[MapClusterView] = []
+    markers: list[MapMarkerView] = []
+
+
 class CommentView(BaseModel):
     id: str
     created_at: str | datetime
@@ -182,6 +217,8 @@ class CommentView(BaseModel):
 
 class CommentReplyView(CommentView):
     replies: list[CommentView] = []
+    replies_count: int = 0
+    replies_cursor: str | None = None  # continues /replies after the shown ones
 
 
 class CommentListView(BaseModel):
@@ -189,6 +226,11 @@ class CommentListView(BaseModel):
     pagination: PaginationView
 
 
+class ReplyListView(BaseModel):
+    replies: list[CommentView]
+    pagination: PaginationView
+
+
 class CommentRequestView(BaseModel):
     main_text: str
 
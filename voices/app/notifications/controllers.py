@@ -2,14 +2,15 @@ import uuid
 
 from fastapi import APIRouter, Depends
 
+from voices.app.auth.models import User
 from voices.app.auth.views import TokenData
-from voices.app.core.protocol import Response
+from voices.app.core.protocol import Cursor, PaginationView, Response, split_page
 from voices.auth.jwt_token import JWTBearer
 from voices.chat import create_gcm_token
 from voices.db.connection import Transaction
 
 from .models import FirebaseApp, Notification
-from .views import FirebaseAdd, NotificationList
+from .views import FirebaseAdd, NotificationList, UnreadCountView
 
 router = APIRouter()
 
@@ -17,20 +18,51 @@ router = APIRouter()
 @router.post("/firebase-create", response_model=Response)
 async def add_token_device(body: FirebaseAdd, token: TokenData = Depends(JWTBearer())):
     async with Transaction():
-        token_exist = await FirebaseApp.token_exist(body.firebase_token)
-        if not token_exist:
-            await FirebaseApp.create(token.sub, body.firebase_token)
+        await FirebaseApp.register(token.sub, body.firebase_token)
         await create_gcm_token(body.firebase_token)
         return Response(code=201)
 
 
 @router.get("/notifications", response_model=Response[NotificationList])
 async def get_notifications(
-    last_id: uuid.UUID = None, token: TokenData = Depends(JWTBearer())
+    cursor: str | None = None, token: TokenData = Depends(JWTBearer())
 ) -> Response[NotificationList]:
+    fingerprint = f"notifications:{token.sub}"
     async with Transaction():
-        notifications = await Notification.get_notifications(user_id=token.sub, last_id=last_id)
-    return Response(payload=NotificationList(notifications=notifications))
+        notifications = await Notification.get_notifications(
+            user_id=token.sub, after=Cursor.decode(cursor, fingerprint)
+        )
+        notifications, next_cursor = split_page(
+            notifications, key=lambda notification: (notification.created_at, notification.id), filters=fingerprint
+        )
+    read_cursor = None
+    if notifications:
+        read_cursor = Cursor.encode((notifications[0].created_at, notifications[0].id), fingerprint)
+    return Response(
+        payload=NotificationList(
+            notifications=notifications,
+            pagination=PaginationView(count=len(notifications), is_next=bool(next_cursor), cursor=next_cursor),
+            read_cursor=read_cursor,
+        )
+    )
+
+
+@router.get("/notifications/unread-count", response_model=Response[UnreadCountView])
+async def get_unread_count(token: TokenData = Depends(JWTBearer())) -> Response[UnreadCountView]:
+    async with Transaction():
+        count = await User.get_unread_notifications_count(token.sub)  # maintained by trigger
+    return Response(payload=UnreadCountView(count=count))
+
+
+@router.patch("/notifications/read", response_model=Response)
+async def read_notifications(cursor: str | None = None, token: TokenData = Depends(JWTBearer())) -> Response:
+    """
+    Marks all notifications as read, or ones up to readCursor of the inbox page
+    """
+    until = Cursor.decode(cursor, f"notifications:{token.sub}")
+    async with Transaction():
+        await Notification.read_notifications(owner_id=token.sub, until=until)
+    return Response()
 
 
 @router.patch("/notifications/{notification_id}", response_model=Response)
@@ -39,5 +71,5 @@ async def read_notification(
     token: TokenData = Depends(JWTBearer()),
 ) -> Response:
     async with Transaction():
-        await Notification.read_notification(notification_id=notification_id)
+        await Notification.read_notification(notification_id=notification_id, owner_id=token.sub)
     return Response()
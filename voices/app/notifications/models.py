@@ -1,7 +1,14 @@
 import uuid
+from datetime import date, datetime, timedelta
+from typing import AsyncIterator
 
 import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB, insert
+from sqlalchemy.orm import aliased
+from uuid_extensions import uuid7
 
+from voices.app.auth.models import User
+from voices.config import settings
 from voices.db.connection import db_session
 from voices.models import BaseModel
 
@@ -13,6 +20,16 @@ class NotificationStatus:
 
 class Notification(BaseModel):
     __tablename__ = "notifications"
+
+    __table_args__ = (
+        sa.Index("ix_notifications_owner", "owner_id", "created_at", "id"),
+        {"postgresql_partition_by": "RANGE (created_at)"},  # monthly, see create_partitions
+    )
+
+    # partition key has to be part of the primary key
+    id = sa.Column(sa.UUID(as_uuid=True), primary_key=True, default=uuid7)
+    created_at = sa.Column(sa.DateTime, server_default=sa.func.now(), primary_key=True)
+
     owner_id = sa.Column(
         sa.UUID(as_uuid=True),
         sa.ForeignKey("users.id", ondelete="CASCADE"),
@@ -26,55 +43,330 @@ class Notification(BaseModel):
     text = sa.Column(sa.VARCHAR(350), nullable=True)
     status = sa.Column(sa.String(length=8), server_default=NotificationStatus.UNREADED, nullable=False)
     avatar_url = sa.Column("avatar", sa.VARCHAR(500), nullable=True)
-    created_at = sa.Column(sa.DateTime, server_default=sa.func.now())
     first_name = sa.Column(sa.VARCHAR(50), nullable=True)
     last_name = sa.Column(sa.VARCHAR(50), nullable=True)
     type = sa.Column(sa.String(length=14), nullable=False)  # TODO: to number
     initiative_id = sa.Column(sa.UUID(as_uuid=True), sa.ForeignKey("initiatives.id", ondelete="CASCADE"), nullable=True)
     initiative_image = sa.Column(sa.VARCHAR(500), nullable=True)
+    actors_count = sa.Column(sa.Integer, server_default="1", nullable=False)
+    actors = sa.Column(JSONB, server_default="[]", nullable=False)  # latest actors, newest first
+    last_event_id = sa.Column(sa.VARCHAR(32), nullable=True)  # stream id of the last event stored in the row
 
     @classmethod
-    async def read_notification(cls, notification_id: uuid.UUID):
+    async def read_notification(cls, notification_id: uuid.UUID, owner_id: uuid.UUID):
         query = (
-            sa.update(Notification).values(status=NotificationStatus.READED).where(Notification.id == notification_id)
+            sa.update(Notification)
+            .values(status=NotificationStatus.READED)
+            .where((Notification.id == notification_id) & (Notification.owner_id == owner_id))
         )
         await db_session.get().execute(query)
 
     @classmethod
-    async def create(
-        cls,
-        owner_id: uuid.UUID,
-        text: str,
-        avatar_url: str,
-        first_name: str,
-        last_name: str,
-        type: str,
-        user_id: str,
-        initiative_id=None,
-        initiative_image=None,
-    ):
-        query = sa.insert(Notification).values(
-            owner_id=owner_id,
-            text=text,
-            avatar_url=avatar_url,
-            first_name=first_name,
-            last_name=last_name,
-            type=type,
-            user_id=user_id,
-            initiative_id=initiative_id,
-            initiative_image=initiative_image,
+    async def read_notifications(cls, owner_id: uuid.UUID, until: tuple | None = None) -> int:
+        """
+        Marks unread notifications of the owner as read, only ones not newer than until when it is given
+        """
+        query = (
+            sa.update(Notification)
+            .values(status=NotificationStatus.READED)
+            .where((Notification.owner_id == owner_id) & (Notification.status == NotificationStatus.UNREADED))
+        )
+        if until:
+            query = query.where(sa.tuple_(Notification.created_at, Notification.id) <= sa.tuple_(*until))
+        result = await db_session.get().execute(query)
+        return result.rowcount
+
+    @staticmethod
+    async def reconcile_unread_count() -> int:
+        """
+        Recomputes users.unread_notifications_count in one UPDATE
+        """
+        unread = (
+            sa.select(Notification.owner_id, sa.func.count().label("count"))
+            .where(Notification.status == NotificationStatus.UNREADED)
+            .group_by(Notification.owner_id)
+            .subquery("unread")
+        )
+        actual = aliased(User, name="actual")
+        counters = (
+            sa.select(actual.id, sa.func.coalesce(unread.c.count, 0).label("unread_count"))
+            .outerjoin(unread, unread.c.owner_id == actual.id)
+            .subquery("counters")
+        )
+        query = (
+            sa.update(User)
+            .where(
+                (User.id == counters.c.id) & (User.unread_notifications_count.is_distinct_from(counters.c.unread_count))
+            )
+            .values(unread_notifications_count=counters.c.unread_count)
+        )
+        result = await db_session.get().execute(query)
+        return result.rowcount
+
+    @classmethod
+    async def create_many(cls, notifications: list[dict]) -> None:
+        """
+        Inserts notifications in one statement, rows replayed from the stream keep their ids and are skipped
+        """
+        query = (
+            insert(Notification)
+            .values(notifications)
+            .on_conflict_do_nothing(index_elements=[Notification.id, Notification.created_at])
         )
         await db_session.get().execute(query)
 
+    @staticmethod
+    def actor(user_id, first_name: str, last_name: str, avatar_url: str) -> dict:
+        return {"user_id": str(user_id), "first_name": first_name, "last_name": last_name, "avatar_url": avatar_url}
+
+    @staticmethod
+    def stream_position(event_id: str) -> tuple[int, int]:
+        milliseconds, sequence = event_id.split("-")
+        return int(milliseconds), int(sequence)
+
     @classmethod
-    async def get_notifications(cls, user_id: uuid.UUID, last_id: str = None):
-        query = sa.select(Notification).where(Notification.owner_id == user_id).order_by(Notification.created_at.desc())
+    def fold(cls, notification: dict, actor: dict, text_many: str, event_id: str) -> bool:
+        """
+        Adds actor to notification values in place. False when the event is already stored in the row,
+        so a replayed batch does not fold twice, or when actor is already among the latest ones
+        """
+        last_event_id = notification["last_event_id"]
+        if last_event_id and cls.stream_position(event_id) <= cls.stream_position(last_event_id):
+            return False
+        notification["last_event_id"] = event_id
+        if any(recent["user_id"] == actor["user_id"] for recent in notification["actors"]):
+            return False  # like, unlike and like again
+        notification.update(
+            text=text_many.format(others=notification["actors_count"]),
+            user_id=uuid.UUID(actor["user_id"]),
+            first_name=actor["first_name"],
+            last_name=actor["last_name"],
+            avatar_url=actor["avatar_url"],
+            actors_count=notification["actors_count"] + 1,
+            actors=[actor, *notification["actors"]][: settings.NOTIFICATIONS_ACTORS],
+        )
+        return True
+
+    @staticmethod
+    async def get_open_aggregates(keys: set[tuple[uuid.UUID, str, uuid.UUID]]) -> dict[tuple, dict]:
+        """
+        Unread notifications of the coalescing window by (owner, type, initiative), one query for a batch.
+        The window is counted from the first event, created_at is kept: it is the partition and keyset sort key,
+        so the aggregate closes after the window and does not move past cursors which clients hold
+        """
+        if not keys:
+            return {}
+        session = db_session.get()
+        # serializes batches with common keys, otherwise both could miss the row and insert, sorted against deadlocks
+        lock_keys = sorted({f"n:{owner_id}:{type}:{initiative_id}" for owner_id, type, initiative_id in keys})
+        await session.execute(
+            sa.text(
+                "SELECT pg_advisory_xact_lock(lock_key) FROM "
+                "(SELECT DISTINCT hashtext(lock_name) AS lock_key FROM unnest(CAST(:keys AS text[])) AS lock_name "
+                "ORDER BY lock_key) AS lock_keys"
+            ),
+            {"keys": lock_keys},
+        )
+
+        key = sa.tuple_(Notification.owner_id, Notification.type, Notification.initiative_id)
+        query = (
+            sa.select(
+                Notification.id,
+                Notification.created_at,
+                Notification.owner_id,
+                Notification.type,
+                Notification.initiative_id,
+                Notification.text,
+                Notification.user_id,
+                Notification.first_name,
+                Notification.last_name,
+                Notification.avatar_url.label("avatar_url"),
+                Notification.actors_count,
+                Notification.actors,
+                Notification.last_event_id,
+            )
+            .distinct(Notification.owner_id, Notification.type, Notification.initiative_id)
+            .where(
+                key.in_(list(keys))
+                & (Notification.status == NotificationStatus.UNREADED)
+                & (Notification.created_at > sa.func.now() - timedelta(seconds=settings.NOTIFICATIONS_COALESCE_WINDOW))
+            )
+            .order_by(
+                Notification.owner_id, Notification.type, Notification.initiative_id, Notification.created_at.desc()
+            )
+        )
+        result = await session.execute(query)
+        return {(row.owner_id, row.type, row.initiative_id): dict(row._mapping) for row in result}
 
-        if last_id:
-            query.where(Notification.id < last_id)
+    @staticmethod
+    async def update_many(notifications: list[dict]) -> None:
+        """
+        Writes folded aggregates in one UPDATE ... FROM (VALUES ...)
+        """
+        values = sa.values(
+            sa.column("id", sa.UUID),
+            sa.column("created_at", sa.DateTime),
+            sa.column("text", sa.VARCHAR),
+            sa.column("user_id", sa.UUID),
+            sa.column("first_name", sa.VARCHAR),
+            sa.column("last_name", sa.VARCHAR),
+            sa.column("avatar", sa.VARCHAR),
+            sa.column("actors_count", sa.Integer),
+            sa.column("actors", JSONB),
+            sa.column("last_event_id", sa.VARCHAR),
+            name="folded",
+        ).data(
+            [
+                (
+                    n["id"],
+                    n["created_at"],
+                    n["text"],
+                    n["user_id"],
+                    n["first_name"],
+                    n["last_name"],
+                    n["avatar_url"],
+                    n["actors_count"],
+                    n["actors"],
+                    n["last_event_id"],
+                )
+                for n in sorted(notifications, key=lambda n: n["id"])  # same lock order for concurrent batches
+            ]
+        )
+        query = (
+            sa.update(Notification)
+            .where((Notification.id == values.c.id) & (Notification.created_at == values.c.created_at))
+            .values(
+                text=values.c.text,
+                user_id=values.c.user_id,
+                first_name=values.c.first_name,
+                last_name=values.c.last_name,
+                avatar_url=values.c.avatar,
+                actors_count=values.c.actors_count,
+                actors=values.c.actors,
+                last_event_id=values.c.last_event_id,
+            )
+        )
+        await db_session.get().execute(query)
+
+    @classmethod
+    async def get_notifications(cls, user_id: uuid.UUID, after: tuple | None = None):
+        query = (
+            sa.select(Notification)
+            .where(Notification.owner_id == user_id)
+            .where(Notification.created_at > sa.func.now() - cls._retention())  # prunes expired partitions
+            .order_by(Notification.created_at.desc(), Notification.id.desc())
+            .limit(settings.DEFAULT_PAGE_SIZE + 1)
+        )
+
+        if after:
+            query = query.where(sa.tuple_(Notification.created_at, Notification.id) < sa.tuple_(*after))
         result = await db_session.get().execute(query)
         return result.scalars().all()
 
+    @staticmethod
+    async def stream_media_urls() -> AsyncIterator[str]:
+        """
+        Urls of avatars and initiative images copied into inbox rows, they outlive a changed avatar
+        """
+        query = sa.union_all(
+            sa.select(Notification.avatar_url).where(Notification.avatar_url.is_not(None)),
+            sa.select(Notification.initiative_image).where(Notification.initiative_image.is_not(None)),
+            sa.select(sa.func.jsonb_array_elements(Notification.actors).op("->>")("avatar_url")),
+        )
+        result = await db_session.get().stream_scalars(query.execution_options(yield_per=settings.STORAGE_GC_BATCH))
+        async for url in result:
+            yield url
+
+    @staticmethod
+    def _retention():
+        return sa.func.make_interval(0, settings.NOTIFICATIONS_RETENTION_MONTHS)
+
+    @staticmethod
+    def _add_months(month: date, months: int) -> date:
+        year, month_index = divmod(month.year * 12 + month.month - 1 + months, 12)
+        return date(year, month_index + 1, 1)
+
+    @staticmethod
+    def partition_name(month: date) -> str:
+        return f"notifications_{month:%Y_%m}"
+
+    @classmethod
+    async def create_partitions(cls, months_ahead: int) -> None:
+        """
+        Creates monthly partitions from the current month on, rows of missing months go to notifications_default
+        """
+        session = db_session.get()
+        month = date.today().replace(day=1)
+        for _ in range(months_ahead + 1):
+            next_month = cls._add_months(month, 1)
+            partition = cls.partition_name(month)
+            if not (await session.execute(sa.select(sa.func.to_regclass(partition)))).scalar():
+                # postgres refuses a partition for the range while notifications_default holds rows in it,
+                # statements on partitions do not fire the counters triggers, so moved rows keep unread counts
+                await session.execute(
+                    sa.text(f"CREATE TABLE {partition} (LIKE notifications INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+                )
+                await session.execute(
+                    sa.text(
+                        f"WITH moved AS (DELETE FROM notifications_default "
+                        f"WHERE created_at >= '{month}' AND created_at < '{next_month}' RETURNING *) "
+                        f"INSERT INTO {partition} SELECT * FROM moved"
+                    )
+                )
+                await session.execute(
+                    sa.text(
+                        f"ALTER TABLE notifications ATTACH PARTITION {partition} "
+                        f"FOR VALUES FROM ('{month}') TO ('{next_month}')"
+                    )
+                )
+            month = next_month
+
+    @classmethod
+    async def drop_expired_partitions(cls) -> list[str]:
+        """
+        Drops monthly partitions which are entirely older than the retention period, instead of DELETE,
+        expired rows of notifications_default are deleted
+        """
+        session = db_session.get()
+        expired_before = cls._add_months(date.today().replace(day=1), -settings.NOTIFICATIONS_RETENTION_MONTHS)
+        partitions = await session.execute(
+            sa.text("SELECT inhrelid::regclass::text FROM pg_inherits WHERE inhparent = 'notifications'::regclass")
+        )
+
+        dropped = []
+        for partition in partitions.scalars().all():
+            try:
+                month = datetime.strptime(partition.removeprefix("notifications_"), "%Y_%m").date()
+            except ValueError:
+                continue  # notifications_default
+            if month < expired_before:
+                await cls._forget_unread(partition)
+                await session.execute(sa.text(f"DROP TABLE {partition}"))
+                dropped.append(partition)
+
+        # through the parent table, so the counters trigger sees deleted unread rows
+        await session.execute(sa.delete(Notification).where(Notification.created_at < expired_before))
+        return dropped
+
+    @staticmethod
+    async def _forget_unread(partition: str) -> None:
+        """
+        DROP TABLE fires no triggers, unread rows of the partition are subtracted from owners counters before it
+        """
+        rows = sa.table(partition, sa.column("owner_id"), sa.column("status"))
+        unread = (
+            sa.select(rows.c.owner_id, sa.func.count().label("count"))
+            .where(rows.c.status == NotificationStatus.UNREADED)
+            .group_by(rows.c.owner_id)
+            .subquery("unread")
+        )
+        query = (
+            sa.update(User)
+            .where(User.id == unread.c.owner_id)
+            .values(unread_notifications_count=User.unread_notifications_count - unread.c.count)
+        )
+        await db_session.get().execute(query)
+
     @classmethod
     async def update_already_friends(cls, user_id: uuid.UUID, old_status: str, new_status: str, new_text):
         query = (
@@ -86,27 +378,67 @@ class Notification(BaseModel):
         await db_session.get().execute(query)
 
 
+# rows outside of created monthly partitions, also makes metadata.create_all usable in tests
+sa.event.listen(
+    Notification.__table__,
+    "after_create",
+    sa.DDL("CREATE TABLE notifications_default PARTITION OF notifications DEFAULT"),
+)
+
+
 class FirebaseApp(BaseModel):
     __tablename__ = "firebase_token"
 
     owner = sa.Column(
         sa.UUID(as_uuid=True), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False, default=uuid.uuid4
     )
-    token = sa.Column("token", sa.VARCHAR(254), nullable=False)
+    token = sa.Column("token", sa.VARCHAR(254), nullable=False, unique=True)
+    last_seen_at = sa.Column(sa.DateTime, server_default=sa.func.now(), nullable=False)
 
     @classmethod
-    async def create(cls, owner: uuid.UUID, token: str) -> None:
-        query = sa.insert(FirebaseApp).values(owner=owner, token=token).returning(FirebaseApp.id)
+    async def register(cls, owner: uuid.UUID, token: str) -> None:
+        """
+        Adds device token or moves it to the new owner, refreshes last_seen_at either way
+        """
+        query = (
+            insert(FirebaseApp)
+            .values(owner=owner, token=token)
+            .on_conflict_do_update(
+                index_elements=[FirebaseApp.token],
+                set_={"owner": owner, "last_seen_at": sa.func.now()},
+            )
+        )
         await db_session.get().execute(query)
 
     @classmethod
-    async def get_tokens(cls, owner: uuid.UUID) -> uuid.UUID:
-        query = sa.select(FirebaseApp.token).where(FirebaseApp.owner == owner)
-        result = await db_session.get().execute(query)
-        return result.scalars().all()
+    async def get_tokens(cls, owners: set[uuid.UUID]) -> dict[uuid.UUID, list[str]]:
+        stale_at = datetime.now() - timedelta(days=settings.FCM_TOKEN_TTL_DAYS)
+        query = sa.select(FirebaseApp.owner, FirebaseApp.token).where(
+            FirebaseApp.owner.in_(owners) & (FirebaseApp.last_seen_at > stale_at)
+        )
+        tokens = {}
+        for owner, token in await db_session.get().execute(query):
+            tokens.setdefault(owner, []).append(token)
+        return tokens
+
+    @classmethod
+    async def touch(cls, owner: uuid.UUID | None = None, tokens: list[str] | None = None) -> None:
+        """
+        Refreshes last_seen_at of owner devices on authenticated activity or of tokens FCM delivered to,
+        a valid token is not excluded and purged only because the app did not register it again
+        """
+        query = sa.update(FirebaseApp).values(last_seen_at=sa.func.now())
+        query = query.where(FirebaseApp.owner == owner) if owner else query.where(FirebaseApp.token.in_(tokens))
+        await db_session.get().execute(query)
 
     @classmethod
-    async def token_exist(cls, token: str) -> bool:
-        query = sa.select(FirebaseApp.token).where(FirebaseApp.token == token)
-        result = (await db_session.get().execute(query)).scalars().first()
-        return result
+    async def delete_tokens(cls, tokens: list[str]) -> None:
+        query = sa.delete(FirebaseApp).where(FirebaseApp.token.in_(tokens))
+        await db_session.get().execute(query)
+
+    @classmethod
+    async def delete_stale(cls) -> int:
+        stale_at = datetime.now() - timedelta(days=settings.FCM_TOKEN_TTL_DAYS)
+        query = sa.delete(FirebaseApp).where(FirebaseApp.last_seen_at <= stale_at)
+        result = await db_session.get().execute(query)
+        return result.rowcount
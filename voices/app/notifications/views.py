@@ -1,7 +1,14 @@
 from datetime import datetime
 from uuid import UUID
 
-from voices.app.core.protocol import BaseModel
+from voices.app.core.protocol import BaseModel, PaginationView
+
+
+class NotificationActorView(BaseModel):
+    user_id: UUID
+    first_name: str | None
+    last_name: str | None
+    avatar_url: str | None
 
 
 class NotificationView(BaseModel):
@@ -15,10 +22,18 @@ class NotificationView(BaseModel):
     user_id: UUID
     initiative_id: UUID | None
     initiative_image: str | None
+    actors_count: int = 1
+    actors: list[NotificationActorView] = []
 
 
 class NotificationList(BaseModel):
     notifications: list[NotificationView]
+    pagination: PaginationView
+    read_cursor: str | None = None  # position of the newest notification on the page, for bulk read
+
+
+class UnreadCountView(BaseModel):
+    count: int
 
 
 class FirebaseAdd(BaseModel):
@@ -1,49 +1,20 @@
-import io
-import os
-
-from fastapi import APIRouter, UploadFile
+from fastapi import APIRouter, Request, UploadFile
 from fastapi.responses import FileResponse
-from PIL import Image
 from uuid_extensions import uuid7
 
 from voices.app.core.exceptions import (
     FileTooLargeError,
-    NotFoundError,
+    ObjectNotFoundError,
     UnsupportedFileTypeError,
 )
 from voices.app.core.protocol import Response
+from voices.app.storage.local import serve_file
 from voices.app.storage.s3 import S3Service
+from voices.app.storage.service import Storage, UploadReader, UploadStatus, pending_key
+from voices.app.storage.views import PresignedUploadView, UploadCreateView, UploadView
+from voices.broker.tasks.storage import process_upload
 from voices.config import settings
-import webp
-
-
-class Storage:
-    @classmethod
-    async def create(cls, file_ext: str, file_data: bytes) -> str:
-        filename = uuid7(as_type="hex")
-
-        if file_ext in settings.ALLOWED_PHOTO_TYPES:
-            img = Image.open(io.BytesIO(file_data))
-
-            pic = webp.WebPPicture.from_pil(img)
-            config = webp.WebPConfig.new(lossless=True)
-
-            max_webp_data = bytes(pic.encode(config).buffer())
-            min_config = webp.WebPConfig.new(quality=10)
-            min_webp_data = bytes(pic.encode(min_config).buffer())
-            max_image_path = f"{filename}.webp"
-            mini_image_path = f"{filename}-min.webp"
-            await S3Service.put_object(img_name=max_image_path, file=max_webp_data)  # TODO: to asyncio.gather
-            await S3Service.put_object(img_name=mini_image_path, file=min_webp_data)
-
-            s3_filepath = max_image_path
-
-        else:
-            s3_filepath = f"{filename}.{file_ext}"
-            await S3Service.put_object(img_name=s3_filepath, file=file_data)
-
-        full_path = f"https://storage.yandexcloud.net/my-city/{s3_filepath}"
-        return full_path
+from voices.redis import Redis
 
 
 router = APIRouter()
@@ -56,21 +27,69 @@ async def add_file(upload_file: UploadFile):
     if file_ext not in settings.ALLOWED_UPLOAD_TYPES:
         raise UnsupportedFileTypeError
 
-    file_data = upload_file.file.read()
-
-    if len(file_data) > settings.FILE_MAX_SIZE_KB:
+    if upload_file.size and upload_file.size > settings.FILE_MAX_SIZE_KB:
         raise FileTooLargeError
 
-    filename = await Storage.create(file_ext=file_ext, file_data=file_data)
+    filename = await Storage.create(file_ext=file_ext, upload=UploadReader(upload_file))
 
     return Response(payload=filename)
 
 
-@router.get("/storage/{filename}", response_class=FileResponse)
-async def get_file(filename: str):
-    if not os.path.exists(f"data/{filename}"):
-        raise NotFoundError
+@router.post("/storage/uploads", response_model=Response[PresignedUploadView])
+async def create_upload(body: UploadCreateView):
+    """
+    Client posts the file straight to s3 with the returned form, then calls complete
+    """
+    file_ext = body.file_name.split(".")[-1].lower()
+
+    if file_ext not in settings.ALLOWED_UPLOAD_TYPES:
+        raise UnsupportedFileTypeError
+
+    upload_id = uuid7().hex
+    presigned = await S3Service.generate_presigned_post(
+        img_name=pending_key(upload_id, file_ext),
+        max_size=settings.FILE_MAX_SIZE_KB,
+        expires=settings.UPLOAD_PRESIGNED_EXPIRES,
+    )
+    await Redis.set_upload(upload_id, status=UploadStatus.PENDING, file_ext=file_ext)
+
+    return Response(
+        payload=PresignedUploadView(
+            upload_id=upload_id,
+            url=presigned["url"],
+            fields=presigned["fields"],
+            expires_in=settings.UPLOAD_PRESIGNED_EXPIRES,
+        )
+    )
+
+
+@router.post("/storage/uploads/{upload_id}/complete", response_model=Response[UploadView])
+async def complete_upload(upload_id: str):
+    """
+    Queues encoding of the uploaded file, the url appears in upload status when the worker is done
+    """
+    if await Redis.start_upload_processing(upload_id, status=UploadStatus.PROCESSING, pending=UploadStatus.PENDING):
+        process_upload.apply_async(kwargs=dict(upload_id=upload_id), retry=False)
+
+    return await get_upload(upload_id)
+
+
+@router.get("/storage/uploads/{upload_id}", response_model=Response[UploadView])
+async def get_upload(upload_id: str):
+    upload = await Redis.get_upload(upload_id)
+    if not upload:
+        raise ObjectNotFoundError
+
+    return Response(
+        payload=UploadView(
+            upload_id=upload_id,
+            status=upload["status"],
+            url=upload.get("url"),
+            error=upload.get("error"),
+        )
+    )
 
-    if filename.endswith(".gltf"):
-        return FileResponse(f"data/{filename}", media_type="application/octet-stream")
-    return FileResponse(f"data/{filename}")
+
+@router.get("/storage/{filename}", response_class=FileResponse)
+async def get_file(filename: str, request: Request):
+    return await serve_file(request, filename)
@@ -0,0 +1,36 @@
+import asyncio
+import io
+from concurrent.futures import ProcessPoolExecutor
+
+import webp
+from PIL import Image, ImageOps
+
+from voices.app.core.exceptions import TooManyUploadsError
+from voices.config import settings
+
+# webp encoding takes seconds of cpu for a large photo, so it runs outside of the event loop
+executor = ProcessPoolExecutor(settings.IMAGE_WORKERS)
+queue_slots = asyncio.Semaphore(settings.IMAGE_QUEUE_SIZE)
+
+
+def encode_variants(file_data: bytes) -> dict[int, bytes]:
+    """
+    Decodes the image once and returns webp bounded by every IMAGE_VARIANTS width, runs in executor process
+    """
+    image = ImageOps.exif_transpose(Image.open(io.BytesIO(file_data)))
+    image = image.convert("RGBA" if "A" in image.getbands() or "transparency" in image.info else "RGB")
+
+    variants = {}
+    for width, quality in sorted(settings.IMAGE_VARIANTS.values(), reverse=True):
+        if image.width > width:  # each variant is scaled down from the previous, larger one
+            image = image.resize((width, round(image.height * width / image.width)), Image.LANCZOS)
+        pic = webp.WebPPicture.from_pil(image)
+        variants[width] = bytes(pic.encode(webp.WebPConfig.new(quality=quality)).buffer())
+    return variants
+
+
+async def transcode(file_data: bytes) -> dict[int, bytes]:
+    if queue_slots.locked():  # every slot is encoding or waiting for a process, reject instead of queueing more
+        raise TooManyUploadsError
+    async with queue_slots:
+        return await asyncio.get_running_loop().run_in_executor(executor, encode_variants, file_data)
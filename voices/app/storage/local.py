@@ -0,0 +1,144 @@
+import mimetypes
+import os
+import re
+import stat
+import time
+from email.utils import formatdate, parsedate_to_datetime
+from typing import AsyncIterator
+
+import anyio
+from fastapi import Request
+from fastapi.responses import FileResponse, Response, StreamingResponse
+
+from voices.app.core.exceptions import NotFoundError
+from voices.config import settings
+
+DATA_DIR = "data"
+CONTENT_ADDRESSED = re.compile(r"^[0-9a-f]{32}")  # sha256 or uuid7 hex names are never rewritten
+BYTE_RANGE = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+stats: dict[str, tuple[float, os.stat_result]] = {}  # path: (cached at, stat)
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+def get_stat(path: str) -> os.stat_result | None:
+    cached = stats.get(path)
+    now = time.monotonic()
+    if cached and now - cached[0] < settings.STORAGE_STAT_TTL:
+        return cached[1]
+    try:
+        result = os.stat(path)
+    except FileNotFoundError:
+        return None  # misses are not cached, file may be put there any moment
+    if not stat.S_ISREG(result.st_mode):
+        return None
+    if len(stats) >= settings.STORAGE_STAT_CACHE_SIZE:
+        stats.clear()
+    stats[path] = (now, result)
+    return result
+
+
+def is_not_modified(request: Request, etag: str, modified_at: float) -> bool:
+    if if_none_match := request.headers.get("if-none-match"):  # takes precedence over if-modified-since
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if if_modified_since := request.headers.get("if-modified-since"):
+        try:
+            return int(modified_at) <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def get_range(request: Request, etag: str, size: int) -> tuple[int, int] | None:
+    """
+    Returns (start, end) of a single byte range, None for the whole file. Multiple ranges get the whole file too
+    """
+    value = request.headers.get("range")
+    if not value or request.headers.get("if-range", etag) != etag:  # file changed since the client got a part of it
+        return None
+    if not (match := BYTE_RANGE.match(value.strip())):
+        return None
+
+    start, end = match.groups()
+    if not start:  # suffix range, last n bytes
+        if not end or int(end) == 0:
+            raise RangeNotSatisfiable
+        return max(size - int(end), 0), size - 1
+    start, end = int(start), int(end) if end else size - 1
+    if start >= size or start > end:
+        raise RangeNotSatisfiable
+    return start, min(end, size - 1)
+
+
+async def read_range(file: anyio.AsyncFile, start: int, length: int) -> AsyncIterator[bytes]:
+    try:
+        await file.seek(start)
+        while length > 0:
+            chunk = await file.read(min(FileResponse.chunk_size, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        await file.aclose()
+
+
+def get_headers(filename: str, file_stat: os.stat_result) -> dict[str, str]:
+    return {
+        "etag": f'"{file_stat.st_mtime_ns:x}-{file_stat.st_size:x}"',
+        "last-modified": formatdate(file_stat.st_mtime, usegmt=True),
+        "accept-ranges": "bytes",
+        "cache-control": "public, max-age=31536000, immutable"
+        if CONTENT_ADDRESSED.match(filename)
+        else "public, no-cache",
+    }
+
+
+async def serve_file(request: Request, filename: str) -> Response:
+    """
+    Serves file from DATA_DIR with validators, conditional and range requests.
+    Cached stat only answers 304, a body is described by the stat of the opened file, which may have been replaced
+    """
+    if filename.startswith(".") or os.path.basename(filename) != filename:
+        raise NotFoundError
+    path = os.path.join(DATA_DIR, filename)
+    if (cached_stat := get_stat(path)) is None:
+        raise NotFoundError
+
+    headers = get_headers(filename, cached_stat)
+    if is_not_modified(request, headers["etag"], cached_stat.st_mtime):
+        return Response(status_code=304, headers=headers)
+
+    try:
+        file = await anyio.open_file(path, mode="rb")
+    except FileNotFoundError:
+        stats.pop(path, None)
+        raise NotFoundError
+    file_stat = os.fstat(file.wrapped.fileno())
+    stats[path] = (time.monotonic(), file_stat)
+    headers = get_headers(filename, file_stat)
+
+    media_type = mimetypes.guess_type(filename)[0] or "application/octet-stream"
+    if filename.endswith(".gltf"):
+        media_type = "application/octet-stream"
+
+    try:
+        byte_range = get_range(request, headers["etag"], file_stat.st_size)
+    except RangeNotSatisfiable:
+        await file.aclose()
+        return Response(status_code=416, headers={**headers, "content-range": f"bytes */{file_stat.st_size}"})
+
+    status_code = 200
+    start, end = 0, file_stat.st_size - 1
+    if byte_range is not None:
+        start, end = byte_range
+        status_code = 206
+        headers["content-range"] = f"bytes {start}-{end}/{file_stat.st_size}"
+    headers["content-length"] = str(end - start + 1)
+    return StreamingResponse(
+        read_range(file, start, end - start + 1), status_code=status_code, headers=headers, media_type=media_type
+    )
@@ -0,0 +1,61 @@
+from fastapi.responses import ORJSONResponse
+from starlette.datastructures import Headers
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from voices.app.core.exceptions import FileTooLargeError
+from voices.app.core.protocol import Response
+from voices.config import settings
+
+
+class UploadLimitMiddleware:
+    """
+    Enforces FILE_MAX_SIZE_KB on the raw request body of multipart uploads. Starlette spools the whole body
+    to disk before UploadFile is read, so the check cannot wait for the endpoint: a declared Content-Length
+    over the limit is rejected before the body is received, a longer stream is cut once it passes the limit
+    """
+
+    limit = settings.FILE_MAX_SIZE_KB + settings.UPLOAD_CHUNK_SIZE  # multipart boundaries and part headers
+
+    def __init__(self, app: ASGIApp, path: str):
+        self.app = app
+        self.path = path
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] != self.path:
+            await self.app(scope, receive, send)
+            return
+
+        content_length = Headers(scope=scope).get("content-length", "")
+        if content_length.isdigit() and int(content_length) > self.limit:
+            await self.reject(scope, receive, send)
+            return
+
+        received = 0
+        exceeded = False
+
+        async def limited_receive() -> Message:
+            nonlocal received, exceeded
+            message = await receive()
+            received += len(message.get("body", b""))
+            if received > self.limit:
+                exceeded = True
+                return {"type": "http.disconnect"}  # stops the multipart parser, the rest is never spooled
+            return message
+
+        async def limited_send(message: Message) -> None:
+            if not exceeded:  # the endpoint answers the cut body with a parsing error, the client gets the limit
+                await send(message)
+
+        await self.app(scope, limited_receive, limited_send)
+        if exceeded:
+            await self.reject(scope, receive, send)
+
+    @staticmethod
+    async def reject(scope: Scope, receive: Receive, send: Send) -> None:
+        error = FileTooLargeError()
+        response = ORJSONResponse(
+            Response(code=error.status_code, message=error.message, exception_class=error._type()).dict(),
+            status_code=error.status_code,
+            headers={"Connection": "close"},
+        )
+        await response(scope, receive, send)
@@ -0,0 +1,61 @@
+from datetime import datetime
+from typing import AsyncIterator
+
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import insert
+
+from voices.config import settings
+from voices.db.connection import db_session
+from voices.models import BaseModel
+
+
+class StorageFile(BaseModel):
+    """
+    Uploaded content by sha256, a repeated upload gets the url of the first one
+    """
+
+    __tablename__ = "storage_files"
+
+    sha256 = sa.Column(sa.CHAR(64), nullable=False, unique=True)
+    url = sa.Column(sa.VARCHAR(500), nullable=False)
+    created_at = sa.Column(sa.DateTime, server_default=sa.func.now())
+    last_used_at = sa.Column(sa.DateTime, server_default=sa.func.now(), nullable=False)  # gc grace starts here
+
+    @staticmethod
+    async def get_url(sha256: str) -> str | None:
+        """
+        Returns url of stored content and marks it used, a re-uploaded file may not be attached yet
+        """
+        query = (
+            sa.update(StorageFile)
+            .where(StorageFile.sha256 == sha256)
+            .values(last_used_at=sa.func.now())
+            .returning(StorageFile.url)
+        )
+        result = await db_session.get().execute(query)
+        return result.scalar_one_or_none()
+
+    @staticmethod
+    async def stream_used_urls(used_after: datetime) -> AsyncIterator[str]:
+        query = sa.select(StorageFile.url).where(StorageFile.last_used_at > used_after)
+        result = await db_session.get().stream_scalars(query.execution_options(yield_per=settings.STORAGE_GC_BATCH))
+        async for url in result:
+            yield url
+
+    @staticmethod
+    async def delete_unused(names: list[str], used_before: datetime) -> set[str]:
+        """
+        Removes index entries of content-addressed object names not handed out since used_before, so dedup does not
+        return urls which are being deleted. Returns names which are kept: a dedup hit came after the gc snapshot.
+        A hit running concurrently either updates last_used_at first and the row is kept, or finds no row
+        """
+        name = sa.func.left(StorageFile.sha256, 32)
+        session = db_session.get()
+        await session.execute(sa.delete(StorageFile).where(name.in_(names) & (StorageFile.last_used_at <= used_before)))
+        result = await session.execute(sa.select(name).where(name.in_(names)))
+        return set(result.scalars().all())
+
+    @staticmethod
+    async def register(sha256: str, url: str) -> None:
+        query = insert(StorageFile).values(sha256=sha256, url=url).on_conflict_do_nothing(index_elements=["sha256"])
+        await db_session.get().execute(query)
@@ -1,4 +1,5 @@
-from typing import Optional
+from datetime import datetime
+from typing import AsyncIterator, Optional
 
 import aiobotocore.session
 
@@ -32,14 +33,102 @@ class S3Service:
     async def get_object(cls, img_name: str) -> dict:
         return await cls.s3_client.get_object(Bucket=settings.BUCKET_NAME, Key=img_name)
 
+    @classmethod
+    async def read_object(cls, img_name: str) -> bytes:
+        response = await cls.get_object(img_name=img_name)
+        async with response["Body"] as stream:
+            return await stream.read()
+
     @classmethod
     async def put_object(cls, img_name: str, file: bytes) -> dict:
         return await cls.s3_client.put_object(Bucket=settings.BUCKET_NAME, Key=img_name, Body=file)
 
+    @classmethod
+    async def upload_stream(cls, img_name: str, chunks: AsyncIterator[bytes]) -> None:
+        """
+        Uploads chunks keeping at most one part in memory, file smaller than a part goes with one put_object
+        """
+        buffer = bytearray()
+        upload_id = None
+        parts = []
+        try:
+            async for chunk in chunks:
+                buffer += chunk
+                if len(buffer) < settings.S3_PART_SIZE:
+                    continue
+                if upload_id is None:
+                    upload = await cls.s3_client.create_multipart_upload(Bucket=settings.BUCKET_NAME, Key=img_name)
+                    upload_id = upload["UploadId"]
+                parts.append(await cls._upload_part(img_name, upload_id, len(parts) + 1, bytes(buffer)))
+                buffer.clear()
+
+            if upload_id is None:
+                await cls.put_object(img_name=img_name, file=bytes(buffer))
+                return
+            if buffer:
+                parts.append(await cls._upload_part(img_name, upload_id, len(parts) + 1, bytes(buffer)))
+            await cls.s3_client.complete_multipart_upload(
+                Bucket=settings.BUCKET_NAME, Key=img_name, UploadId=upload_id, MultipartUpload={"Parts": parts}
+            )
+        except BaseException:
+            if upload_id is not None:  # otherwise uploaded parts are stored and billed until aborted
+                await cls.s3_client.abort_multipart_upload(
+                    Bucket=settings.BUCKET_NAME, Key=img_name, UploadId=upload_id
+                )
+            raise
+
+    @classmethod
+    async def _upload_part(cls, img_name: str, upload_id: str, part_number: int, data: bytes) -> dict:
+        part = await cls.s3_client.upload_part(
+            Bucket=settings.BUCKET_NAME, Key=img_name, UploadId=upload_id, PartNumber=part_number, Body=data
+        )
+        return {"ETag": part["ETag"], "PartNumber": part_number}
+
+    @classmethod
+    async def copy_object(cls, source_name: str, img_name: str) -> dict:
+        """
+        Copies inside the bucket, the data does not pass through the caller
+        """
+        return await cls.s3_client.copy_object(
+            Bucket=settings.BUCKET_NAME, Key=img_name, CopySource={"Bucket": settings.BUCKET_NAME, "Key": source_name}
+        )
+
+    @classmethod
+    async def generate_presigned_post(cls, img_name: str, max_size: int, expires: int) -> dict:
+        """
+        Returns url and form fields for a browser-style POST of one object, s3 rejects bodies above max_size
+        """
+        return await cls.s3_client.generate_presigned_post(
+            Bucket=settings.BUCKET_NAME,
+            Key=img_name,
+            Conditions=[["content-length-range", 1, max_size]],
+            ExpiresIn=expires,
+        )
+
     @classmethod
     async def delete_object(cls, img_name: str) -> dict:
         return await cls.s3_client.delete_object(Bucket=settings.BUCKET_NAME, Key=img_name)
 
+    @classmethod
+    async def iter_objects(cls) -> AsyncIterator[tuple[str, datetime]]:
+        """
+        Lists the bucket page by page, yields key and last modified time
+        """
+        paginator = cls.s3_client.get_paginator("list_objects_v2")
+        async for page in paginator.paginate(Bucket=settings.BUCKET_NAME):
+            for s3_object in page.get("Contents", []):
+                yield s3_object["Key"], s3_object["LastModified"]
+
+    @classmethod
+    async def delete_objects(cls, img_names: list[str]) -> list[dict]:
+        """
+        Deletes up to 1000 objects in one request, returns errors of the keys which were not deleted
+        """
+        result = await cls.s3_client.delete_objects(
+            Bucket=settings.BUCKET_NAME, Delete={"Objects": [{"Key": name} for name in img_names], "Quiet": True}
+        )
+        return result.get("Errors", [])
+
     @classmethod
     async def close_s3_session(cls) -> None:
         if cls.s3_client is not None:
@@ -0,0 +1,124 @@
+import asyncio
+import hashlib
+from enum import StrEnum
+from typing import AsyncIterator
+
+from fastapi import UploadFile
+
+from voices.app.core.exceptions import FileTooLargeError
+from voices.app.storage.images import encode_variants, transcode
+from voices.app.storage.models import StorageFile
+from voices.app.storage.s3 import S3Service
+from voices.config import settings
+from voices.db.connection import Transaction
+from voices.utils import ImageRole
+
+
+class UploadStatus(StrEnum):
+    PENDING = "pending"  # presigned form issued, file is not confirmed yet
+    PROCESSING = "processing"
+    DONE = "done"
+    FAILED = "failed"
+
+
+def pending_key(upload_id: str, file_ext: str) -> str:
+    """
+    Direct uploads land here, the object is removed once it is stored under its content address
+    """
+    return f"uploads/{upload_id}.{file_ext}"
+
+
+class UploadReader:
+    """
+    Reads spooled upload in chunks from the start, rejects it once FILE_MAX_SIZE_KB is exceeded.
+    The request body is limited while it is received by UploadLimitMiddleware, this check covers the file itself
+    """
+
+    def __init__(self, upload_file: UploadFile):
+        self.upload_file = upload_file
+
+    async def chunks(self) -> AsyncIterator[bytes]:
+        await self.upload_file.seek(0)  # request body is already spooled, so every pass is local
+        size = 0
+        while chunk := await self.upload_file.read(settings.UPLOAD_CHUNK_SIZE):
+            size += len(chunk)
+            if size > settings.FILE_MAX_SIZE_KB:
+                raise FileTooLargeError
+            yield chunk
+
+    async def read(self) -> bytes:
+        return b"".join([chunk async for chunk in self.chunks()])
+
+    async def digest(self) -> str:
+        sha256 = hashlib.sha256()
+        async for chunk in self.chunks():
+            sha256.update(chunk)
+        return sha256.hexdigest()
+
+
+class Storage:
+    @staticmethod
+    def get_url(s3_filepath: str) -> str:
+        return f"https://storage.yandexcloud.net/my-city/{s3_filepath}"
+
+    @staticmethod
+    def get_filename(sha256: str) -> str:
+        return sha256[:32]  # content-addressed, concurrent uploads of the same file write the same objects
+
+    @staticmethod
+    async def get_stored(sha256: str) -> str | None:
+        async with Transaction():
+            return await StorageFile.get_url(sha256)
+
+    @staticmethod
+    async def register(sha256: str, url: str) -> str:
+        async with Transaction():
+            await StorageFile.register(sha256, url)
+        return url
+
+    @classmethod
+    async def put_variants(cls, sha256: str, variants: dict[int, bytes]) -> str:
+        filename = cls.get_filename(sha256)
+        await asyncio.gather(
+            *(S3Service.put_object(img_name=f"{filename}-{width}.webp", file=data) for width, data in variants.items())
+        )
+        # views pick other variants by role, see image_variant
+        return cls.get_url(f"{filename}-{settings.IMAGE_VARIANTS[ImageRole.DETAIL][0]}.webp")
+
+    @classmethod
+    async def create(cls, file_ext: str, upload: UploadReader) -> str:
+        sha256 = await upload.digest()
+        if url := await cls.get_stored(sha256):  # retried or repeated upload, nothing to encode or put
+            return url
+
+        if file_ext in settings.ALLOWED_PHOTO_TYPES:
+            url = await cls.put_variants(sha256, await transcode(await upload.read()))  # decoder needs whole image
+        else:
+            s3_filepath = f"{cls.get_filename(sha256)}.{file_ext}"
+            await S3Service.upload_stream(img_name=s3_filepath, chunks=upload.chunks())
+            url = cls.get_url(s3_filepath)
+
+        return await cls.register(sha256, url)
+
+    @classmethod
+    async def create_from_pending(cls, upload_id: str, file_ext: str) -> str:
+        """
+        Stores a file the client has put to s3 directly, runs in a worker, so images are encoded in place
+        """
+        source_name = pending_key(upload_id, file_ext)
+        file_data = await S3Service.read_object(img_name=source_name)
+        if len(file_data) > settings.FILE_MAX_SIZE_KB:  # also limited by the presigned form
+            raise FileTooLargeError
+
+        sha256 = hashlib.sha256(file_data).hexdigest()
+        if not (url := await cls.get_stored(sha256)):
+            if file_ext in settings.ALLOWED_PHOTO_TYPES:
+                url = await cls.put_variants(sha256, encode_variants(file_data))
+            else:
+                s3_filepath = f"{cls.get_filename(sha256)}.{file_ext}"
+                await S3Service.copy_object(source_name=source_name, img_name=s3_filepath)
+                url = cls.get_url(s3_filepath)
+            await cls.register(sha256, url)
+
+        await S3Service.delete_object(img_name=source_name)
+        return url
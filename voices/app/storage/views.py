@@ -0,0 +1,19 @@
+from voices.app.core.protocol import BaseModel
+
+
+class UploadCreateView(BaseModel):
+    file_name: str
+
+
+class PresignedUploadView(BaseModel):
+    upload_id: str
+    url: str
+    fields: dict[str, str]
+    expires_in: int
+
+
+class UploadView(BaseModel):
+    upload_id: str
+    status: str
+    url: str | None
+    error: str | None
@@ -6,6 +6,7 @@ from jose import JWTError, jwt
 from jose.exceptions import ExpiredSignatureError
 from pydantic import ValidationError
 
+from voices.app.auth.models import CITY_BY_ID, User
 from voices.app.auth.views import TokenData
 from voices.app.core.exceptions import (
     JWTDecodeError,
@@ -44,6 +45,17 @@ def decode_token(token: str) -> TokenData:
     return token_data
 
 
+async def get_token_city(token: TokenData | None) -> str:
+    """
+    City from the token claim, tokens without it fall back to the users table
+    """
+    if not token:
+        return settings.DEFAULT_CITY
+    if token.city in CITY_BY_ID:
+        return CITY_BY_ID[token.city]
+    return await User.get_city_by_id(token.sub) or settings.DEFAULT_CITY
+
+
 class JWTBearer(HTTPBearer):
     def __init__(self, auto_error: bool = True, required: bool = True):
         self.required = required
@@ -2,11 +2,13 @@ import asyncio
 
 import firebase_admin
 from celery import Celery, signals
+from celery.schedules import crontab
 from firebase_admin import credentials
 import sentry_sdk
 from sentry_sdk.integrations.celery import CeleryIntegration
 
 from voices.config import settings
+from voices.redis import Redis
 
 app = Celery(settings.tasks_name, broker=settings.CELERY_BROKER_URL, backend=settings.CELERY_BACKEND_URL)
 loop = asyncio.get_event_loop()
@@ -25,6 +27,22 @@ def init_sentry(**_kwargs):
         )
 
 
+@signals.worker_process_init.connect
+def init_redis(**_kwargs):
+    loop.run_until_complete(Redis.connect())
+
+
 from voices.broker.tasks import CELERY_IMPORTS  # noqa: E402
 
 app.conf.update(tasks=CELERY_IMPORTS)
+app.conf.beat_schedule = {
+    "drain-notifications": {"task": "drain_notifications", "schedule": settings.NOTIFICATIONS_DRAIN_INTERVAL},
+    "flush-counters": {"task": "flush_counters", "schedule": settings.COUNTERS_FLUSH_INTERVAL},
+    "reconcile-counters": {"task": "reconcile_counters", "schedule": crontab(hour=4, minute=0)},
+    "maintain-notification-partitions": {
+        "task": "maintain_notification_partitions",
+        "schedule": crontab(hour=3, minute=30),
+    },
+    "collect-media-garbage": {"task": "collect_media_garbage", "schedule": crontab(hour=5, minute=0, day_of_week=0)},
+    "purge-firebase-tokens": {"task": "purge_firebase_tokens", "schedule": crontab(hour=4, minute=30)},
+}
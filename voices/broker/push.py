@@ -0,0 +1,84 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from enum import StrEnum
+from typing import NamedTuple
+
+from firebase_admin import exceptions, messaging
+from firebase_admin.exceptions import FirebaseError
+
+from voices.broker import app_firebase
+from voices.config import settings
+
+FCM_BATCH_SIZE = 500  # max messages in one send_each call
+
+executor = ThreadPoolExecutor(max_workers=settings.FCM_WORKERS, thread_name_prefix="fcm")
+
+
+class PushOutcome(StrEnum):
+    DELIVERED = "delivered"
+    UNREGISTERED = "unregistered"  # app uninstalled or token expired, token is dead
+    INVALID = "invalid"  # malformed token or message
+    RETRY = "retry"  # quota, unavailable or internal error
+    FAILED = "failed"
+
+
+class PushResult(NamedTuple):
+    token: str
+    message_id: str | None
+    error: FirebaseError | None
+
+    @property
+    def outcome(self) -> PushOutcome:
+        match self.error:
+            case None:
+                return PushOutcome.DELIVERED
+            case messaging.UnregisteredError() | messaging.SenderIdMismatchError():
+                return PushOutcome.UNREGISTERED
+            case exceptions.InvalidArgumentError():
+                return PushOutcome.INVALID
+            case messaging.QuotaExceededError() | exceptions.UnavailableError() | exceptions.InternalError():
+                return PushOutcome.RETRY
+            case _:
+                return PushOutcome.FAILED
+
+
+def _send_batch(messages: list[messaging.Message]) -> list[PushResult]:
+    try:
+        response = messaging.send_each(messages, app=app_firebase)
+    except FirebaseError as e:  # whole batch rejected
+        return [PushResult(token=message.token, message_id=None, error=e) for message in messages]
+    return [
+        PushResult(token=message.token, message_id=result.message_id, error=result.exception)
+        for message, result in zip(messages, response.responses)
+    ]
+
+
+async def send_push(messages: list[messaging.Message]) -> list[PushResult]:
+    """
+    Sends messages with FCM batch API on the thread pool, results are in the order of messages
+    """
+    loop = asyncio.get_running_loop()
+    batches = [messages[i : i + FCM_BATCH_SIZE] for i in range(0, len(messages), FCM_BATCH_SIZE)]
+    results = await asyncio.gather(*(loop.run_in_executor(executor, _send_batch, batch) for batch in batches))
+    return [result for batch in results for result in batch]
+
+
+def _payload(message: messaging.Message) -> tuple:
+    notification = message.notification
+    data = tuple(sorted((message.data or {}).items()))
+    return notification and (notification.title, notification.body, notification.image), data
+
+
+def dead_tokens(messages: list[messaging.Message], results: list[PushResult]) -> list[str]:
+    """
+    Tokens to delete, INVALID counts only when the same payload was delivered to another token,
+    a fan-out mixes messages of many notifications and one bad payload must not cost other tokens
+    """
+    outcomes = [result.outcome for result in results]
+    delivered = {_payload(message) for message, outcome in zip(messages, outcomes) if outcome == PushOutcome.DELIVERED}
+    return [
+        result.token
+        for message, result, outcome in zip(messages, results, outcomes)
+        if outcome == PushOutcome.UNREGISTERED
+        or (outcome == PushOutcome.INVALID and _payload(message) in delivered)  # payload is fine, token is not
+    ]
@@ -1,5 +1,15 @@
 from voices.broker import app  # noqa: F401
 
-from .notification import send_notification
+from .counters import flush_counters, reconcile_counters
+from .notification import drain_notifications, maintain_notification_partitions, purge_firebase_tokens
+from .storage import collect_media_garbage, process_upload
 
-CELERY_IMPORTS = [send_notification]
+CELERY_IMPORTS = [
+    drain_notifications,
+    maintain_notification_partitions,
+    purge_firebase_tokens,
+    flush_counters,
+    reconcile_counters,
+    collect_media_garbage,
+    process_upload,
+]
@@ -0,0 +1,64 @@
+from voices.app.friends.models import Friend
+from voices.app.initiatives.models import Comment, Initiative
+from voices.app.notifications.models import Notification
+from voices.broker import app, loop
+from voices.config import settings
+from voices.db.connection import Transaction
+from voices.redis import Redis
+
+
+async def flush_pending_counters() -> int:
+    flushed = 0
+    while True:
+        deltas = {}
+        try:
+            async with Transaction():
+                await Initiative.lock_counters()  # deltas are popped under the lock, see reconcile_all_counters
+                deltas = await Redis.pop_counters(settings.COUNTERS_FLUSH_BATCH)
+                if deltas:
+                    stored = await Initiative.apply_counter_deltas(deltas)
+        except Exception:
+            for initiative_id, counters in deltas.items():  # back to redis for the next flush
+                await Redis.incr_counters(initiative_id, counters)
+            raise
+        if not deltas:
+            return flushed
+        await Redis.set_stored_counters(stored)  # cached feed pages are not invalidated by counters
+        flushed += len(deltas)
+
+
+async def reconcile_all_counters() -> int:
+    """
+    Recomputes every stored counter from source rows, one UPDATE per table
+    """
+    discarded = []
+    try:
+        async with Transaction():
+            await Initiative.lock_counters()
+            await Initiative.lock_counted_rows(shared=False)  # waits for likes/supports between row and delta
+            # rows of pending likes/supports are already committed, so the recount includes them,
+            # deltas are dropped in the same transaction, otherwise the next flush would add them twice
+            while deltas := await Redis.pop_counters(settings.COUNTERS_FLUSH_BATCH):
+                discarded.append(deltas)
+            stored = await Initiative.reconcile_counters()
+            fixed = len(stored)
+            fixed += await Comment.reconcile_replies_count()
+            fixed += await Friend.reconcile_friends_count()
+            fixed += await Notification.reconcile_unread_count()
+    except Exception:
+        for deltas in discarded:  # recount is rolled back, deltas are still needed
+            for initiative_id, counters in deltas.items():
+                await Redis.incr_counters(initiative_id, counters)
+        raise
+    await Redis.set_stored_counters(stored)
+    return fixed
+
+
+@app.task(name="flush_counters")
+def flush_counters() -> int:
+    return loop.run_until_complete(flush_pending_counters())
+
+
+@app.task(name="reconcile_counters")
+def reconcile_counters() -> int:
+    return loop.run_until_complete(reconcile_all_counters())
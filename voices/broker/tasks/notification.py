@@ -1,15 +1,20 @@
+import os
+import socket
 import uuid
 from datetime import datetime
 from enum import StrEnum
 
 from firebase_admin import messaging
-from firebase_admin.exceptions import FirebaseError
 
 from voices.app.auth.models import User
 from voices.app.notifications.models import FirebaseApp, Notification
-from voices.broker import app, app_firebase, loop
+from voices.broker import app, loop
+from voices.broker.push import PushOutcome, dead_tokens, send_push
+from voices.config import settings
 from voices.db.connection import Transaction
-from voices.utils import get_minify_image
+from voices.logger import logger
+from voices.redis import Redis
+from voices.utils import ImageRole, image_variant
 
 
 class EventName(StrEnum):
@@ -42,81 +47,217 @@ status_text = {
 
 assert len(EventName) == len(status_text)  # TODO: to tests
 
+# events folded into one "X and N others" notification per initiative, shown after actor name
+coalesced_text = {
+    EventName.LIKE: "и ещё {others} оценили вашу запись",
+    EventName.SHARE: "и ещё {others} поделились вашей записью",
+    EventName.COMMENT: "и ещё {others} прокомментировали вашу запись",
+    EventName.ANSWERED: "и ещё {others} ответили вам",
+}
+
 
-async def firebase_notifications(
-    user_id_send: str,
-    user_id_get: str,
-    status: EventName,
-    initiative_image: str = None,
-    initiative_id: uuid.UUID = None,
-):
+async def store_notifications(events: list[tuple[str, dict]]) -> list[tuple]:
+    """
+    Stores a batch of stream events with one insert and one update of folded aggregates,
+    returns their pushes to send after the commit
+    """
     async with Transaction():
-        tokens = await FirebaseApp.get_tokens(user_id_get)
-        user: User = await User.get_by_id(user_id_send)
-        text = status_text[status]
-        data_send = {
-            "text": text,
-            "picture": get_minify_image(user.image_url),  # TODO: remove
-            "avatar_url": get_minify_image(user.image_url),
-            "time": datetime.now().isoformat(),
-            "first_name": user.first_name,
-            "last_name": user.last_name,
-            "type": status,
-        }
-
-        if initiative_id:
-            data_send["initiative_id"] = str(initiative_id)
-        if initiative_image:
-            initiative_image = get_minify_image(initiative_image)
-            data_send["initiative_image"] = initiative_image
-
-        await Notification.create(
-            owner_id=user_id_get,
-            text=text,
-            avatar_url=get_minify_image(user.image_url),
-            first_name=user.first_name,
-            last_name=user.last_name,
-            type=status,
-            user_id=user_id_send,
-            initiative_image=initiative_image,
-            initiative_id=initiative_id,
+        senders = {user.id: user for user in await User.get_by_ids({uuid.UUID(e["user_id_send"]) for _, e in events})}
+        tokens = await FirebaseApp.get_tokens({uuid.UUID(e["user_id_get"]) for _, e in events})
+        aggregates = await Notification.get_open_aggregates(
+            {
+                (uuid.UUID(e["user_id_get"]), e["status"], uuid.UUID(e["initiative_id"]))
+                for _, e in events
+                if e["status"] in coalesced_text and e["initiative_id"]
+            }
         )
-        if status == EventName.ACCEPT_FRENDS:
-            await Notification.update_already_friends(
-                user_id=user_id_send,
-                old_status=status,
-                new_status=EventName.ALREADY_FRIENDS,
-                new_text=status_text[EventName.ALREADY_FRIENDS],
+        stored_ids = {notification["id"] for notification in aggregates.values()}
+
+        folded = {}  # stored aggregates changed by this batch by id
+        notifications, pushes = [], []
+        for event_id, event in events:
+            user: User = senders.get(uuid.UUID(event["user_id_send"]))
+            if user is None:
+                continue  # sender was deleted after the event
+            status = EventName(event["status"])
+            owner_id = uuid.UUID(event["user_id_get"])
+            initiative_id = uuid.UUID(event["initiative_id"]) if event["initiative_id"] else None
+            initiative_image = image_variant(event["initiative_image"], ImageRole.CARD) or None
+            avatar_url = image_variant(user.image_url, ImageRole.AVATAR) or ""  # fcm data values must be strings
+            actor = Notification.actor(user.id, user.first_name, user.last_name, avatar_url)
+
+            key = (owner_id, status, initiative_id)
+            is_coalesced = status in coalesced_text and initiative_id
+            folded_text = None
+            aggregate = aggregates.get(key) if is_coalesced else None  # stored or inserted by this batch
+            if aggregate is not None:
+                is_changed = Notification.fold(aggregate, actor, coalesced_text[status], event_id)
+                if is_changed and aggregate["id"] in stored_ids:
+                    folded[aggregate["id"]] = aggregate
+                if aggregate["actors_count"] > 1:
+                    folded_text = aggregate["text"]
+            else:
+                notification = dict(
+                    # same primary key when the event is replayed, stream ids start with unix time in ms
+                    id=uuid.uuid5(uuid.NAMESPACE_OID, event_id),
+                    created_at=datetime.fromtimestamp(int(event_id.split("-")[0]) / 1000),
+                    owner_id=owner_id,
+                    text=status_text[status],
+                    avatar_url=avatar_url,
+                    first_name=user.first_name,
+                    last_name=user.last_name,
+                    type=status,
+                    user_id=user.id,
+                    initiative_id=initiative_id,
+                    initiative_image=initiative_image,
+                    actors_count=1,
+                    actors=[actor],
+                    last_event_id=event_id,
+                )
+                notifications.append(notification)
+                if is_coalesced:
+                    aggregates[key] = notification
+
+            data_send = {
+                "text": folded_text or status_text[status],
+                "picture": avatar_url,  # TODO: remove
+                "avatar_url": avatar_url,
+                "time": datetime.now().isoformat(),
+                "first_name": user.first_name,
+                "last_name": user.last_name,
+                "type": status,
+            }
+            if initiative_id:
+                data_send["initiative_id"] = str(initiative_id)
+            if initiative_image:
+                data_send["initiative_image"] = initiative_image
+            title = f"{user.first_name} {folded_text}" if folded_text else status_text[status]
+            push_window = f"{owner_id}:{status}:{initiative_id}" if is_coalesced else None
+            pushes.append(
+                (tokens.get(owner_id, []), title, initiative_image or avatar_url or None, data_send, push_window)
             )
-        notification_image = get_minify_image(initiative_image) or get_minify_image(user.image_url)
-        response = None
-        for token in tokens:
-            try:
-                message = messaging.Message(
-                    notification=messaging.Notification(
-                        title=text,
-                        body=text,
-                        image=notification_image,
-                    ),
-                    data=data_send,
-                    token=token,
+
+        if notifications:
+            await Notification.create_many(notifications)
+        if folded:
+            await Notification.update_many(list(folded.values()))
+        for _, event in events:
+            if event["status"] == EventName.ACCEPT_FRENDS:
+                await Notification.update_already_friends(
+                    user_id=event["user_id_send"],
+                    old_status=EventName.ACCEPT_FRENDS,
+                    new_status=EventName.ALREADY_FRIENDS,
+                    new_text=status_text[EventName.ALREADY_FRIENDS],
                 )
-                response = messaging.send(message, app=app_firebase)
-            except FirebaseError:
-                ...
-    return response
-
-
-@app.task(name="send_notification")
-def send_notification(
-    user_id_send: str, user_id_get: str, status: str, initiative_id=None, initiative_image=None
-) -> int:
-    return loop.run_until_complete(
-        firebase_notifications(
-            user_id_send=user_id_send,
-            user_id_get=user_id_get,
-            status=status,
-            initiative_image=initiative_image,
-            initiative_id=initiative_id,
+    return pushes
+
+
+async def send_notifications(pushes: list[tuple]) -> int:
+    """
+    Sends pushes of a stored batch in one FCM fan-out, deletes tokens FCM reports as dead
+    """
+    messages = []
+    for owner_tokens, title, image, data_send, push_window in pushes:
+        if push_window and not await Redis.acquire_push_window(push_window, settings.NOTIFICATIONS_COALESCE_WINDOW):
+            continue  # notification row is updated, device was already notified in this window
+        messages.extend(
+            messaging.Message(
+                notification=messaging.Notification(title=title, body=title, image=image),
+                data={field: value for field, value in data_send.items() if value is not None},
+                token=token,
+            )
+            for token in owner_tokens
         )
-    )
+
+    results = await send_push(messages)
+    for result in results:
+        if result.error:
+            logger.warning(f"Push to {result.token[:16]}... {result.outcome}: {result.error.code} {result.error}")
+
+    delivered = [result.token for result in results if result.outcome == PushOutcome.DELIVERED]
+    tokens_to_delete = dead_tokens(messages, results)
+    if delivered or tokens_to_delete:
+        async with Transaction():
+            if delivered:
+                await FirebaseApp.touch(tokens=delivered)
+            if tokens_to_delete:
+                await FirebaseApp.delete_tokens(tokens_to_delete)
+    return len(delivered)
+
+
+def is_valid_event(event: dict) -> bool:
+    try:
+        EventName(event["status"])
+        uuid.UUID(event["user_id_send"])
+        uuid.UUID(event["user_id_get"])
+        if event["initiative_id"]:
+            uuid.UUID(event["initiative_id"])
+    except (KeyError, ValueError):
+        return False
+    return True
+
+
+async def store_batch(events: list[tuple[str, dict]]) -> tuple[list[tuple], list[str]]:
+    """
+    Stores events, a failed batch is split in halves until the events which fail on their own are found.
+    Returns pushes and ids of stored events, failed ones stay pending and are dead-lettered after retries
+    """
+    try:
+        return await store_notifications(events), [event_id for event_id, _ in events]
+    except Exception as e:
+        if len(events) == 1:
+            logger.exception(f"Notification event {events[0][0]} was not stored: {e}")
+            return [], []
+
+    middle = len(events) // 2
+    pushes, stored = await store_batch(events[:middle])
+    right_pushes, right_stored = await store_batch(events[middle:])
+    return pushes + right_pushes, stored + right_stored
+
+
+async def drain_notification_stream() -> int:
+    """
+    Reads notification events in batches until the stream is empty, acknowledges events once they are stored,
+    so failed pushes are not redelivered with the whole batch
+    """
+    consumer = f"{socket.gethostname()}:{os.getpid()}"
+    delivered = 0
+    while events := await Redis.read_notifications(consumer, settings.NOTIFICATIONS_BATCH):
+        invalid = [(event_id, event) for event_id, event in events if not is_valid_event(event)]
+        if invalid:
+            logger.warning(f"Invalid notification events {[event_id for event_id, _ in invalid]} are dead-lettered")
+            await Redis.dead_letter_notifications(invalid)
+            events = [(event_id, event) for event_id, event in events if is_valid_event(event)]
+
+        pushes, stored = await store_batch(events) if events else ([], [])
+        if stored:  # failed events stay pending, they are claimed again after NOTIFICATIONS_CLAIM_IDLE
+            await Redis.ack_notifications(stored)
+        try:
+            delivered += await send_notifications(pushes)
+        except Exception as e:  # rows are stored, users see them in the inbox without a push
+            logger.exception(f"Pushes of {len(pushes)} notifications failed: {e}")
+    return delivered
+
+
+@app.task(name="drain_notifications")
+def drain_notifications() -> int:
+    return loop.run_until_complete(drain_notification_stream())
+
+
+@app.task(name="maintain_notification_partitions")
+def maintain_notification_partitions() -> list[str]:
+    async def maintain() -> list[str]:
+        async with Transaction():
+            await Notification.create_partitions(settings.NOTIFICATIONS_PARTITIONS_AHEAD)
+            return await Notification.drop_expired_partitions()
+
+    return loop.run_until_complete(maintain())
+
+
+@app.task(name="purge_firebase_tokens")
+def purge_firebase_tokens() -> int:
+    async def purge() -> int:
+        async with Transaction():
+            return await FirebaseApp.delete_stale()
+
+    return loop.run_until_complete(purge())
@@ -0,0 +1,128 @@
+import re
+from datetime import datetime, timedelta, timezone
+
+from botocore.exceptions import ClientError
+from PIL import UnidentifiedImageError
+
+from voices.app.auth.models import User
+from voices.app.core.exceptions import ApiException
+from voices.app.initiatives.models import Initiative
+from voices.app.notifications.models import Notification
+from voices.app.storage.models import StorageFile
+from voices.app.storage.s3 import S3Service
+from voices.app.storage.service import Storage, UploadStatus
+from voices.broker import app, loop
+from voices.config import settings
+from voices.db.connection import Transaction
+from voices.logger import logger
+from voices.mongo import mongo_client
+from voices.mongo.models import Survey
+from voices.redis import Redis
+
+# upload name shared by the object and its variants: {name}.webp, {name}-min.webp, {name}-480.webp
+MEDIA_NAME = re.compile(r"^(?P<name>[0-9a-f]{32})(-(min|\d+))?\.\w+$")
+
+
+def media_name(key: str) -> bytes | str:
+    """
+    Hex names are kept as 16 bytes, so the set of every referenced upload stays compact
+    """
+    filename = key.rsplit("/", 1)[-1]
+    if match := MEDIA_NAME.match(filename):
+        return bytes.fromhex(match["name"])
+    return filename
+
+
+async def get_referenced_media(deleted_before: datetime) -> set[bytes | str]:
+    referenced = set()
+    async with Transaction():
+        async for url in Initiative.stream_media_urls(deleted_before=deleted_before):
+            referenced.add(media_name(url))
+        async for url in User.stream_image_urls():
+            referenced.add(media_name(url))
+        async for url in Notification.stream_media_urls():
+            if url:
+                referenced.add(media_name(url))
+        # dedup hits hand out urls of old objects, they get the grace period from the hit
+        async for url in StorageFile.stream_used_urls(used_after=deleted_before):
+            referenced.add(media_name(url))
+
+    surveys = mongo_client.voices[Survey.Settings.name].find({"image_url": {"$ne": None}}, {"image_url": True})
+    async for survey in surveys:
+        referenced.add(media_name(survey["image_url"]))
+    return referenced
+
+
+async def delete_media(keys: list[str], used_before: datetime) -> int:
+    names = {key: match["name"] for key in keys if (match := MEDIA_NAME.match(key))}
+    async with Transaction():  # before the objects, so dedup does not hand out urls which are being deleted
+        in_use = await StorageFile.delete_unused(list(set(names.values())), used_before=used_before)
+    keys = [key for key in keys if names.get(key) not in in_use]
+    if not keys:
+        return 0
+
+    errors = await S3Service.delete_objects(keys)
+    for error in errors:
+        logger.warning(f"Media {error['Key']} was not deleted: {error['Code']} {error['Message']}")
+    return len(keys) - len(errors)
+
+
+async def delete_unreferenced_media() -> int:
+    """
+    Deletes bucket objects which no initiative, user, notification or survey references and which are older than
+    the grace period
+    """
+    await S3Service.get_s3_client()
+    created_before = datetime.now(timezone.utc) - timedelta(days=settings.STORAGE_GC_GRACE_DAYS)
+    referenced = await get_referenced_media(deleted_before=created_before.replace(tzinfo=None))
+
+    deleted = 0
+    garbage = []
+    async for key, modified_at in S3Service.iter_objects():
+        if modified_at >= created_before or media_name(key) in referenced:
+            continue
+        garbage.append(key)
+        if len(garbage) == settings.STORAGE_GC_BATCH:
+            deleted += await delete_media(garbage, used_before=created_before.replace(tzinfo=None))
+            garbage = []
+    if garbage:
+        deleted += await delete_media(garbage, used_before=created_before.replace(tzinfo=None))
+    return deleted
+
+
+@app.task(name="collect_media_garbage")
+def collect_media_garbage() -> int:
+    return loop.run_until_complete(delete_unreferenced_media())
+
+
+async def store_upload(upload_id: str) -> None:
+    """
+    Encodes a direct upload and publishes its url, a failed upload keeps the pending object for the garbage collector
+    """
+    upload = await Redis.get_upload(upload_id)
+    if not upload:  # status expired while the task was queued
+        return
+
+    await S3Service.get_s3_client()
+    try:
+        url = await Storage.create_from_pending(upload_id, upload["file_ext"])
+    except ClientError as e:
+        if e.response["Error"]["Code"] != "NoSuchKey":
+            await Redis.set_upload(upload_id, status=UploadStatus.FAILED, error="Upload processing failed")
+            raise
+        # form expired or was never posted
+        await Redis.set_upload(upload_id, status=UploadStatus.FAILED, error="File was not uploaded")
+    except UnidentifiedImageError:
+        await Redis.set_upload(upload_id, status=UploadStatus.FAILED, error="File is not an image")
+    except ApiException as e:
+        await Redis.set_upload(upload_id, status=UploadStatus.FAILED, error=e.message)
+    except Exception:
+        await Redis.set_upload(upload_id, status=UploadStatus.FAILED, error="Upload processing failed")
+        raise
+    else:
+        await Redis.set_upload(upload_id, status=UploadStatus.DONE, url=url)
+
+
+@app.task(name="process_upload")
+def process_upload(upload_id: str) -> None:
+    loop.run_until_complete(store_upload(upload_id))
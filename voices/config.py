@@ -24,11 +24,13 @@ class Settings(BaseSettings):
 
     MONGO_URL: str = "mongodb://localhost:27017"
     MONGO_REPLICA_SET: str = "rs0"
+    MONGO_TEST_DATABASE: str = "voices_test"  # dropped after every test which uses it
 
     SERVER_PORT: int = 8000
     SERVER_HOST: str = "0.0.0.0"
 
     REDIS_URL: str = "redis://localhost:6379"
+    REDIS_TEST_URL: str = "redis://localhost:6379/15"  # flushed before every test
 
     CELERY_BROKER_URL: str = "redis://localhost:6379/0"
     CELERY_BACKEND_URL: str = "redis://localhost:6379/1"
@@ -44,6 +46,26 @@ class Settings(BaseSettings):
 
     DEFAULT_PAGE_SIZE = 20
     ACTUAL_PAGE_SIZE = 5  # TODO: rename (actuals or actual feed)
+    REPLIES_PREVIEW_SIZE: int = 3  # replies shown under each comment
+
+    MAP_MARKERS_ZOOM: int = 15  # from this zoom markers are shown instead of clusters
+    MAP_CLUSTER_CELL_PX: int = 64
+    MAP_CLUSTER_SAMPLE_SIZE: int = 3
+    MAP_MAX_MARKERS: int = 500
+    NEARBY_MAX_RADIUS: int = 50_000  # meters
+
+    COUNTERS_FLUSH_INTERVAL: int = 5  # seconds
+    COUNTERS_FLUSH_BATCH: int = 500
+
+    NOTIFICATIONS_COALESCE_WINDOW: int = 60 * 15  # seconds, events of one initiative are folded into one notification
+    NOTIFICATIONS_ACTORS: int = 3  # latest actors kept in folded notification
+    NOTIFICATIONS_DRAIN_INTERVAL: float = 1  # seconds
+    NOTIFICATIONS_BATCH: int = 200
+    NOTIFICATIONS_CLAIM_IDLE: int = 60  # seconds, events not acknowledged for this long are taken by another worker
+    NOTIFICATIONS_MAX_DELIVERIES: int = 5  # events failing this many times are moved to the dead-letter stream
+    NOTIFICATIONS_STREAM_MAXLEN: int = 100_000  # acknowledged events are kept for replay until trimmed
+    NOTIFICATIONS_RETENTION_MONTHS: int = 6  # older monthly partitions are dropped
+    NOTIFICATIONS_PARTITIONS_AHEAD: int = 2  # months
 
     RAW_OBSCENE_WORDS_FILE = "obscene_words.txt"
     NORMALIZED_OBSCENE_WORDS_FILE = "normalized_words.txt"
@@ -51,6 +73,8 @@ class Settings(BaseSettings):
     FILE_ENCODING = "UTF-8"
     # FIREBASE
     FIREBASE_SECRETS = "./voices_firebase_secrets.json"
+    FCM_WORKERS: int = 8  # threads for blocking FCM batch calls
+    FCM_TOKEN_TTL_DAYS: int = 60  # device tokens not refreshed for this long are not used
 
     ALLOWED_PHOTO_TYPES = {"jpg", "jpeg", "png", "webp"}
     ALLOWED_VIDEO_TYPES = {"webp", "gif", "mp4", "mov", "aiff"}
@@ -59,6 +83,21 @@ class Settings(BaseSettings):
 
     FILE_MAX_SIZE_MB: int = 10
     FILE_MAX_SIZE_KB: int = 1024 * 1024 * FILE_MAX_SIZE_MB
+    UPLOAD_CHUNK_SIZE: int = 1024 * 256
+    S3_PART_SIZE: int = 1024 * 1024 * 8  # multipart upload part, s3 minimum is 5 Mb
+    IMAGE_VARIANTS: dict[str, tuple[int, int]] = {  # role: (max width px, webp quality)
+        "avatar": (160, 70),
+        "card": (480, 75),
+        "detail": (1080, 80),
+    }
+    STORAGE_STAT_TTL: int = 60  # seconds, cached local file stat answers conditional requests with 304
+    STORAGE_STAT_CACHE_SIZE: int = 4096
+    STORAGE_GC_GRACE_DAYS: int = 7  # fresh objects may be uploaded but not attached yet
+    STORAGE_GC_BATCH: int = 1000  # s3 DeleteObjects limit
+    IMAGE_WORKERS: int = 2  # processes encoding webp per api worker
+    IMAGE_QUEUE_SIZE: int = 8  # images encoding or waiting for a process, uploads above it are rejected
+    UPLOAD_PRESIGNED_EXPIRES: int = 60 * 15  # seconds, client has this long to put the file to s3
+    UPLOAD_RESULT_EXPIRES: int = 60 * 60 * 24  # seconds, status and url of a direct upload are kept this long
 
     ROCKETCHAT_WEBSOCKET: str
     ROCKETCHAT_USER: str
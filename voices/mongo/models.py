@@ -3,6 +3,7 @@ from enum import StrEnum
 
 import pydantic
 from beanie import Document
+from beanie.operators import In
 from pydantic import Field
 from uuid_extensions import uuid7
 
@@ -44,6 +45,11 @@ class SurveyAnswer(BaseDocument):
     user_id: uuid.UUID
     blocks: list[SurveyBlock]
 
+    @classmethod
+    async def get_user_answers(cls, user_id: uuid.UUID, survey_ids: list[uuid.UUID]) -> dict[str, "SurveyAnswer"]:
+        answers = await cls.find(cls.user_id == user_id, In(cls.survey_id, survey_ids)).to_list()
+        return {str(answer.survey_id): answer for answer in answers}
+
     class Settings:
         name = "survey_answers"
 
@@ -54,24 +60,49 @@ class Survey(BaseDocument):
     blocks: list[SurveyBlock]
     vote_count: int = 0
 
+    @classmethod
+    async def get_many(cls, survey_ids: list[uuid.UUID]) -> dict[str, "Survey"]:
+        surveys = await cls.find(In(cls.id, [str(survey_id) for survey_id in survey_ids])).to_list()
+        return {str(survey.id): survey for survey in surveys}
+
+    @classmethod
+    async def load_for_feed(cls, feed: list, user_id: str | None = None, with_user_values: bool = False) -> list:
+        """
+        Attaches surveys and vote state to a page of initiatives: one query for surveys, one for user answers
+        """
+        if not feed:
+            return feed
+
+        surveys = await cls.get_many([initiative.id for initiative in feed])
+        for initiative in feed:
+            survey = surveys.get(str(initiative.id))
+            if survey:
+                initiative.survey = survey
+
+        return await cls.load_vote_state(feed, user_id=user_id, with_user_values=with_user_values)
+
+    @classmethod
+    async def load_vote_state(cls, feed: list, user_id: str | None = None, with_user_values: bool = False) -> list:
+        survey_ids = [initiative.id for initiative in feed if initiative.survey]
+        if not survey_ids or not user_id:
+            return feed
+
+        answers = await SurveyAnswer.get_user_answers(user_id=uuid.UUID(user_id), survey_ids=survey_ids)
+        for initiative in feed:
+            answer = answers.get(str(initiative.id))
+            initiative.is_voted = bool(answer)
+            if answer and with_user_values:
+                for i, item in enumerate(answer.blocks):
+                    for j, choose in enumerate(item.answer):
+                        initiative.survey.blocks[i].answer[j].user_value = choose.value
+        return feed
+
     @classmethod
     async def get_surveys(cls, feed, token, set_liked=None, set_supported=None):
-        response = []
         for initiative in feed:
             initiative.is_liked = initiative.id in set_liked if set_liked else False
-            initiative.is_supported = initiative.id in set_liked if set_supported else False
-            initiative.survey = await Survey.get(str(initiative.id))
-            if token:
-                answer = await SurveyAnswer.find(
-                    SurveyAnswer.user_id == uuid.UUID(token.sub), SurveyAnswer.survey_id == initiative.id
-                ).first_or_none()
-                if answer:
-                    for i, item in enumerate(answer.blocks):
-                        for j, choose in enumerate(item.answer):
-                            initiative.survey.blocks[i].answer[j].user_value = choose.value
-
-            response.append(initiative)
-        return response
+            initiative.is_supported = initiative.id in set_supported if set_supported else False
+        return await cls.load_for_feed(feed, user_id=token.sub if token else None, with_user_values=True)
 
     class Settings:
         name = "surveys"
@@ -1,13 +1,23 @@
+from typing import Awaitable, Callable
 from uuid import uuid4
 
 import redis.asyncio as redis
+from redis.exceptions import ResponseError, WatchError
 
+from voices.app.auth.models import CITY_MAPPING
 from voices.config import settings
 
 
 class Redis:
     con: redis.Redis
+    notifications_stream = "ns"  # ns - notification events
+    notifications_group = "notifications"
+    notifications_dead_letters = "nsd"  # nsd - notification events which could not be stored
     email_expires = 60 * 60 * 24  # 1 day in seconds
+    feed_expires = 60  # 1 minute in seconds
+    total_expires = 60 * 5  # 5 minutes in seconds
+    stored_counters_expires = feed_expires  # outlives every feed page cached before the flush which wrote it
+    upload_expires = settings.UPLOAD_PRESIGNED_EXPIRES + settings.UPLOAD_RESULT_EXPIRES
 
     def __new__(cls):
         if not hasattr(cls, "instance"):
@@ -15,8 +25,8 @@ class Redis:
         return cls.instance
 
     @classmethod
-    async def connect(cls) -> None:
-        cls.con = redis.from_url(settings.REDIS_URL, encoding="utf-8", decode_responses=True)
+    async def connect(cls, url: str = settings.REDIS_URL) -> None:
+        cls.con = redis.from_url(url, encoding="utf-8", decode_responses=True)
 
     @classmethod
     async def disconnect(cls) -> None:
@@ -38,3 +48,218 @@ class Redis:
     async def delete_confirm_email_token(cls, user_id: str) -> str | None:
         token = await cls.con.delete(f"ce:{user_id}")
         return token
+
+    @staticmethod
+    def _city_key(city: str) -> str:
+        return str(CITY_MAPPING.get(city, city))
+
+    @classmethod
+    async def get_feed_page(cls, city: str, filters: str) -> tuple[int, str | None]:
+        """
+        Returns current city feed version and anonymous feed page cached under it
+        """
+        city_key = cls._city_key(city)
+        version = int(await cls.con.get(f"fv:{city_key}") or 0)  # fv - feed version
+        page = await cls.con.get(f"f:{city_key}:{version}:{filters}")  # f - feed page
+        return version, page
+
+    @classmethod
+    async def set_feed_page(cls, city: str, version: int, filters: str, page: str) -> None:
+        await cls.con.set(f"f:{cls._city_key(city)}:{version}:{filters}", value=page, ex=cls.feed_expires)
+
+    @classmethod
+    async def bump_feed_version(cls, city: str) -> None:
+        """
+        Invalidates every cached feed page of the city, old pages expire by ttl
+        """
+        await cls.con.incr(f"fv:{cls._city_key(city)}")
+
+    @classmethod
+    async def get_total(cls, key: str, count: Callable[[], Awaitable[int]]) -> int:
+        """
+        Returns approximate list total, COUNT query runs only when cached value expired or was reset
+        """
+        total = await cls.con.get(f"t:{key}")  # t - list total
+        if total is not None:
+            return int(total)
+        total = await count()
+        await cls.con.set(f"t:{key}", value=total, ex=cls.total_expires)
+        return total
+
+    @classmethod
+    async def reset_total(cls, key: str) -> None:
+        await cls.con.delete(f"t:{key}")
+
+    @classmethod
+    async def acquire_push_window(cls, key: str, expires: int) -> bool:
+        """
+        True for the first push of the key within expires seconds
+        """
+        return bool(await cls.con.set(f"pw:{key}", value=1, nx=True, ex=expires))  # pw - push window
+
+    @classmethod
+    async def add_notification(
+        cls, user_id_send: str, user_id_get: str, status: str, initiative_id=None, initiative_image: str = None
+    ) -> None:
+        """
+        Appends notification event to the stream, drain_notifications task stores and pushes them in batches
+        """
+        event = {
+            "user_id_send": str(user_id_send),
+            "user_id_get": str(user_id_get),
+            "status": status,
+            "initiative_id": str(initiative_id) if initiative_id else "",
+            "initiative_image": initiative_image or "",
+        }
+        await cls.con.xadd(
+            cls.notifications_stream, event, maxlen=settings.NOTIFICATIONS_STREAM_MAXLEN, approximate=True
+        )
+
+    @classmethod
+    async def read_notifications(cls, consumer: str, count: int) -> list[tuple[str, dict]]:
+        """
+        Returns events left unacknowledged by crashed consumers first, then new ones
+        """
+        try:
+            await cls.con.xgroup_create(cls.notifications_stream, cls.notifications_group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+        _, events, *_ = await cls.con.xautoclaim(
+            cls.notifications_stream,
+            cls.notifications_group,
+            consumer,
+            min_idle_time=settings.NOTIFICATIONS_CLAIM_IDLE * 1000,
+            count=count,
+        )
+        if events := await cls._dead_letter_notifications(events):
+            return events
+        result = await cls.con.xreadgroup(
+            cls.notifications_group, consumer, {cls.notifications_stream: ">"}, count=count
+        )
+        return result[0][1] if result else []
+
+    @classmethod
+    async def _dead_letter_notifications(cls, events: list[tuple[str, dict]]) -> list[tuple[str, dict]]:
+        """
+        Moves claimed events delivered NOTIFICATIONS_MAX_DELIVERIES times to the dead-letter stream,
+        so one event which keeps failing does not block the stream forever, returns the rest
+        """
+        if not events:
+            return events
+        pending = await cls.con.xpending_range(
+            cls.notifications_stream, cls.notifications_group, min=events[0][0], max=events[-1][0], count=len(events)
+        )
+        failing = {
+            entry["message_id"] for entry in pending if entry["times_delivered"] > settings.NOTIFICATIONS_MAX_DELIVERIES
+        }
+        await cls.dead_letter_notifications([(event_id, event) for event_id, event in events if event_id in failing])
+        return [(event_id, event) for event_id, event in events if event_id not in failing]
+
+    @classmethod
+    async def dead_letter_notifications(cls, events: list[tuple[str, dict]]) -> None:
+        if not events:
+            return
+        async with cls.con.pipeline(transaction=True) as pipe:
+            for event_id, event in events:
+                pipe.xadd(
+                    cls.notifications_dead_letters,
+                    {**event, "event_id": event_id},
+                    maxlen=settings.NOTIFICATIONS_STREAM_MAXLEN,
+                    approximate=True,
+                )
+            pipe.xack(cls.notifications_stream, cls.notifications_group, *(event_id for event_id, _ in events))
+            await pipe.execute()
+
+    @classmethod
+    async def ack_notifications(cls, event_ids: list[str]) -> None:
+        await cls.con.xack(cls.notifications_stream, cls.notifications_group, *event_ids)
+
+    @classmethod
+    async def set_upload(cls, upload_id: str, **fields: str) -> None:
+        async with cls.con.pipeline(transaction=True) as pipe:
+            pipe.hset(f"u:{upload_id}", mapping=fields)  # u - direct upload, status, extension and url
+            pipe.expire(f"u:{upload_id}", cls.upload_expires)
+            await pipe.execute()
+
+    @classmethod
+    async def get_upload(cls, upload_id: str) -> dict[str, str]:
+        return await cls.con.hgetall(f"u:{upload_id}")
+
+    @classmethod
+    async def start_upload_processing(cls, upload_id: str, status: str, pending: str) -> bool:
+        """
+        Moves upload from pending to status only once, repeated completion calls do not queue it again
+        """
+        async with cls.con.pipeline(transaction=True) as pipe:
+            while True:
+                try:
+                    await pipe.watch(f"u:{upload_id}")
+                    if await pipe.hget(f"u:{upload_id}", "status") != pending:
+                        return False
+                    pipe.multi()
+                    pipe.hset(f"u:{upload_id}", "status", status)
+                    await pipe.execute()
+                    return True
+                except WatchError:
+                    continue
+
+    @classmethod
+    async def incr_counters(cls, initiative_id: str, counters: dict[str, int]) -> None:
+        """
+        Accumulates initiative counter deltas, they are written to postgres by flush_counters task
+        """
+        async with cls.con.pipeline(transaction=True) as pipe:
+            for field, delta in counters.items():
+                pipe.hincrby(f"c:{initiative_id}", field, delta)  # c - pending counters
+            pipe.sadd("cd", str(initiative_id))  # cd - initiatives with pending counters
+            await pipe.execute()
+
+    @classmethod
+    async def get_counters(cls, initiative_ids: list) -> list[dict[str, int]]:
+        async with cls.con.pipeline(transaction=False) as pipe:
+            for initiative_id in initiative_ids:
+                pipe.hgetall(f"c:{initiative_id}")
+            result = await pipe.execute()
+        return [{field: int(delta) for field, delta in counters.items()} for counters in result]
+
+    @classmethod
+    async def set_stored_counters(cls, counters: dict[str, dict[str, int]]) -> None:
+        """
+        Keeps counters just written to postgres, cached feed pages take them instead of being invalidated
+        """
+        async with cls.con.pipeline(transaction=False) as pipe:
+            for initiative_id, stored in counters.items():
+                pipe.hset(f"sc:{initiative_id}", mapping=stored)  # sc - stored counters
+                pipe.expire(f"sc:{initiative_id}", cls.stored_counters_expires)
+            await pipe.execute()
+
+    @classmethod
+    async def get_stored_counters(cls, initiative_ids: list) -> list[dict[str, int]]:
+        async with cls.con.pipeline(transaction=False) as pipe:
+            for initiative_id in initiative_ids:
+                pipe.hgetall(f"sc:{initiative_id}")
+            result = await pipe.execute()
+        return [{field: int(value) for field, value in stored.items()} for stored in result]
+
+    @classmethod
+    async def pop_counters(cls, count: int) -> dict[str, dict[str, int]]:
+        """
+        Takes pending deltas of up to count initiatives, new deltas go to fresh hashes
+        """
+        initiative_ids = await cls.con.spop("cd", count)
+        if not initiative_ids:
+            return {}
+
+        async with cls.con.pipeline(transaction=True) as pipe:
+            for initiative_id in initiative_ids:
+                pipe.hgetall(f"c:{initiative_id}")
+                pipe.delete(f"c:{initiative_id}")
+            result = await pipe.execute()
+
+        return {
+            initiative_id: {field: int(delta) for field, delta in counters.items()}
+            for initiative_id, counters in zip(initiative_ids, result[::2])
+            if counters
+        }
@@ -2,6 +2,7 @@ from asyncio import get_event_loop_policy
 
 import pytest
 import pytest_asyncio
+from beanie import init_beanie
 from httpx import AsyncClient
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import sessionmaker
@@ -9,8 +10,12 @@ from sqlalchemy.orm import sessionmaker
 from main import app
 from voices.app.auth.views import TokenData
 from voices.auth.jwt_token import create_access_token
+from voices.config import settings
 from voices.db import Base
 from voices.db.base import TestSessionMaker, container, test_engine, test_session_maker
+from voices.mongo import mongo_client
+from voices.mongo.models import Survey, SurveyAnswer
+from voices.redis import Redis
 from voices.tests.factories.user import UserFactory
 
 
@@ -32,6 +37,23 @@ async def prepare_db():
         yield
 
 
+@pytest_asyncio.fixture(autouse=True, scope="function")
+async def prepare_redis():
+    # AsyncClient does not run the app lifespan, which connects Redis
+    await Redis.connect(settings.REDIS_TEST_URL)
+    await Redis.con.flushdb()
+    yield
+    await Redis.disconnect()
+
+
+@pytest_asyncio.fixture
+async def mongo():
+    # feed endpoints attach surveys, beanie is initialized by the app lifespan too
+    await init_beanie(database=mongo_client[settings.MONGO_TEST_DATABASE], document_models=[Survey, SurveyAnswer])
+    yield
+    await mongo_client.drop_database(settings.MONGO_TEST_DATABASE)
+
+
 @pytest_asyncio.fixture
 async def session(prepare_db) -> AsyncSession:
     async with test_session_maker() as session:
@@ -0,0 +1,22 @@
+import factory
+from async_factory_boy.factory.sqlalchemy import AsyncSQLAlchemyFactory
+from faker import Factory as FakerFactory
+from pytest_factoryboy import register
+
+from voices.app.notifications.models import Notification
+from voices.db.base import sc_session
+
+faker = FakerFactory.create()
+
+
+@register
+class NotificationFactory(AsyncSQLAlchemyFactory):
+    # owner_id and user_id are passed explicitly, the model has no relationships to users
+    type = "like"
+    text = factory.LazyAttribute(lambda x: faker.sentence())
+    first_name = factory.LazyAttribute(lambda x: faker.first_name())
+    last_name = factory.LazyAttribute(lambda x: faker.last_name())
+
+    class Meta:
+        model = Notification
+        sqlalchemy_session = sc_session
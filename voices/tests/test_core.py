@@ -0,0 +1,48 @@
+import uuid
+from datetime import datetime
+
+import pytest
+
+from voices.app.core.exceptions import ValidationError
+from voices.app.core.protocol import Cursor
+
+
+class TestCursor:
+    @pytest.fixture
+    def key(self) -> tuple:
+        return datetime(2023, 9, 1, 12, 30), uuid.uuid4()
+
+    def test_round_trip(self, key: tuple):
+        cursor = Cursor.encode(key, "city=test")
+        assert Cursor.decode(cursor, "city=test") == key
+
+    def test_empty(self):
+        assert Cursor.decode(None) is None
+        assert Cursor.decode("") is None
+
+    def test_tampered_payload(self, key: tuple):
+        data, signature = Cursor.encode(key).split(".")
+        forged = Cursor._b64encode(Cursor._b64decode(data).replace(b"2023", b"2022"))
+        with pytest.raises(ValidationError):
+            Cursor.decode(f"{forged}.{signature}")
+
+    def test_tampered_signature(self, key: tuple):
+        data, signature = Cursor.encode(key).split(".")
+        forged = ("A" if signature[0] != "A" else "B") + signature[1:]
+        with pytest.raises(ValidationError):
+            Cursor.decode(f"{data}.{forged}")
+
+    def test_other_filters(self, key: tuple):
+        cursor = Cursor.encode(key, "city=test")
+        with pytest.raises(ValidationError):
+            Cursor.decode(cursor, "city=other")
+
+    def test_other_key_length(self, key: tuple):
+        cursor = Cursor.encode(key[:1])
+        with pytest.raises(ValidationError):
+            Cursor.decode(cursor)
+
+    @pytest.mark.parametrize("cursor", ["incorrect_cursor", "a.b.c", "!!!.???"])
+    def test_incorrect(self, cursor: str):
+        with pytest.raises(ValidationError):
+            Cursor.decode(cursor)
@@ -2,12 +2,19 @@ import pytest
 import pytest_asyncio
 from httpx import AsyncClient
 
+from voices.app.core.protocol import GeometryPoint
 from voices.app.initiatives.models import Comment, Initiative
 from voices.config import settings
 from voices.tests.factories.initiatives import CommentFactory, InitiativeFactory
 from voices.tests.factories.user import UserFactory
 
 PAGE_INCREMENT = 1
+BBOX = "min_lat=57.5&min_lon=39.8&max_lat=57.7&max_lon=40.0"
+
+
+async def create_located(lat: float, lon: float, city: str = settings.DEFAULT_CITY, approved: bool = True):
+    location = GeometryPoint.to_str({"lat": lat, "lon": lon})
+    return await InitiativeFactory.create(city=city, approved=approved, location=location)
 
 
 class TestComment:
@@ -39,19 +46,39 @@ class TestComment:
         response = await client.get(f"api/initiatives/{comment.initiative_id}/comments")
         assert response.json()["payload"]["comments"][0]["replies"] is not None
 
+    @pytest.mark.asyncio
+    async def test_get_replies(self, client: AsyncClient, comment: Comment):
+        response = await client.get(f"api/initiatives/{comment.initiative_id}/comments/{comment.id}/replies")
+        payload = response.json()["payload"]
+        assert len(payload["replies"]) == 1
+        assert payload["pagination"]["isNext"] is False
+
     @pytest.mark.asyncio
     async def test_get_pagination(self, client: AsyncClient, pagination_comment: Initiative):
         response = await client.get(f"api/initiatives/{pagination_comment.id}/comments")
-        comments = response.json()["payload"]["comments"]
-        assert len(comments) == settings.DEFAULT_PAGE_SIZE
+        payload = response.json()["payload"]
+        assert len(payload["comments"]) == settings.DEFAULT_PAGE_SIZE
+        assert payload["pagination"]["isNext"] is True
+
+        response = await client.get(
+            f"api/initiatives/{pagination_comment.id}/comments?cursor={payload['pagination']['cursor']}"
+        )
+        payload = response.json()["payload"]
+        assert len(payload["comments"]) == PAGE_INCREMENT
+        assert payload["pagination"]["cursor"] is None
+
+    @pytest.mark.asyncio
+    async def test_get_foreign_cursor(self, client: AsyncClient, pagination_comment: Initiative, comment: Comment):
+        response = await client.get(f"api/initiatives/{pagination_comment.id}/comments")
+        cursor = response.json()["payload"]["pagination"]["cursor"]
 
-        response = await client.get(f"api/initiatives/{pagination_comment.id}/comments?last_id={comments[-1]['id']}")
-        comments = response.json()["payload"]["comments"]
-        assert len(comments) == PAGE_INCREMENT
+        response = await client.get(f"api/initiatives/{comment.initiative_id}/comments?cursor={cursor}")
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "ValidationError"
 
     @pytest.mark.asyncio
-    async def test_get_incorrect_last_id(self, client: AsyncClient, comment: Comment):
-        response = await client.get(f"api/initiatives/{comment.initiative_id}/comments?last_id=incorrect_id")
+    async def test_get_incorrect_cursor(self, client: AsyncClient, comment: Comment):
+        response = await client.get(f"api/initiatives/{comment.initiative_id}/comments?cursor=incorrect_cursor")
         assert response.json()["code"] == 400
         assert response.json()["exception_class"] == "ValidationError"
 
@@ -129,3 +156,197 @@ class TestComment:
         response = await client.post("api/initiatives/incorrect_id/comments", headers=headers)
         assert response.json()["code"] == 400
         assert response.json()["exception_class"] == "ValidationError"
+
+
+class TestLike:
+    @pytest_asyncio.fixture
+    async def initiative(self):
+        return await InitiativeFactory.create()
+
+    @pytest.mark.asyncio
+    async def test_like_twice(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.post(f"api/initiatives/{initiative.id}/like", headers=headers)
+        assert response.json()["code"] == 200
+
+        response = await client.post(f"api/initiatives/{initiative.id}/like", headers=headers)
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "AlreadyLikedError"
+
+    @pytest.mark.asyncio
+    async def test_unlike_twice(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.post(f"api/initiatives/{initiative.id}/like", headers=headers)
+        response = await client.post(f"api/initiatives/{initiative.id}/unlike", headers=headers)
+        assert response.json()["code"] == 200
+
+        response = await client.post(f"api/initiatives/{initiative.id}/unlike", headers=headers)
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "AlreadyUnlikedError"
+
+    @pytest.mark.asyncio
+    async def test_like_not_found(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.post(f"api/initiatives/{initiative.user_id}/like", headers=headers)
+        assert response.json()["code"] == 404
+
+
+class TestSupport:
+    @pytest_asyncio.fixture
+    async def initiative(self):
+        return await InitiativeFactory.create()
+
+    @pytest.mark.asyncio
+    async def test_support_twice(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        response = await client.post(f"api/initiatives/{initiative.id}/support", headers=headers)
+        assert response.json()["code"] == 200
+
+        response = await client.post(f"api/initiatives/{initiative.id}/support", headers=headers)
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "AlreadySupportedError"
+
+    @pytest.mark.asyncio
+    async def test_unsupport_twice(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.post(f"api/initiatives/{initiative.id}/support", headers=headers)
+        response = await client.post(f"api/initiatives/{initiative.id}/unsupport", headers=headers)
+        assert response.json()["code"] == 200
+
+        response = await client.post(f"api/initiatives/{initiative.id}/unsupport", headers=headers)
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "AlreadyUnsupportedError"
+
+
+class TestMaps:
+    @pytest_asyncio.fixture
+    async def initiatives(self) -> list[Initiative]:
+        first = await create_located(57.620, 39.890)
+        second = await create_located(57.621, 39.891)
+        await create_located(55.750, 37.620)  # outside of the viewport
+        await create_located(57.622, 39.892, approved=False)
+        await create_located(57.623, 39.893, city="test")
+        return [first, second]
+
+    @pytest.mark.asyncio
+    async def test_clusters(self, client: AsyncClient, initiatives: list[Initiative]):
+        response = await client.get(f"api/initiatives/maps?{BBOX}&zoom=10")
+        payload = response.json()["payload"]
+        assert response.json()["code"] == 200
+        assert payload["markers"] == []
+        assert len(payload["clusters"]) == 1
+        cluster = payload["clusters"][0]
+        assert cluster["count"] == 2
+        assert set(cluster["sampleIds"]) == {str(initiative.id) for initiative in initiatives}
+        assert 57.620 <= cluster["location"]["lat"] <= 57.621
+        assert 39.890 <= cluster["location"]["lon"] <= 39.891
+
+    @pytest.mark.asyncio
+    async def test_markers(self, client: AsyncClient, initiatives: list[Initiative]):
+        response = await client.get(f"api/initiatives/maps?{BBOX}&zoom={settings.MAP_MARKERS_ZOOM}")
+        payload = response.json()["payload"]
+        assert response.json()["code"] == 200
+        assert payload["clusters"] == []
+        assert {marker["id"] for marker in payload["markers"]} == {str(initiative.id) for initiative in initiatives}
+
+    @pytest.mark.asyncio
+    async def test_empty_viewport(self, client: AsyncClient, initiatives: list[Initiative]):
+        response = await client.get("api/initiatives/maps?min_lat=0&min_lon=0&max_lat=1&max_lon=1&zoom=10")
+        assert response.json()["payload"]["clusters"] == []
+
+    @pytest.mark.asyncio
+    async def test_incorrect_zoom(self, client: AsyncClient):
+        response = await client.get(f"api/initiatives/maps?{BBOX}&zoom=23")
+        assert response.json()["code"] == 400
+
+
+class TestNearby:
+    @pytest_asyncio.fixture
+    async def initiatives(self, mongo) -> list[Initiative]:
+        nearest = await create_located(57.6200, 39.8900)
+        near = await create_located(57.6210, 39.8900)  # about 110 m
+        farther = await create_located(57.6250, 39.8900)  # about 560 m
+        await create_located(57.6300, 39.8900)  # about 1.1 km, outside of the radius
+        await create_located(57.6201, 39.8900, approved=False)
+        return [nearest, near, farther]
+
+    @pytest_asyncio.fixture
+    async def pagination_initiatives(self, mongo) -> list[Initiative]:
+        return [
+            await create_located(57.6200 + 0.0001 * i, 39.8900)
+            for i in range(settings.DEFAULT_PAGE_SIZE + PAGE_INCREMENT)
+        ]
+
+    @pytest.mark.asyncio
+    async def test_get_ordered(self, client: AsyncClient, initiatives: list[Initiative]):
+        response = await client.get("api/initiatives/nearby?lat=57.62&lon=39.89&radius=1000")
+        payload = response.json()["payload"]
+        assert response.json()["code"] == 200
+        assert [initiative["id"] for initiative in payload["feed"]] == [
+            str(initiative.id) for initiative in initiatives
+        ]
+        distances = [initiative["distance"] for initiative in payload["feed"]]
+        assert distances == sorted(distances)
+        assert distances[-1] < 1000
+        assert payload["pagination"]["isNext"] is False
+
+    @pytest.mark.asyncio
+    async def test_get_pagination(self, client: AsyncClient, pagination_initiatives: list[Initiative]):
+        response = await client.get("api/initiatives/nearby?lat=57.62&lon=39.89")
+        payload = response.json()["payload"]
+        assert len(payload["feed"]) == settings.DEFAULT_PAGE_SIZE
+        assert payload["pagination"]["isNext"] is True
+
+        response = await client.get(
+            f"api/initiatives/nearby?lat=57.62&lon=39.89&cursor={payload['pagination']['cursor']}"
+        )
+        next_payload = response.json()["payload"]
+        assert len(next_payload["feed"]) == PAGE_INCREMENT
+        assert next_payload["feed"][0]["distance"] >= payload["feed"][-1]["distance"]
+        assert next_payload["feed"][0]["id"] == str(pagination_initiatives[-1].id)
+
+    @pytest.mark.asyncio
+    async def test_get_foreign_cursor(self, client: AsyncClient, pagination_initiatives: list[Initiative]):
+        response = await client.get("api/initiatives/nearby?lat=57.62&lon=39.89")
+        cursor = response.json()["payload"]["pagination"]["cursor"]
+
+        response = await client.get(f"api/initiatives/nearby?lat=57.62&lon=39.89&radius=500&cursor={cursor}")
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "ValidationError"
+
+    @pytest.mark.asyncio
+    async def test_get_incorrect_radius(self, client: AsyncClient):
+        response = await client.get(
+            f"api/initiatives/nearby?lat=57.62&lon=39.89&radius={settings.NEARBY_MAX_RADIUS + 1}"
+        )
+        assert response.json()["code"] == 400
+
+
+class TestPendingCounters:
+    @pytest_asyncio.fixture
+    async def initiative(self, mongo) -> Initiative:
+        return await create_located(57.6200, 39.8900)
+
+    @pytest.mark.asyncio
+    async def test_like_counted(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.post(f"api/initiatives/{initiative.id}/like", headers=headers)
+        await client.post(f"api/initiatives/{initiative.id}/support", headers=headers)
+
+        response = await client.get("api/initiatives/nearby?lat=57.62&lon=39.89", headers=headers)
+        feed = response.json()["payload"]["feed"]
+        assert feed[0]["likesCount"] == 1
+        assert feed[0]["isLiked"] is True
+        assert feed[0]["supportsCount"] == 1
+        assert feed[0]["isSupported"] is True
+
+    @pytest.mark.asyncio
+    async def test_unlike_counted(self, token, client: AsyncClient, initiative: Initiative):
+        headers = {"Authorization": f"Bearer {token}"}
+        await client.post(f"api/initiatives/{initiative.id}/like", headers=headers)
+        await client.post(f"api/initiatives/{initiative.id}/unlike", headers=headers)
+
+        response = await client.get("api/initiatives/nearby?lat=57.62&lon=39.89", headers=headers)
+        feed = response.json()["payload"]["feed"]
+        assert feed[0]["likesCount"] == 0
+        assert feed[0]["isLiked"] is False
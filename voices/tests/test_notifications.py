@@ -0,0 +1,264 @@
+import uuid
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+
+import pytest
+import pytest_asyncio
+from firebase_admin import exceptions, messaging
+from httpx import AsyncClient
+
+from voices.app.auth.models import User
+from voices.app.auth.views import TokenData
+from voices.app.core.protocol import Cursor
+from voices.app.notifications.models import Notification, NotificationStatus
+from voices.auth.jwt_token import create_access_token
+from voices.broker.push import FCM_BATCH_SIZE, PushOutcome, PushResult, dead_tokens, send_push
+from voices.config import settings
+from voices.db.connection import Transaction
+from voices.tests.factories.notifications import NotificationFactory
+from voices.tests.factories.user import UserFactory
+
+TEXT_MANY = "и ещё {others} оценили вашу запись"
+
+
+def push_message(token: str, title: str = "Новый лайк") -> messaging.Message:
+    return messaging.Message(
+        token=token,
+        notification=messaging.Notification(title=title, body="Текст уведомления"),
+        data={"type": "like"},
+    )
+
+
+class TestSendPush:
+    @pytest.fixture
+    def batches(self, monkeypatch) -> list[int]:
+        # fcm is outside of tests, every token starting with "dead" is reported unregistered
+        batches = []
+
+        def send_each(messages: list[messaging.Message], app=None):
+            batches.append(len(messages))
+            return SimpleNamespace(
+                responses=[
+                    SimpleNamespace(message_id=None, exception=messaging.UnregisteredError("unregistered"))
+                    if message.token.startswith("dead")
+                    else SimpleNamespace(message_id=f"id-{message.token}", exception=None)
+                    for message in messages
+                ]
+            )
+
+        monkeypatch.setattr(messaging, "send_each", send_each)
+        return batches
+
+    @pytest.mark.asyncio
+    async def test_batches(self, batches: list[int]):
+        messages = [push_message(f"token-{i}") for i in range(FCM_BATCH_SIZE + 1)] + [push_message("dead")]
+        results = await send_push(messages)
+        assert sorted(batches) == [2, FCM_BATCH_SIZE]
+        assert [result.token for result in results] == [message.token for message in messages]
+        assert [result.outcome for result in results].count(PushOutcome.DELIVERED) == FCM_BATCH_SIZE + 1
+        assert results[-1].outcome == PushOutcome.UNREGISTERED
+
+    @pytest.mark.asyncio
+    async def test_batch_rejected(self, monkeypatch):
+        def send_each(messages: list[messaging.Message], app=None):
+            raise exceptions.UnavailableError("unavailable")
+
+        monkeypatch.setattr(messaging, "send_each", send_each)
+        results = await send_push([push_message("first"), push_message("second")])
+        assert [result.outcome for result in results] == [PushOutcome.RETRY, PushOutcome.RETRY]
+
+
+class TestPushOutcome:
+    @pytest.mark.parametrize(
+        "error, outcome",
+        [
+            (None, PushOutcome.DELIVERED),
+            (messaging.UnregisteredError("unregistered"), PushOutcome.UNREGISTERED),
+            (messaging.SenderIdMismatchError("mismatch"), PushOutcome.UNREGISTERED),
+            (exceptions.InvalidArgumentError("invalid"), PushOutcome.INVALID),
+            (messaging.QuotaExceededError("quota"), PushOutcome.RETRY),
+            (exceptions.UnavailableError("unavailable"), PushOutcome.RETRY),
+            (exceptions.InternalError("internal"), PushOutcome.RETRY),
+            (exceptions.PermissionDeniedError("denied"), PushOutcome.FAILED),
+        ],
+    )
+    def test_outcome(self, error: exceptions.FirebaseError | None, outcome: PushOutcome):
+        result = PushResult(token="token", message_id=None if error else "message_id", error=error)
+        assert result.outcome == outcome
+
+
+class TestDeadTokens:
+    def test_unregistered(self):
+        messages = [push_message("alive"), push_message("dead")]
+        results = [
+            PushResult(token="alive", message_id="1", error=None),
+            PushResult(token="dead", message_id=None, error=messaging.UnregisteredError("unregistered")),
+        ]
+        assert dead_tokens(messages, results) == ["dead"]
+
+    def test_invalid_token(self):
+        # same payload was delivered to another token, so the token is what is wrong
+        messages = [push_message("alive"), push_message("malformed")]
+        results = [
+            PushResult(token="alive", message_id="1", error=None),
+            PushResult(token="malformed", message_id=None, error=exceptions.InvalidArgumentError("invalid")),
+        ]
+        assert dead_tokens(messages, results) == ["malformed"]
+
+    def test_invalid_payload(self):
+        # the payload was not delivered anywhere, tokens must be kept
+        messages = [
+            push_message("alive"),
+            push_message("first", title="x" * 5000),
+            push_message("second", title="x" * 5000),
+        ]
+        results = [
+            PushResult(token="alive", message_id="1", error=None),
+            PushResult(token="first", message_id=None, error=exceptions.InvalidArgumentError("invalid")),
+            PushResult(token="second", message_id=None, error=exceptions.InvalidArgumentError("invalid")),
+        ]
+        assert dead_tokens(messages, results) == []
+
+    def test_retry_kept(self):
+        messages = [push_message("busy")]
+        results = [PushResult(token="busy", message_id=None, error=exceptions.UnavailableError("unavailable"))]
+        assert dead_tokens(messages, results) == []
+
+
+class TestFold:
+    @pytest.fixture
+    def first_actor(self) -> dict:
+        return Notification.actor(uuid.uuid4(), "Иван", "Иванов", None)
+
+    @pytest.fixture
+    def notification(self, first_actor: dict) -> dict:
+        return {
+            "text": "оценил вашу запись",
+            "last_event_id": "1700000000000-0",
+            "actors_count": 1,
+            "actors": [first_actor],
+        }
+
+    def test_fold(self, notification: dict, first_actor: dict):
+        actor = Notification.actor(uuid.uuid4(), "Пётр", "Петров", "https://example.com/avatar.webp")
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000001-0") is True
+        assert notification["actors_count"] == 2
+        assert notification["actors"] == [actor, first_actor]
+        assert notification["user_id"] == uuid.UUID(actor["user_id"])
+        assert notification["avatar_url"] == actor["avatar_url"]
+        assert notification["text"] == TEXT_MANY.format(others=1)
+        assert notification["last_event_id"] == "1700000000001-0"
+
+    def test_replayed_event(self, notification: dict):
+        actor = Notification.actor(uuid.uuid4(), "Пётр", "Петров", None)
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000001-0") is True
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000001-0") is False
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000000-5") is False
+        assert notification["actors_count"] == 2
+
+    def test_stream_order(self, notification: dict):
+        # sequence is compared as a number, "-10" is after "-9"
+        notification["last_event_id"] = "1700000000000-9"
+        actor = Notification.actor(uuid.uuid4(), "Пётр", "Петров", None)
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000000-10") is True
+
+    def test_same_actor(self, notification: dict, first_actor: dict):
+        assert Notification.fold(notification, first_actor, TEXT_MANY, "1700000000001-0") is False
+        assert notification["actors_count"] == 1
+        assert notification["last_event_id"] == "1700000000001-0"
+
+    def test_first_event(self, notification: dict):
+        notification["last_event_id"] = None
+        actor = Notification.actor(uuid.uuid4(), "Пётр", "Петров", None)
+        assert Notification.fold(notification, actor, TEXT_MANY, "1700000000000-0") is True
+
+    def test_latest_actors(self, notification: dict):
+        for i in range(settings.NOTIFICATIONS_ACTORS + 1):
+            actor = Notification.actor(uuid.uuid4(), "Пётр", "Петров", None)
+            Notification.fold(notification, actor, TEXT_MANY, f"1700000000001-{i}")
+        assert len(notification["actors"]) == settings.NOTIFICATIONS_ACTORS
+        assert notification["actors"][0] == actor
+        assert notification["actors_count"] == settings.NOTIFICATIONS_ACTORS + 2
+
+
+class TestInbox:
+    @pytest_asyncio.fixture
+    async def owner(self) -> User:
+        return await UserFactory.create()
+
+    @pytest.fixture
+    def headers(self, owner: User) -> dict:
+        access_token, _ = create_access_token(TokenData(sub=str(owner.id), email=owner.email, role=owner.role))
+        return {"Authorization": f"Bearer {access_token}"}
+
+    @pytest_asyncio.fixture
+    async def notifications(self, owner: User) -> list[Notification]:
+        actor = await UserFactory.create()
+        created_at = datetime.now() - timedelta(hours=1)
+        return [
+            await NotificationFactory.create(
+                owner_id=owner.id, user_id=actor.id, created_at=created_at + timedelta(minutes=i)
+            )
+            for i in range(3)
+        ]
+
+    @staticmethod
+    async def reconcile():
+        # the counter is kept by a trigger of migrations, metadata.create_all of tests has no triggers
+        async with Transaction():
+            await Notification.reconcile_unread_count()
+
+    @pytest.mark.asyncio
+    async def test_unread_count(self, client: AsyncClient, headers: dict, notifications: list[Notification]):
+        await self.reconcile()
+        response = await client.get("api/notifications/unread-count", headers=headers)
+        assert response.json()["code"] == 200
+        assert response.json()["payload"]["count"] == len(notifications)
+
+    @pytest.mark.asyncio
+    async def test_unread_count_nonauthorized(self, client: AsyncClient):
+        response = await client.get("api/notifications/unread-count")
+        assert response.json()["code"] == 401
+
+    @pytest.mark.asyncio
+    async def test_read_all(self, client: AsyncClient, headers: dict, notifications: list[Notification]):
+        response = await client.patch("api/notifications/read", headers=headers)
+        assert response.json()["code"] == 200
+
+        await self.reconcile()
+        response = await client.get("api/notifications/unread-count", headers=headers)
+        assert response.json()["payload"]["count"] == 0
+
+    @pytest.mark.asyncio
+    async def test_read_cursor(
+        self, client: AsyncClient, owner: User, headers: dict, notifications: list[Notification]
+    ):
+        response = await client.get("api/notifications", headers=headers)
+        read_cursor = response.json()["payload"]["readCursor"]
+        newer = await NotificationFactory.create(  # arrived after the page was shown
+            owner_id=owner.id,
+            user_id=notifications[0].user_id,
+            created_at=notifications[-1].created_at + timedelta(minutes=1),
+        )
+
+        response = await client.patch(f"api/notifications/read?cursor={read_cursor}", headers=headers)
+        assert response.json()["code"] == 200
+
+        response = await client.get("api/notifications", headers=headers)
+        statuses = {
+            notification["id"]: notification["status"] for notification in response.json()["payload"]["notifications"]
+        }
+        assert statuses.pop(str(newer.id)) == NotificationStatus.UNREADED
+        assert set(statuses.values()) == {NotificationStatus.READED}
+
+        await self.reconcile()
+        response = await client.get("api/notifications/unread-count", headers=headers)
+        assert response.json()["payload"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_read_foreign_cursor(self, client: AsyncClient, headers: dict, notifications: list[Notification]):
+        foreign = await UserFactory.create()
+        cursor = Cursor.encode((notifications[0].created_at, notifications[0].id), f"notifications:{foreign.id}")
+        response = await client.patch(f"api/notifications/read?cursor={cursor}", headers=headers)
+        assert response.json()["code"] == 400
+        assert response.json()["exception_class"] == "ValidationError"
@@ -0,0 +1,143 @@
+import pytest
+import pytest_asyncio
+from fastapi import Request
+from httpx import AsyncClient
+
+from voices.app.storage.local import RangeNotSatisfiable, get_range
+from voices.app.storage.s3 import S3Service
+from voices.app.storage.service import UploadStatus
+from voices.broker.tasks import storage
+from voices.broker.tasks.storage import media_name
+from voices.config import settings
+from voices.redis import Redis
+
+ETAG = '"18a4f1c2b3d4e5f6-64"'
+SIZE = 100
+NAME = "0190a1b2c3d4e5f60718293a4b5c6d7e"
+
+
+def range_request(**headers: str) -> Request:
+    return Request(
+        {"type": "http", "headers": [(k.replace("_", "-").encode(), v.encode()) for k, v in headers.items()]}
+    )
+
+
+class TestRange:
+    @pytest.mark.parametrize(
+        "value, byte_range",
+        [
+            ("bytes=0-9", (0, 9)),
+            ("bytes=90-", (90, 99)),
+            ("bytes=90-1000", (90, 99)),
+            ("bytes=-10", (90, 99)),
+            ("bytes=-1000", (0, 99)),
+        ],
+    )
+    def test_range(self, value: str, byte_range: tuple[int, int]):
+        assert get_range(range_request(range=value), ETAG, SIZE) == byte_range
+
+    @pytest.mark.parametrize("value", ["bytes=100-", "bytes=50-10", "bytes=-0"])
+    def test_not_satisfiable(self, value: str):
+        with pytest.raises(RangeNotSatisfiable):
+            get_range(range_request(range=value), ETAG, SIZE)
+
+    @pytest.mark.parametrize("value", ["bytes=0-9,20-29", "items=0-9", "bytes=a-b"])
+    def test_whole_file(self, value: str):
+        assert get_range(range_request(range=value), ETAG, SIZE) is None
+
+    def test_no_range(self):
+        assert get_range(range_request(), ETAG, SIZE) is None
+
+    def test_if_range_match(self):
+        assert get_range(range_request(range="bytes=0-9", if_range=ETAG), ETAG, SIZE) == (0, 9)
+
+    def test_if_range_changed(self):
+        # the client has a part of the previous file, it gets the whole new one
+        assert get_range(range_request(range="bytes=0-9", if_range='"0-64"'), ETAG, SIZE) is None
+
+
+class TestMediaName:
+    @pytest.mark.parametrize(
+        "key",
+        [
+            f"{NAME}.webp",
+            f"{NAME}-min.webp",
+            f"{NAME}-480.webp",
+            f"{NAME}.mp4",
+            f"uploads/{NAME}.webp",
+            f"https://storage.yandexcloud.net/my-city/{NAME}-1080.webp",
+        ],
+    )
+    def test_variants_share_name(self, key: str):
+        assert media_name(key) == bytes.fromhex(NAME)
+
+    @pytest.mark.parametrize(
+        "key, name",
+        [
+            ("https://pbs.twimg.com/media/EaH598OWsAAoGzB.jpg", "EaH598OWsAAoGzB.jpg"),
+            (f"{NAME[:-1]}.webp", f"{NAME[:-1]}.webp"),
+            (f"{NAME}-full.webp", f"{NAME}-full.webp"),
+        ],
+    )
+    def test_other_names(self, key: str, name: str):
+        assert media_name(key) == name
+
+
+class TestUploads:
+    @pytest.fixture
+    def queued(self, monkeypatch) -> list[dict]:
+        # s3 and the celery broker are outside of tests, the form is not posted and the task is not run
+        async def generate_presigned_post(img_name: str, max_size: int, expires: int) -> dict:
+            return {"url": "https://s3.test/bucket", "fields": {"key": img_name}}
+
+        queued = []
+        monkeypatch.setattr(S3Service, "generate_presigned_post", generate_presigned_post)
+        monkeypatch.setattr(storage.process_upload, "apply_async", lambda kwargs, **_: queued.append(kwargs))
+        return queued
+
+    @pytest_asyncio.fixture
+    async def upload_id(self, client: AsyncClient, queued: list[dict]) -> str:
+        response = await client.post("api/storage/uploads", json={"fileName": "photo.JPG"})
+        return response.json()["payload"]["uploadId"]
+
+    @pytest.mark.asyncio
+    async def test_create(self, client: AsyncClient, queued: list[dict]):
+        response = await client.post("api/storage/uploads", json={"fileName": "photo.jpg"})
+        payload = response.json()["payload"]
+        assert response.json()["code"] == 200
+        assert payload["url"] == "https://s3.test/bucket"
+        assert payload["fields"]["key"].endswith(".jpg")
+        assert payload["uploadId"] in payload["fields"]["key"]
+
+        response = await client.get(f"api/storage/uploads/{payload['uploadId']}")
+        assert response.json()["payload"]["status"] == UploadStatus.PENDING
+
+    @pytest.mark.asyncio
+    async def test_create_unsupported(self, client: AsyncClient, queued: list[dict]):
+        response = await client.post("api/storage/uploads", json={"fileName": "script.exe"})
+        assert response.json()["exception_class"] == "UnsupportedFileTypeError"
+
+    @pytest.mark.asyncio
+    async def test_complete_once(self, client: AsyncClient, upload_id: str, queued: list[dict]):
+        response = await client.post(f"api/storage/uploads/{upload_id}/complete")
+        assert response.json()["code"] == 200
+        assert response.json()["payload"]["status"] == UploadStatus.PROCESSING
+
+        response = await client.post(f"api/storage/uploads/{upload_id}/complete")
+        assert response.json()["payload"]["status"] == UploadStatus.PROCESSING
+        assert queued == [{"upload_id": upload_id}]
+
+    @pytest.mark.asyncio
+    async def test_status_done(self, client: AsyncClient, upload_id: str):
+        url = f"{settings.CONTENT_URL}{NAME}.webp"
+        await Redis.set_upload(upload_id, status=UploadStatus.DONE, url=url)
+
+        response = await client.post(f"api/storage/uploads/{upload_id}/complete")
+        payload = response.json()["payload"]
+        assert payload["status"] == UploadStatus.DONE
+        assert payload["url"] == url
+
+    @pytest.mark.asyncio
+    async def test_status_not_found(self, client: AsyncClient):
+        response = await client.get(f"api/storage/uploads/{NAME}")
+        assert response.json()["code"] == 404
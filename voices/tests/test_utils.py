@@ -0,0 +1,31 @@
+import pytest
+
+from voices.config import settings
+from voices.utils import ImageRole, image_variant
+
+NAME = "0190a1b2c3d4e5f60718293a4b5c6d7e"
+
+
+class TestImageVariant:
+    @pytest.mark.parametrize("role", list(ImageRole))
+    def test_variant(self, role: ImageRole):
+        image = f"{settings.CONTENT_URL}{NAME}-{settings.IMAGE_VARIANTS['detail'][0]}.webp"
+        width = settings.IMAGE_VARIANTS[role][0]
+        assert image_variant(image, role) == f"{settings.CONTENT_URL}{NAME}-{width}.webp"
+
+    @pytest.mark.parametrize("role", [ImageRole.AVATAR, ImageRole.CARD])
+    def test_legacy_min(self, role: ImageRole):
+        image = f"{settings.CONTENT_URL}{NAME}.jpg"
+        assert image_variant(image, role) == f"{settings.CONTENT_URL}{NAME}-min.jpg"
+
+    def test_legacy_detail(self):
+        image = f"{settings.CONTENT_URL}{NAME}.jpg"
+        assert image_variant(image, ImageRole.DETAIL) == image
+
+    def test_legacy_already_min(self):
+        image = f"{settings.CONTENT_URL}{NAME}-min.jpg"
+        assert image_variant(image, ImageRole.CARD) == image
+
+    @pytest.mark.parametrize("image", [None, "", "https://pbs.twimg.com/media/EaH598OWsAAoGzB.jpg"])
+    def test_foreign(self, image: str | None):
+        assert image_variant(image, ImageRole.CARD) == image
@@ -1,13 +1,31 @@
-from enum import Enum
+import re
+from enum import Enum, StrEnum
+
+from voices.config import settings
+
+VARIANT_FILENAME = re.compile(r"^(?P<name>[0-9a-f]+)-(?P<width>\d+)\.webp$")
+
+
+class ImageRole(StrEnum):
+    AVATAR = "avatar"
+    CARD = "card"
+    DETAIL = "detail"
 
 
 def count_max_length(enum: Enum):
     return max((len(val) for val in enum))
 
 
-def get_minify_image(image: str) -> str:
-    if not image:
-        return ""
-    filename = image.split("/")[-1]
-    name, file_ext = filename.split(".")
-    return f"https://storage.yandexcloud.net/my-city/{name}-min.{file_ext}"
+def image_variant(image: str | None, role: ImageRole) -> str | None:
+    """
+    Url of the image variant for the role, uploads made before variants have only full size and -min files
+    """
+    if not image or not image.startswith(settings.CONTENT_URL):
+        return image
+    filename = image.removeprefix(settings.CONTENT_URL)
+    if match := VARIANT_FILENAME.match(filename):
+        return f"{settings.CONTENT_URL}{match['name']}-{settings.IMAGE_VARIANTS[role][0]}.webp"
+    if role == ImageRole.DETAIL or "-min." in filename:
+        return image
+    name, file_ext = filename.rsplit(".", 1)
+    return f"{settings.CONTENT_URL}{name}-min.{file_ext}"